@@ -0,0 +1,180 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import auth, crud, models, passwords, schemas, search, suggestions, viewer
+from .loading import COMMENT_LOAD, TWEET_LOAD
+from .pagination import PAGE_SIZE
+
+# Async variants of the crud functions for the web routes. Each one runs the
+# sync implementation through AsyncSession.run_sync, so every statement goes
+# through aiosqlite and the event loop keeps serving other requests while
+# SQLite works. Whatever a template renders has to be loaded eagerly here:
+# lazy loads cannot run once run_sync has returned.
+
+
+async def get_user(db: AsyncSession, username: str):
+    return await db.run_sync(lambda session: auth.get_user(session, username))
+
+
+async def authenticate_user(db: AsyncSession, username: str, password: str):
+    user = await get_user(db, username)
+    if not user:
+        return False
+    valid, new_hash = await passwords.verify_and_update_async(password, user.password)
+    if not valid:
+        return False
+    if new_hash:
+        await db.run_sync(lambda session: auth.rehash_password(session, user, new_hash))
+    return user
+
+
+async def create_user(db: AsyncSession, user: schemas.UserCreate):
+    hashed_password = await passwords.hash_password_async(user.password)
+    return await db.run_sync(
+        lambda session: crud.create_user(session, user, hashed_password)
+    )
+
+
+async def check_following(
+    follower_user_id: int, followee_user_id: int, db: AsyncSession
+):
+    return await db.run_sync(
+        lambda session: crud.check_following(
+            follower_user_id, followee_user_id, session
+        )
+    )
+
+
+async def create_follow(follower_user_id: int, followee_user_id: int, db: AsyncSession):
+    return await db.run_sync(
+        lambda session: crud.create_follow(follower_user_id, followee_user_id, session)
+    )
+
+
+async def delete_follow(follower_user_id: int, followee_user_id: int, db: AsyncSession):
+    return await db.run_sync(
+        lambda session: crud.delete_follow(follower_user_id, followee_user_id, session)
+    )
+
+
+async def get_suggestions(db: AsyncSession, user_id: int):
+    return await db.run_sync(
+        lambda session: suggestions.get_suggestions(session, user_id)
+    )
+
+
+async def get_tweets_explore(
+    user_id: int, db: AsyncSession, cursor: str | None = None, limit: int = PAGE_SIZE
+):
+    return await db.run_sync(
+        lambda session: crud.get_tweets_explore(user_id, session, cursor, limit)
+    )
+
+
+async def get_tweets_user(
+    user_id: int, db: AsyncSession, cursor: str | None = None, limit: int = PAGE_SIZE
+):
+    return await db.run_sync(
+        lambda session: crud.get_tweets_user(user_id, session, cursor, limit)
+    )
+
+
+async def get_tweets_home(
+    user_id: int, db: AsyncSession, cursor: str | None = None, limit: int = PAGE_SIZE
+):
+    return await db.run_sync(
+        lambda session: crud.get_tweets_home(user_id, session, cursor, limit)
+    )
+
+
+async def search_tweets(
+    query: str, db: AsyncSession, cursor: str | None = None, limit: int = PAGE_SIZE
+):
+    return await db.run_sync(
+        lambda session: search.search(
+            session, models.Tweet, query, cursor, limit, TWEET_LOAD
+        )
+    )
+
+
+async def get_tweet_by_id(tweet_id: int, db: AsyncSession):
+    return await db.run_sync(
+        lambda session: crud.get_tweet_by_id(tweet_id, session, TWEET_LOAD)
+    )
+
+
+async def create_tweet(
+    current_user_id: int, tweet: schemas.TweetBase | str, db: AsyncSession
+):
+    db_tweet = await db.run_sync(
+        lambda session: crud.create_tweet(current_user_id, tweet, session)
+    )
+    return await get_tweet_by_id(db_tweet.id, db)
+
+
+async def update_tweet(
+    tweet_id: int, new_content: schemas.TweetBase | str, db: AsyncSession
+):
+    return await db.run_sync(
+        lambda session: crud.update_tweet(tweet_id, new_content, session)
+    )
+
+
+async def delete_tweet(tweet_id: int, db: AsyncSession):
+    return await db.run_sync(lambda session: crud.delete_tweet(tweet_id, session))
+
+
+async def get_comment_by_id(comment_id: int, db: AsyncSession):
+    return await db.run_sync(
+        lambda session: crud.get_comment_by_id(comment_id, session, COMMENT_LOAD)
+    )
+
+
+async def create_comment(
+    comment: schemas.CommentBase | str,
+    current_tweet_id: int,
+    current_user_id: int,
+    db: AsyncSession,
+):
+    return await db.run_sync(
+        lambda session: crud.create_comment(
+            comment, current_tweet_id, current_user_id, session
+        )
+    )
+
+
+async def update_comment(
+    comment_id: int, new_content: schemas.CommentBase | str, db: AsyncSession
+):
+    return await db.run_sync(
+        lambda session: crud.update_comment(comment_id, new_content, session)
+    )
+
+
+async def delete_comment(comment_id: int, db: AsyncSession):
+    return await db.run_sync(lambda session: crud.delete_comment(comment_id, session))
+
+
+async def check_like(current_tweet_id: int, current_user_id: int, db: AsyncSession):
+    return await db.run_sync(
+        lambda session: crud.check_like(current_tweet_id, current_user_id, session)
+    )
+
+
+async def create_like(current_tweet_id: int, current_user_id: int, db: AsyncSession):
+    return await db.run_sync(
+        lambda session: crud.create_like(current_tweet_id, current_user_id, session)
+    )
+
+
+async def delete_like(current_tweet_id: int, current_user_id: int, db: AsyncSession):
+    return await db.run_sync(
+        lambda session: crud.delete_like(current_tweet_id, current_user_id, session)
+    )
+
+
+async def get_viewer_state(
+    db: AsyncSession, user_id: int, tweets=(), user_ids=()
+) -> viewer.ViewerState:
+    return await db.run_sync(
+        lambda session: viewer.get_viewer_state(session, user_id, tweets, user_ids)
+    )
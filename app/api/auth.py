@@ -1,51 +1,71 @@
+import time
 from datetime import datetime, timedelta
 from typing import Optional
 
 from fastapi import Cookie, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
-from . import models, schemas, secret
+from . import cache, config, models, passwords, schemas, secret
 
 SECRET_KEY = secret.secret
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+ADMIN_USERNAMES = config.ADMIN_USERNAMES
 
 
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
 
 
 class TokenData(BaseModel):
     username: str or None = None
+    session: Optional[str] = None
+
+
+class Principal(BaseModel):
+    id: int
+    username: str
+    session: Optional[str] = None
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/token")
 
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    valid, _ = passwords.verify_and_update(plain_password, hashed_password)
+    return valid
 
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return passwords.hash_password(password)
+
+
+def rehash_password(db: Session, user: models.User, hashed_password: str):
+    db.query(models.User).filter(models.User.id == user.id).update(
+        {"password": hashed_password}
+    )
+    db.commit()
+    cache.invalidate_user(user.id)
 
 
 def get_user(db: Session, username: str):
-    return db.query(models.User).filter(models.User.username == username).first()
+    return cache.get_user(db, username)
 
 
 def authenticate_user(db: Session, username: str, password: str):
     user = get_user(db, username)
     if not user:
         return False
-    if not verify_password(password, user.password):
+    valid, new_hash = passwords.verify_and_update(password, user.password)
+    if not valid:
         return False
+    if new_hash:
+        rehash_password(db, user, new_hash)
     return user
 
 
@@ -60,30 +80,55 @@ def create_access_token(data: dict, expires_delta: timedelta or None = None):
     return encoded_jwt
 
 
-async def get_current_username(token: str = Depends(oauth2_scheme)):
-    credential_exception = HTTPException(
+def credential_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+def decode_token(token: str) -> dict:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credential_exception
-        token_data = TokenData(username=username)
     except JWTError:
-        raise credential_exception
+        raise credential_exception()
+    if payload.get("sub") is None or payload.get("type") == "refresh":
+        raise credential_exception()
+    return payload
+
+
+async def get_current_username(token: str = Depends(oauth2_scheme)):
+    return decode_token(token)["sub"]
+
+
+def get_principal(db: Session, token: str) -> Principal:
+    entry = cache.principals.get(token)
+    if entry is not None and entry[1] > time.time():
+        return entry[0]
+    payload = decode_token(token)
+    user = get_user(db, payload["sub"])
+    if user is None:
+        raise credential_exception()
+    principal = Principal(
+        id=user.id, username=user.username, session=payload.get("sid")
+    )
+    # Grouped under the user's id so updating or deleting the user drops it,
+    # and never trusted past the token's own expiry.
+    cache.principals.set(token, (principal, payload["exp"]), group=user.id)
+    return principal
+
 
-    return token_data.username
+def is_admin(principal: Principal) -> bool:
+    return principal.username in ADMIN_USERNAMES
 
 
 def get_bearer(bearer: Optional[str] = Cookie(default=None)) -> Optional[TokenData]:
     try:
         payload = jwt.decode(bearer, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
-        if username is None:
+        if username is None or payload.get("type") == "refresh":
             return None
-        return TokenData(username=username)
+        return TokenData(username=username, session=payload.get("sid"))
     except:
         return None
@@ -0,0 +1,160 @@
+from datetime import datetime
+
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+
+from . import (
+    cache,
+    graph,
+    models,
+    ranking,
+    schemas,
+    suggestions,
+    tags,
+    timeline,
+    trending,
+    writebuffer,
+)
+
+# Set-based versions of create_like, create_follow and create_tweet for
+# importers and offline clients. Each batch is checked with one query per
+# table, written with one executemany per table and committed once, so a
+# batch of hundreds costs a single fsync. Items that already exist or point
+# at missing rows are skipped and reported instead of failing the batch. With
+# WRITE_BUFFER=1 likes and follows go through the write buffer, like their
+# single-item routes, and are reported as accepted.
+CREATED = "created"
+ACCEPTED = "accepted"
+EXISTS = "exists"
+NOT_FOUND = "not_found"
+INVALID = "invalid"
+
+
+def report(ids: list[int], statuses: dict[int, str]) -> list[dict]:
+    results, seen = [], set()
+    for id in ids:
+        status = EXISTS if id in seen else statuses[id]
+        results.append({"id": id, "status": status})
+        seen.add(id)
+    return results
+
+
+def create_likes(db: Session, user_id: int, tweet_ids: list[int]) -> list[dict]:
+    requested = set(tweet_ids)
+    found = db.query(models.Tweet.id).filter(models.Tweet.id.in_(requested))
+    found = {tweet_id for tweet_id, in found}
+    liked = db.query(models.Like.tweet_id).filter(
+        models.Like.user_id == user_id, models.Like.tweet_id.in_(found)
+    )
+    liked = {tweet_id for tweet_id, in liked}
+    liked = writebuffer.overlay(writebuffer.LIKE, user_id, found, liked)
+    new = sorted(found - liked)
+    if new and writebuffer.ENABLED:
+        for tweet_id in new:
+            writebuffer.put(writebuffer.LIKE, user_id, tweet_id, True)
+    elif new:
+        creation_datetime = datetime.utcnow()
+        db.execute(
+            insert(models.Like),
+            [
+                {
+                    "user_id": user_id,
+                    "tweet_id": tweet_id,
+                    "created_at": creation_datetime,
+                }
+                for tweet_id in new
+            ],
+        )
+        db.execute(
+            update(models.Tweet)
+            .where(models.Tweet.id.in_(new))
+            .values(like_count=models.Tweet.like_count + 1)
+        )
+        ranking.mark(db, new)
+        db.commit()
+        for tweet_id in new:
+            cache.invalidate_tweet(tweet_id)
+    statuses = {tweet_id: NOT_FOUND for tweet_id in requested - found}
+    statuses.update({tweet_id: EXISTS for tweet_id in liked})
+    created = ACCEPTED if writebuffer.ENABLED else CREATED
+    statuses.update({tweet_id: created for tweet_id in new})
+    return report(tweet_ids, statuses)
+
+
+def create_follows(db: Session, follower_id: int, user_ids: list[int]) -> list[dict]:
+    requested = set(user_ids) - {follower_id}
+    found = db.query(models.User.id).filter(models.User.id.in_(requested))
+    found = {user_id for user_id, in found}
+    followed = db.query(models.Follow.followee_id).filter(
+        models.Follow.follower_id == follower_id,
+        models.Follow.followee_id.in_(found),
+    )
+    followed = {user_id for user_id, in followed}
+    followed = writebuffer.overlay(writebuffer.FOLLOW, follower_id, found, followed)
+    new = sorted(found - followed)
+    if new and writebuffer.ENABLED:
+        for followee_id in new:
+            writebuffer.put(writebuffer.FOLLOW, follower_id, followee_id, True)
+    elif new:
+        creation_datetime = datetime.utcnow()
+        db.execute(
+            insert(models.Follow),
+            [
+                {
+                    "follower_id": follower_id,
+                    "followee_id": followee_id,
+                    "created_at": creation_datetime,
+                }
+                for followee_id in new
+            ],
+        )
+        db.execute(
+            update(models.User)
+            .where(models.User.id == follower_id)
+            .values(following_count=models.User.following_count + len(new))
+        )
+        db.execute(
+            update(models.User)
+            .where(models.User.id.in_(new))
+            .values(follower_count=models.User.follower_count + 1)
+        )
+        for followee_id in new:
+            timeline.backfill(db, follower_id, followee_id)
+        db.commit()
+        cache.invalidate_user(follower_id)
+        cache.invalidate_viewer(follower_id)
+        for followee_id in new:
+            cache.invalidate_user(followee_id)
+            if graph.get():
+                graph.get().add(follower_id, followee_id)
+            suggestions.followed(db, follower_id, followee_id)
+    statuses = {user_id: NOT_FOUND for user_id in requested - found}
+    statuses.update({user_id: EXISTS for user_id in followed})
+    created = ACCEPTED if writebuffer.ENABLED else CREATED
+    statuses.update({user_id: created for user_id in new})
+    statuses[follower_id] = INVALID
+    return report(user_ids, statuses)
+
+
+def create_tweets(
+    db: Session, user_id: int, tweets: list[schemas.TweetBase]
+) -> list[dict]:
+    creation_datetime = datetime.utcnow()
+    db_tweets = [
+        models.Tweet(
+            content=tweet.content, user_id=user_id, created_at=creation_datetime
+        )
+        for tweet in tweets
+    ]
+    db.add_all(db_tweets)
+    db.flush()
+    hashtags = []
+    for db_tweet in db_tweets:
+        timeline.fan_out(db, db_tweet)
+        hashtags += tags.index_tweet(db, db_tweet)
+        ranking.add_tweet(db, db_tweet)
+    tweet_ids = [db_tweet.id for db_tweet in db_tweets]
+    db.commit()
+    cache.invalidate_profile(user_id)
+    trending.record(hashtags, creation_datetime)
+    return [{"id": tweet_id, "status": CREATED} for tweet_id in tweet_ids]
@@ -0,0 +1,212 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, Hashable
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from . import models
+
+USER_CACHE_SIZE = 4096
+USER_CACHE_TTL = 300
+TWEET_CACHE_SIZE = 16384
+TWEET_CACHE_TTL = 300
+TIMELINE_CACHE_SIZE = 2048
+TIMELINE_CACHE_TTL = 30
+PRINCIPAL_CACHE_SIZE = 8192
+PRINCIPAL_CACHE_TTL = 60
+SUGGESTION_CACHE_SIZE = 1024
+SUGGESTION_CACHE_TTL = 600
+
+_MISSING = object()
+
+
+class LRUCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._groups: dict[Hashable, set] = {}
+        self._lock = Lock()
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING and entry[0] < time.monotonic():
+                self._remove(key)
+                entry = _MISSING
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: Hashable, value, group: Hashable = None):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, value, group)
+            if group is not None:
+                self._groups.setdefault(group, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def invalidate_group(self, group: Hashable):
+        with self._lock:
+            for key in list(self._groups.get(group, ())):
+                self._remove(key)
+
+    def items(self) -> list:
+        now = time.monotonic()
+        with self._lock:
+            return [
+                (key, entry[1])
+                for key, entry in self._entries.items()
+                if entry[0] >= now
+            ]
+
+    def groups(self) -> list:
+        with self._lock:
+            return list(self._groups)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._groups.clear()
+
+    def stats(self) -> dict:
+        requests = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / requests if requests else 0.0,
+        }
+
+    def _remove(self, key: Hashable):
+        _, _, group = self._entries.pop(key)
+        if group is not None:
+            keys = self._groups[group]
+            keys.discard(key)
+            if not keys:
+                del self._groups[group]
+
+
+users = LRUCache(USER_CACHE_SIZE, USER_CACHE_TTL)
+tweets = LRUCache(TWEET_CACHE_SIZE, TWEET_CACHE_TTL)
+timelines = LRUCache(TIMELINE_CACHE_SIZE, TIMELINE_CACHE_TTL)
+principals = LRUCache(PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL)
+suggestions = LRUCache(SUGGESTION_CACHE_SIZE, SUGGESTION_CACHE_TTL)
+
+
+def snapshot(instance) -> dict:
+    return {
+        attribute.key: getattr(instance, attribute.key)
+        for attribute in inspect(instance).mapper.column_attrs
+    }
+
+
+def attach(db: Session, model, data: dict):
+    instance = model(**data)
+    make_transient_to_detached(instance)
+    return db.merge(instance, load=False)
+
+
+def get_entity(db: Session, cache: LRUCache, model, key: Hashable, query):
+    data = cache.get(key)
+    if data is not None:
+        return attach(db, model, data)
+    instance = query.first()
+    if instance is not None:
+        cache.set(key, snapshot(instance), group=instance.id)
+    return instance
+
+
+def get_user(db: Session, username: str):
+    query = db.query(models.User).filter(models.User.username == username)
+    return get_entity(db, users, models.User, username, query)
+
+
+def get_tweet(db: Session, tweet_id: int):
+    query = db.query(models.Tweet).filter(models.Tweet.id == tweet_id)
+    return get_entity(db, tweets, models.Tweet, int(tweet_id), query)
+
+
+def get_timeline(
+    db: Session,
+    kind: str,
+    user_id: int,
+    cursor: str | None,
+    limit: int,
+    loader: Callable[[], list],
+    options: tuple = (),
+    entities: tuple = (models.Tweet,),
+):
+    key = (kind, user_id, cursor, limit)
+    tweet_ids = timelines.get(key)
+    if tweet_ids is None:
+        page = loader()
+        timelines.set(key, [tweet.id for tweet in page], group=(kind, user_id))
+        return page
+    if not tweet_ids:
+        return []
+    rows = db.query(*entities).options(*options).filter(models.Tweet.id.in_(tweet_ids))
+    page = {tweet.id: tweet for tweet in rows}
+    return [page[tweet_id] for tweet_id in tweet_ids if tweet_id in page]
+
+
+def invalidate_user(user_id: int):
+    users.invalidate_group(user_id)
+    principals.invalidate_group(user_id)
+
+
+def invalidate_tweet(tweet_id: int):
+    tweets.invalidate_group(int(tweet_id))
+
+
+def invalidate_viewer(user_id: int):
+    timelines.invalidate_group(("home", user_id))
+    timelines.invalidate_group(("following", user_id))
+
+
+def invalidate_profile(author_id: int):
+    timelines.invalidate_group(("user", author_id))
+    invalidate_viewer(author_id)
+
+
+def invalidate_author(db: Session, author_id: int):
+    groups = timelines.groups()
+    invalidate_profile(author_id)
+    # Only viewers that currently have cached pages need to be looked up.
+    viewers = {user_id for kind, user_id in groups if kind in ("home", "following")}
+    if viewers:
+        followers = db.query(models.Follow.follower_id).filter(
+            models.Follow.followee_id == author_id,
+            models.Follow.follower_id.in_(viewers),
+        )
+        for (follower_id,) in followers:
+            invalidate_viewer(follower_id)
+
+
+def stats() -> dict:
+    return {
+        "users": users.stats(),
+        "tweets": tweets.stats(),
+        "timelines": timelines.stats(),
+        "principals": principals.stats(),
+        "suggestions": suggestions.stats(),
+    }
@@ -0,0 +1,78 @@
+import os
+
+from sqlalchemy.engine import make_url
+
+DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./sql_app.db")
+# Comma separated. A local read-only SQLite replica of the default database is
+# sqlite:///file:sql_app.db?mode=ro&uri=true
+DATABASE_REPLICA_URLS = [
+    url.strip()
+    for url in os.environ.get("DATABASE_REPLICA_URLS", "").split(",")
+    if url.strip()
+]
+# How long a user's reads stay on the primary after they write.
+READ_YOUR_WRITES_SECONDS = float(os.environ.get("READ_YOUR_WRITES_SECONDS", 5))
+
+# Server databases only; SQLite keeps SQLAlchemy's defaults.
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 20))
+DB_POOL_TIMEOUT = int(os.environ.get("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", 1800))
+
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 5000))
+SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+# Negative values are KiB, as in SQLite's own cache_size pragma.
+SQLITE_CACHE_SIZE = int(os.environ.get("SQLITE_CACHE_SIZE", -64 * 1024))
+
+# bcrypt cost, and the threads and queue depth of the hashing pool; see
+# app/api/passwords.py.
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", 12))
+HASH_WORKERS = int(os.environ.get("HASH_WORKERS", 4))
+HASH_QUEUE_LIMIT = int(os.environ.get("HASH_QUEUE_LIMIT", 64))
+
+# Comma separated usernames allowed to read the operator endpoints such as
+# /api/cache/stats.
+ADMIN_USERNAMES = {
+    username.strip()
+    for username in os.environ.get("ADMIN_USERNAMES", "").split(",")
+    if username.strip()
+}
+
+# Home timeline strategy and the follower count above which tweets are merged
+# in at read time instead of fanned out; see app/api/timeline.py.
+TIMELINE_MODE = os.environ.get("TIMELINE_MODE", "hybrid")
+FANOUT_FOLLOWER_THRESHOLD = int(os.environ.get("FANOUT_FOLLOWER_THRESHOLD", 10000))
+
+# Serve tweet lists without pydantic; see app/api/serializers.py.
+FAST_RESPONSES = os.environ.get("FAST_RESPONSES", "") in ("1", "true", "yes")
+
+# Keep an in-memory copy of the follow graph; see app/api/graph.py.
+FOLLOW_GRAPH = os.environ.get("FOLLOW_GRAPH", "") in ("1", "true", "yes")
+
+# Buffer like and follow toggles in memory; see app/api/writebuffer.py.
+WRITE_BUFFER = os.environ.get("WRITE_BUFFER", "") in ("1", "true", "yes")
+WRITE_BUFFER_FLUSH_MS = int(os.environ.get("WRITE_BUFFER_FLUSH_MS", 50))
+WRITE_BUFFER_BATCH_SIZE = int(os.environ.get("WRITE_BUFFER_BATCH_SIZE", 500))
+# How long shutdown keeps flushing before dropping what is left; 0 drops it.
+WRITE_BUFFER_SHUTDOWN_SECONDS = float(
+    os.environ.get("WRITE_BUFFER_SHUTDOWN_SECONDS", 10)
+)
+
+# Threads running queued jobs in each web process; see app/api/jobs.py. Set it
+# to 0 when `python -m app.manage run-jobs` runs them instead.
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 2))
+
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def async_url(url: str) -> str:
+    parsed = make_url(url)
+    parsed = parsed.set(drivername=ASYNC_DRIVERS[parsed.get_backend_name()])
+    return parsed.render_as_string(hide_password=False)
+
+
+ASYNC_DATABASE_URL = os.environ.get("ASYNC_DATABASE_URL") or async_url(DATABASE_URL)
+ASYNC_DATABASE_REPLICA_URLS = [async_url(url) for url in DATABASE_REPLICA_URLS]
@@ -0,0 +1,87 @@
+from typing import Mapping
+
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.orm import Session
+
+from . import models, ranking
+
+
+def adjust(db: Session, column, id: int, delta: int):
+    model = column.class_
+    db.query(model).filter(model.id == id).update(
+        {column: column + delta}, synchronize_session=False
+    )
+
+
+def adjust_many(db: Session, column, deltas: Mapping[int, int]):
+    model = column.class_
+    values = [{"b_id": id, "b_delta": delta} for id, delta in deltas.items() if delta]
+    if values:
+        statement = (
+            update(model)
+            .where(model.id == bindparam("b_id"))
+            .values({column: column + bindparam("b_delta")})
+        )
+        db.connection().execute(statement, values)
+
+
+def discount_user(db: Session, user_id: int):
+    likes = (
+        db.query(models.Like.tweet_id, func.count(models.Like.id))
+        .filter(models.Like.user_id == user_id)
+        .group_by(models.Like.tweet_id)
+    )
+    for tweet_id, count in likes.all():
+        adjust(db, models.Tweet.like_count, tweet_id, -count)
+        ranking.mark(db, [tweet_id])
+    comments = (
+        db.query(models.Comment.tweet_id, func.count(models.Comment.id))
+        .filter(models.Comment.user_id == user_id)
+        .group_by(models.Comment.tweet_id)
+    )
+    for tweet_id, count in comments.all():
+        adjust(db, models.Tweet.comment_count, tweet_id, -count)
+        ranking.mark(db, [tweet_id])
+    followees = db.query(models.Follow.followee_id).filter(
+        models.Follow.follower_id == user_id
+    )
+    for (followee_id,) in followees.all():
+        adjust(db, models.User.follower_count, followee_id, -1)
+    followers = db.query(models.Follow.follower_id).filter(
+        models.Follow.followee_id == user_id
+    )
+    for (follower_id,) in followers.all():
+        adjust(db, models.User.following_count, follower_id, -1)
+
+
+def repair(db: Session):
+    like_count = (
+        select(func.count(models.Like.id))
+        .where(models.Like.tweet_id == models.Tweet.id)
+        .scalar_subquery()
+    )
+    comment_count = (
+        select(func.count(models.Comment.id))
+        .where(models.Comment.tweet_id == models.Tweet.id)
+        .scalar_subquery()
+    )
+    tweets = db.execute(
+        update(models.Tweet).values(like_count=like_count, comment_count=comment_count)
+    )
+    follower_count = (
+        select(func.count(models.Follow.id))
+        .where(models.Follow.followee_id == models.User.id)
+        .scalar_subquery()
+    )
+    following_count = (
+        select(func.count(models.Follow.id))
+        .where(models.Follow.follower_id == models.User.id)
+        .scalar_subquery()
+    )
+    users = db.execute(
+        update(models.User).values(
+            follower_count=follower_count, following_count=following_count
+        )
+    )
+    db.commit()
+    return tweets.rowcount, users.rowcount
@@ -3,26 +3,49 @@ from datetime import datetime
 import bcrypt
 from fastapi import status
 from fastapi.encoders import jsonable_encoder
-from sqlalchemy import or_
+from sqlalchemy import exists, or_
 from sqlalchemy.orm import Session
 
-from . import auth, models, schemas
-
-
-def get_user_by_id(db: Session, user_id: int):
-    return db.query(models.User).filter(models.User.id == user_id).first()
+from . import (
+    cache,
+    counters,
+    graph,
+    models,
+    passwords,
+    ranking,
+    schemas,
+    suggestions,
+    tags,
+    timeline,
+    trending,
+    writebuffer,
+)
+from .loading import TWEET_LOAD
+from .pagination import PAGE_SIZE, paginate
+
+
+def get_user_by_id(db: Session, user_id: int, options: tuple = ()):
+    return (
+        db.query(models.User)
+        .options(*options)
+        .filter(models.User.id == user_id)
+        .first()
+    )
 
 
 def get_user_by_username(db: Session, username: str):
-    return db.query(models.User).filter(models.User.username == username).first()
+    return cache.get_user(db, username)
 
 
 def get_all_users(db: Session):
     return db.query(models.User).all()
 
 
-def create_user(db: Session, user: schemas.UserCreate):
-    hashed_password = auth.pwd_context.hash(user.password)
+def create_user(
+    db: Session, user: schemas.UserCreate, hashed_password: str | None = None
+):
+    if hashed_password is None:
+        hashed_password = passwords.hash_password(user.password)
     db_user = models.User(username=user.username, password=hashed_password)
     db.add(db_user)
     db.commit()
@@ -37,38 +60,67 @@ def update_user(db: Session, user: schemas.UserBasic):
     updated_user = db_user_model.copy(update=update_data)
     db.query(models.User).filter(models.User.id == user.id).update(updated_user.dict())
     db.commit()
+    cache.invalidate_user(user.id)
     updated_user = jsonable_encoder(updated_user)
     return updated_user
 
 
 def delete_user(db: Session, user_id: int):
+    writebuffer.discard_user(user_id)
     user = db.query(models.User).filter(models.User.id == user_id).first()
+    timeline.prune_user(db, user_id)
+    tags.prune_user(db, user_id)
+    ranking.remove_user(db, user_id)
+    counters.discount_user(db, user_id)
     db.delete(user)
     db.commit()
+    cache.users.clear()
+    cache.tweets.clear()
+    cache.timelines.clear()
+    cache.principals.clear()
+    cache.suggestions.clear()
+    if graph.get():
+        graph.get().remove_user(user_id)
     return "User has been deleted."
 
 
-def get_followers(user_id: int, db: Session):
-    return db.query(models.Follow).filter(models.Follow.followee_id == user_id).all()
+def get_followers(user_id: int, db: Session, options: tuple = ()):
+    return (
+        db.query(models.Follow)
+        .options(*options)
+        .filter(models.Follow.followee_id == user_id)
+        .all()
+    )
 
 
-def get_following(user_id: int, db: Session):
-    return db.query(models.Follow).filter(models.Follow.follower_id == user_id).all()
+def get_following(user_id: int, db: Session, options: tuple = ()):
+    return (
+        db.query(models.Follow)
+        .options(*options)
+        .filter(models.Follow.follower_id == user_id)
+        .all()
+    )
 
 
 def check_following(follower_user_id: int, followee_user_id: int, db: Session):
-    return (
-        db.query(models.Follow)
-        .filter(
+    buffered = writebuffer.state(writebuffer.FOLLOW, follower_user_id, followee_user_id)
+    if buffered is not None:
+        return buffered
+    follow_graph = graph.get()
+    if follow_graph:
+        return follow_graph.is_following(follower_user_id, followee_user_id)
+    return db.query(
+        exists().where(
             models.Follow.follower_id == follower_user_id,
             models.Follow.followee_id == followee_user_id,
         )
-        .all()
-        .__len__()
-    )
+    ).scalar()
 
 
 def create_follow(follower_user_id: int, followee_user_id: int, db: Session):
+    if writebuffer.ENABLED:
+        writebuffer.put(writebuffer.FOLLOW, follower_user_id, followee_user_id, True)
+        return None
     creation_datetime = datetime.utcnow()
     db_follow = models.Follow(
         follower_id=follower_user_id,
@@ -76,12 +128,24 @@ def create_follow(follower_user_id: int, followee_user_id: int, db: Session):
         created_at=creation_datetime,
     )
     db.add(db_follow)
+    counters.adjust(db, models.User.following_count, follower_user_id, 1)
+    counters.adjust(db, models.User.follower_count, followee_user_id, 1)
+    timeline.backfill(db, follower_user_id, followee_user_id)
     db.commit()
+    cache.invalidate_user(follower_user_id)
+    cache.invalidate_user(followee_user_id)
+    cache.invalidate_viewer(follower_user_id)
+    if graph.get():
+        graph.get().add(follower_user_id, followee_user_id)
+    suggestions.followed(db, follower_user_id, followee_user_id)
     db.refresh(db_follow)
     return db_follow
 
 
 def delete_follow(follower_user_id: int, followee_user_id: int, db: Session):
+    if writebuffer.ENABLED:
+        writebuffer.put(writebuffer.FOLLOW, follower_user_id, followee_user_id, False)
+        return "Follow has been deleted."
     follow = (
         db.query(models.Follow)
         .filter(
@@ -91,54 +155,115 @@ def delete_follow(follower_user_id: int, followee_user_id: int, db: Session):
         .first()
     )
     db.delete(follow)
+    counters.adjust(db, models.User.following_count, follower_user_id, -1)
+    counters.adjust(db, models.User.follower_count, followee_user_id, -1)
+    timeline.prune_follow(db, follower_user_id, followee_user_id)
     db.commit()
+    cache.invalidate_user(follower_user_id)
+    cache.invalidate_user(followee_user_id)
+    cache.invalidate_viewer(follower_user_id)
+    if graph.get():
+        graph.get().remove(follower_user_id, followee_user_id)
+    suggestions.unfollowed(db, follower_user_id, followee_user_id)
     return "Follow has been deleted."
 
 
-def get_tweets_explore(user_id: int, db: Session):
-    return (
-        db.query(models.Tweet)
-        .filter(models.Tweet.user_id != user_id)
-        .order_by(models.Tweet.created_at.desc())
-        .all()
-    )
-
+def get_tweets_explore(
+    user_id: int,
+    db: Session,
+    cursor: str | None = None,
+    limit: int = PAGE_SIZE,
+    options: tuple = TWEET_LOAD,
+    entities: tuple = (models.Tweet,),
+):
+    return ranking.get_tweets_ranked(user_id, db, cursor, limit, options, entities)
 
-def get_tweets_user(user_id: int, db: Session):
-    return db.query(models.Tweet).filter(models.Tweet.user_id == user_id).all()
 
+def get_tweets_user(
+    user_id: int,
+    db: Session,
+    cursor: str | None = None,
+    limit: int = PAGE_SIZE,
+    options: tuple = TWEET_LOAD,
+    entities: tuple = (models.Tweet,),
+):
+    def load_page():
+        query = (
+            db.query(*entities)
+            .options(*options)
+            .filter(models.Tweet.user_id == user_id)
+        )
+        return paginate(query, models.Tweet.created_at, models.Tweet.id, cursor, limit)
 
-def get_tweets_following(user_id: int, db: Session):
-    query_following = db.query(models.Follow.followee_id).filter(
-        models.Follow.follower_id == user_id
-    )
-    return (
-        db.query(models.Tweet)
-        .filter(models.Tweet.user_id.in_(query_following))
-        .order_by(models.Tweet.created_at.desc())
-        .all()
+    return cache.get_timeline(
+        db, "user", user_id, cursor, limit, load_page, options, entities
     )
 
 
-def get_tweets_home(user_id: int, db: Session):
-    query_following = db.query(models.Follow.followee_id).filter(
-        models.Follow.follower_id == user_id
+def get_tweets_following(
+    user_id: int,
+    db: Session,
+    cursor: str | None = None,
+    limit: int = PAGE_SIZE,
+    options: tuple = TWEET_LOAD,
+    entities: tuple = (models.Tweet,),
+):
+    def load_page():
+        query_following = db.query(models.Follow.followee_id).filter(
+            models.Follow.follower_id == user_id
+        )
+        query = (
+            db.query(*entities)
+            .options(*options)
+            .filter(models.Tweet.user_id.in_(query_following))
+        )
+        return paginate(query, models.Tweet.created_at, models.Tweet.id, cursor, limit)
+
+    return cache.get_timeline(
+        db, "following", user_id, cursor, limit, load_page, options, entities
     )
-    return (
-        db.query(models.Tweet)
-        .filter(
-            or_(
-                models.Tweet.user_id == user_id,
-                models.Tweet.user_id.in_(query_following),
+
+
+def get_tweets_home(
+    user_id: int,
+    db: Session,
+    cursor: str | None = None,
+    limit: int = PAGE_SIZE,
+    options: tuple = TWEET_LOAD,
+    entities: tuple = (models.Tweet,),
+):
+    def load_page():
+        if timeline.TIMELINE_MODE != "pull":
+            return timeline.get_home(user_id, db, cursor, limit, options, entities)
+        query_following = db.query(models.Follow.followee_id).filter(
+            models.Follow.follower_id == user_id
+        )
+        query = (
+            db.query(*entities)
+            .options(*options)
+            .filter(
+                or_(
+                    models.Tweet.user_id == user_id,
+                    models.Tweet.user_id.in_(query_following),
+                )
             )
         )
-        .order_by(models.Tweet.created_at.desc())
-        .all()
+        return paginate(query, models.Tweet.created_at, models.Tweet.id, cursor, limit)
+
+    return cache.get_timeline(
+        db, "home", user_id, cursor, limit, load_page, options, entities
     )
 
 
-def get_tweet_by_id(tweet_id: int, db: Session):
-    return db.query(models.Tweet).filter(models.Tweet.id == tweet_id).first()
+def get_tweet_by_id(tweet_id: int, db: Session, options: tuple = ()):
+    if options:
+        return (
+            db.query(models.Tweet)
+            .options(*options)
+            .filter(models.Tweet.id == tweet_id)
+            .first()
+        )
+    return cache.get_tweet(db, tweet_id)
 
 
 def create_tweet(current_user_id: int, tweet: schemas.TweetBase | str, db: Session):
@@ -152,7 +277,13 @@ def create_tweet(current_user_id: int, tweet: schemas.TweetBase | str, db: Sessi
             content=tweet.content, user_id=current_user_id, created_at=creation_datetime
         )
     db.add(db_tweet)
+    db.flush()
+    timeline.fan_out(db, db_tweet)
+    hashtags = tags.index_tweet(db, db_tweet)
+    ranking.add_tweet(db, db_tweet)
     db.commit()
+    cache.invalidate_profile(current_user_id)
+    trending.record(hashtags, creation_datetime)
     db.refresh(db_tweet)
     return db_tweet
 
@@ -169,24 +300,46 @@ def update_tweet(tweet_id: int, new_content: schemas.TweetBase | str, db: Sessio
     db.query(models.Tweet).filter(models.Tweet.id == tweet_id).update(
         updated_tweet.dict()
     )
+    old_hashtags = tags.unindex_tweet(db, tweet_id)
+    new_hashtags = tags.index_tweet(db, updated_tweet)
     db.commit()
+    cache.invalidate_tweet(tweet_id)
+    trending.record(old_hashtags, updated_tweet.created_at, -1)
+    trending.record(new_hashtags, updated_tweet.created_at)
     updated_tweet = jsonable_encoder(updated_tweet)
     return updated_tweet
 
 
 def delete_tweet(tweet_id: int, db: Session):
     tweet = db.query(models.Tweet).filter(models.Tweet.id == tweet_id).first()
+    author_id, created_at = tweet.user_id, tweet.created_at
+    timeline.prune_tweet(db, tweet_id)
+    hashtags = tags.unindex_tweet(db, tweet_id)
+    ranking.remove_tweet(db, tweet_id)
     db.delete(tweet)
     db.commit()
+    trending.record(hashtags, created_at, -1)
+    cache.invalidate_tweet(tweet_id)
+    cache.invalidate_author(db, author_id)
     return "Tweet has been deleted."
 
 
-def get_comments_tweet(tweet_id: int, db: Session):
-    return db.query(models.Comment).filter(models.Comment.tweet_id == tweet_id).all()
+def get_comments_tweet(tweet_id: int, db: Session, options: tuple = ()):
+    return (
+        db.query(models.Comment)
+        .options(*options)
+        .filter(models.Comment.tweet_id == tweet_id)
+        .all()
+    )
 
 
-def get_comment_by_id(comment_id: int, db: Session):
-    return db.query(models.Comment).filter(models.Comment.id == comment_id).first()
+def get_comment_by_id(comment_id: int, db: Session, options: tuple = ()):
+    return (
+        db.query(models.Comment)
+        .options(*options)
+        .filter(models.Comment.id == comment_id)
+        .first()
+    )
 
 
 def create_comment(
@@ -211,7 +364,10 @@ def create_comment(
             created_at=creation_datetime,
         )
     db.add(db_comment)
+    counters.adjust(db, models.Tweet.comment_count, current_tweet_id, 1)
+    ranking.mark(db, [current_tweet_id])
     db.commit()
+    cache.invalidate_tweet(current_tweet_id)
     db.refresh(db_comment)
     return db_comment
 
@@ -220,7 +376,7 @@ def update_comment(
     comment_id: int, new_content: schemas.CommentBase | str, db: Session
 ):
     db_comment = get_comment_by_id(comment_id, db).__dict__
-    db_comment_model = schemas.Comment(**db_comment)
+    db_comment_model = schemas.CommentCompact(**db_comment)
     if type(new_content) == str:
         update_data = {"content": new_content}
     else:
@@ -237,35 +393,48 @@ def update_comment(
 
 def delete_comment(comment_id: int, db: Session):
     comment = db.query(models.Comment).filter(models.Comment.id == comment_id).first()
-    db.delete()
+    tweet_id = comment.tweet_id
+    db.delete(comment)
+    counters.adjust(db, models.Tweet.comment_count, tweet_id, -1)
+    ranking.mark(db, [tweet_id])
     db.commit()
+    cache.invalidate_tweet(tweet_id)
     return "Comment has been deleted."
 
 
 def check_like(current_tweet_id: int, current_user_id: int, db: Session):
-    return (
-        db.query(models.Like)
-        .filter(
-            models.Like.tweet_id == current_tweet_id,
+    buffered = writebuffer.state(writebuffer.LIKE, current_user_id, current_tweet_id)
+    if buffered is not None:
+        return buffered
+    return db.query(
+        exists().where(
             models.Like.user_id == current_user_id,
+            models.Like.tweet_id == current_tweet_id,
         )
-        .all()
-        .__len__()
-    )
+    ).scalar()
 
 
 def create_like(current_tweet_id: int, current_user_id: int, db: Session):
+    if writebuffer.ENABLED:
+        writebuffer.put(writebuffer.LIKE, current_user_id, current_tweet_id, True)
+        return None
     creation_datetime = datetime.utcnow()
     db_like = models.Like(
         user_id=current_user_id, tweet_id=current_tweet_id, created_at=creation_datetime
     )
     db.add(db_like)
+    counters.adjust(db, models.Tweet.like_count, current_tweet_id, 1)
+    ranking.mark(db, [current_tweet_id])
     db.commit()
+    cache.invalidate_tweet(current_tweet_id)
     db.refresh(db_like)
     return db_like
 
 
 def delete_like(current_tweet_id: int, current_user_id: int, db: Session):
+    if writebuffer.ENABLED:
+        writebuffer.put(writebuffer.LIKE, current_user_id, current_tweet_id, False)
+        return dict()
     like = (
         db.query(models.Like)
         .filter(
@@ -275,5 +444,8 @@ def delete_like(current_tweet_id: int, current_user_id: int, db: Session):
         .first()
     )
     db.delete(like)
+    counters.adjust(db, models.Tweet.like_count, current_tweet_id, -1)
+    ranking.mark(db, [current_tweet_id])
     db.commit()
+    cache.invalidate_tweet(current_tweet_id)
     return dict()
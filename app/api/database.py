@@ -1,12 +1,129 @@
-from sqlalchemy import create_engine
+import random
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.sql.dml import UpdateBase
+
+from . import config
+from .readyourwrites import is_pinned, pin_to_primary
+
+SQLALCHEMY_DATABASE_URL = config.DATABASE_URL
+SQLALCHEMY_ASYNC_DATABASE_URL = config.ASYNC_DATABASE_URL
+
+# WAL lets readers carry on while a writer commits, and NORMAL sync is safe
+# under WAL. busy_timeout makes a second writer wait instead of failing.
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA busy_timeout={config.SQLITE_BUSY_TIMEOUT_MS}",
+    f"PRAGMA mmap_size={config.SQLITE_MMAP_SIZE}",
+    f"PRAGMA cache_size={config.SQLITE_CACHE_SIZE}",
+)
+# Replicas never switch the journal mode and refuse writes outright.
+SQLITE_REPLICA_PRAGMAS = SQLITE_PRAGMAS[1:] + ("PRAGMA query_only=ON",)
+
+
+def is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def engine_options(url: str) -> dict:
+    if is_sqlite(url):
+        return {"connect_args": {"check_same_thread": False}}
+    return {
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_timeout": config.DB_POOL_TIMEOUT,
+        "pool_recycle": config.DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+
+
+def sqlite_pragmas(pragmas: tuple):
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    return set_sqlite_pragmas
+
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./sql_app.db"
+def make_engine(url: str, replica: bool = False, is_async: bool = False):
+    factory = create_async_engine if is_async else create_engine
+    new_engine = factory(url, **engine_options(url))
+    if is_sqlite(url):
+        pragmas = SQLITE_REPLICA_PRAGMAS if replica else SQLITE_PRAGMAS
+        sync_engine = new_engine.sync_engine if is_async else new_engine
+        event.listen(sync_engine, "connect", sqlite_pragmas(pragmas))
+    return new_engine
+
+
+engine = make_engine(SQLALCHEMY_DATABASE_URL)
+replica_engines = [
+    make_engine(url, replica=True) for url in config.DATABASE_REPLICA_URLS
+]
+async_engine = make_engine(SQLALCHEMY_ASYNC_DATABASE_URL, is_async=True)
+async_replica_engines = [
+    make_engine(url, replica=True, is_async=True)
+    for url in config.ASYNC_DATABASE_REPLICA_URLS
+]
+
+
+class RoutingSession(Session):
+    # Sessions opened with info={"read_only": True} send their SELECTs to a
+    # replica; flushes and bulk UPDATE/DELETE statements always go to the
+    # primary, and so does everything for a user inside their read-your-writes
+    # window (see readyourwrites.py). info["username"] names that user.
+    primary = engine
+    replicas = replica_engines
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self._flushing or isinstance(clause, UpdateBase):
+            self.info["wrote"] = True
+            return self.primary
+        if (
+            self.replicas
+            and self.info.get("read_only")
+            and not self.info.get("wrote")
+            and not is_pinned(self.info.get("username"))
+        ):
+            return random.choice(self.replicas)
+        return self.primary
+
+
+class AsyncRoutingSession(RoutingSession):
+    primary = async_engine.sync_engine
+    replicas = [replica.sync_engine for replica in async_replica_engines]
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def pin_writer(session: Session):
+    if session.info.pop("wrote", False) and session.info.get("username"):
+        pin_to_primary(session.info["username"])
+
+
+SessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, bind=engine, class_=RoutingSession
+)
+ReadSessionLocal = sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    bind=engine,
+    class_=RoutingSession,
+    info={"read_only": True},
+)
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+# Objects handed to templates must not expire on commit: attribute refreshes
+# cannot run outside the session's greenlet.
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    autoflush=False,
+    expire_on_commit=False,
+    sync_session_class=AsyncRoutingSession,
 )
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -0,0 +1,97 @@
+import json
+import zlib
+from datetime import datetime
+from typing import Iterator, Optional
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from . import models
+
+EXPORT_BATCH_SIZE = 1000
+
+# Users have no timestamps, so they are always exported in full. Incremental
+# exports are add-only: since= returns rows created or edited at or after the
+# watermark, and rows deleted since then (tweets, comments, unlikes, unfollows)
+# are simply absent, so consumers that need deletions must re-export in full.
+EXPORTS = {
+    "users": (
+        models.User,
+        (
+            models.User.id,
+            models.User.username,
+            models.User.email,
+            models.User.name,
+            models.User.bio,
+            models.User.follower_count,
+            models.User.following_count,
+        ),
+        None,
+    ),
+    "tweets": (
+        models.Tweet,
+        tuple(models.Tweet.__table__.columns),
+        func.coalesce(models.Tweet.updated_at, models.Tweet.created_at),
+    ),
+    "comments": (
+        models.Comment,
+        tuple(models.Comment.__table__.columns),
+        func.coalesce(models.Comment.updated_at, models.Comment.created_at),
+    ),
+    "likes": (
+        models.Like,
+        tuple(models.Like.__table__.columns),
+        models.Like.created_at,
+    ),
+    "followage": (
+        models.Follow,
+        tuple(models.Follow.__table__.columns),
+        models.Follow.created_at,
+    ),
+}
+
+
+def export_rows(db: Session, table: str, since: Optional[datetime] = None):
+    model, columns, watermark = EXPORTS[table]
+    statement = select(*columns).order_by(model.id)
+    if since is not None and watermark is not None:
+        statement = statement.where(watermark >= since)
+    result = db.execute(
+        statement.execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE)
+    )
+    for row in result:
+        yield row._asdict()
+
+
+def ndjson(
+    db: Session, table: str, since: Optional[datetime] = None
+) -> Iterator[bytes]:
+    lines = []
+    for row in export_rows(db, table, since):
+        lines.append(json.dumps(jsonable_encoder(row), ensure_ascii=False))
+        if len(lines) == EXPORT_BATCH_SIZE:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def gzipped(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def stream(
+    session_factory, table: str, since: Optional[datetime] = None, gzip: bool = False
+) -> Iterator[bytes]:
+    db = session_factory()
+    try:
+        chunks = ndjson(db, table, since)
+        yield from gzipped(chunks) if gzip else chunks
+    finally:
+        db.close()
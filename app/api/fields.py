@@ -0,0 +1,101 @@
+from typing import Iterable, Optional
+
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+
+from . import models, schemas
+from .loading import expand_load
+
+MAX_EXPAND_DEPTH = 3
+
+COMPACT_SCHEMAS = {
+    models.User: schemas.UserCompact,
+    models.Follow: schemas.FollowCompact,
+    models.Tweet: schemas.TweetCompact,
+    models.Comment: schemas.CommentCompact,
+    models.Like: schemas.LikeCompact,
+}
+
+EXPANSIONS = {
+    models.User: {"following", "followers"},
+    models.Follow: {"user_follower", "user_followee"},
+    models.Tweet: {"owner", "comments", "likes"},
+    models.Comment: {"owner", "tweet"},
+    models.Like: {"owner", "tweet"},
+}
+
+
+def invalid(detail: str):
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+
+def split(value: Optional[str]) -> list[str]:
+    if not value:
+        return []
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def related_model(model, name: str):
+    return getattr(model, name).property.mapper.class_
+
+
+class Selection:
+    def __init__(self, model, fields: Optional[set[str]], expand: dict):
+        self.model = model
+        self.fields = fields
+        self.expand = expand
+
+    @classmethod
+    def parse(cls, model, fields: Optional[str], expand: Optional[str]):
+        allowed = set(COMPACT_SCHEMAS[model].__fields__)
+        selected = set(split(fields)) or None
+        if selected and selected - allowed:
+            unknown = ", ".join(sorted(selected - allowed))
+            raise invalid(f"Unknown fields: {unknown}.")
+        tree: dict = {}
+        for path in split(expand):
+            names = path.split(".")
+            if len(names) > MAX_EXPAND_DEPTH:
+                raise invalid(f"Expansion {path} is nested too deeply.")
+            target, node = model, tree
+            for name in names:
+                if name not in EXPANSIONS[target]:
+                    raise invalid(f"Unknown expansion: {path}.")
+                node = node.setdefault(name, {})
+                target = related_model(target, name)
+        return cls(model, selected, tree)
+
+    def load(self) -> tuple:
+        return expand_load(self.model, self.expand)
+
+    def render(self, instance) -> dict:
+        return jsonable_encoder(
+            self._render(self.model, instance, self.fields, self.expand)
+        )
+
+    def render_all(self, instances: Iterable) -> list[dict]:
+        return [self.render(instance) for instance in instances]
+
+    def _render(self, model, instance, fields, expand) -> dict:
+        data = COMPACT_SCHEMAS[model].from_orm(instance).dict(include=fields)
+        for name, nested in expand.items():
+            target = related_model(model, name)
+            value = getattr(instance, name)
+            if value is None:
+                data[name] = None
+            elif isinstance(value, list):
+                data[name] = [
+                    self._render(target, item, None, nested) for item in value
+                ]
+            else:
+                data[name] = self._render(target, value, None, nested)
+        return data
+
+
+def selection(model):
+    def select_fields(
+        fields: Optional[str] = None, expand: Optional[str] = None
+    ) -> Selection:
+        return Selection.parse(model, fields, expand)
+
+    return select_fields
@@ -0,0 +1,226 @@
+import sys
+from array import array
+from bisect import bisect_left
+from itertools import accumulate
+from threading import Lock
+
+from sqlalchemy.orm import Session
+
+from . import config, models
+from .database import SessionLocal
+
+# An optional in-memory copy of followage for membership and adjacency
+# questions. Each direction is stored in CSR form: the neighbours of user u
+# are targets[offsets[u]:offsets[u + 1]], sorted, in flat arrays indexed by
+# user id, so an edge costs one 4-byte slot per direction. Follows and
+# unfollows since the last compaction are kept in small per-user delta sets
+# and folded into new arrays once there are COMPACT_THRESHOLD of them.
+# Each process only sees its own writes, so enable it with FOLLOW_GRAPH=1 on
+# single-process deployments.
+ENABLED = config.FOLLOW_GRAPH
+COMPACT_THRESHOLD = 10000
+LOAD_BATCH = 50000
+
+
+class Adjacency:
+    def __init__(self, pairs: list[tuple[int, int]], size: int):
+        # pairs must be sorted by (source, target).
+        degrees = [0] * (size + 1)
+        for source, _ in pairs:
+            degrees[source + 1] += 1
+        self.offsets = array("Q", accumulate(degrees))
+        self.targets = array("I", (target for _, target in pairs))
+        self.added: dict[int, set[int]] = {}
+        self.removed: dict[int, set[int]] = {}
+        self.edits = 0
+
+    def base(self, node: int) -> array:
+        if node + 1 >= len(self.offsets):
+            return array("I")
+        return self.targets[self.offsets[node] : self.offsets[node + 1]]
+
+    def contains(self, source: int, target: int) -> bool:
+        if target in self.added.get(source, ()):
+            return True
+        if target in self.removed.get(source, ()):
+            return False
+        if source + 1 >= len(self.offsets):
+            return False
+        start, end = self.offsets[source], self.offsets[source + 1]
+        index = bisect_left(self.targets, target, start, end)
+        return index < end and self.targets[index] == target
+
+    def neighbours(self, node: int) -> list[int]:
+        removed = self.removed.get(node, ())
+        merged = [target for target in self.base(node) if target not in removed]
+        added = self.added.get(node)
+        if added:
+            merged = sorted(set(merged) | added)
+        return merged
+
+    def degree(self, node: int) -> int:
+        base = 0
+        if node + 1 < len(self.offsets):
+            base = self.offsets[node + 1] - self.offsets[node]
+        return base + len(self.added.get(node, ())) - len(self.removed.get(node, ()))
+
+    def add(self, source: int, target: int):
+        self.edits += 1
+        removed = self.removed.get(source)
+        if removed and target in removed:
+            removed.discard(target)
+        else:
+            self.added.setdefault(source, set()).add(target)
+
+    def remove(self, source: int, target: int):
+        self.edits += 1
+        added = self.added.get(source)
+        if added and target in added:
+            added.discard(target)
+        else:
+            self.removed.setdefault(source, set()).add(target)
+
+    def size(self) -> int:
+        return (
+            len(self.targets)
+            + sum(map(len, self.added.values()))
+            - sum(map(len, self.removed.values()))
+        )
+
+    def edges(self):
+        for node in range(len(self.offsets) - 1):
+            for target in self.neighbours(node):
+                yield node, target
+        for node in self.added:
+            if node >= len(self.offsets) - 1:
+                for target in sorted(self.added[node]):
+                    yield node, target
+
+    def nbytes(self) -> int:
+        return (
+            self.offsets.itemsize * len(self.offsets)
+            + self.targets.itemsize * len(self.targets)
+            + sum(sys.getsizeof(delta) for delta in self.added.values())
+            + sum(sys.getsizeof(delta) for delta in self.removed.values())
+        )
+
+
+class FollowGraph:
+    def __init__(self, pairs: list[tuple[int, int]]):
+        self.lock = Lock()
+        self.build(pairs)
+
+    def build(self, pairs: list[tuple[int, int]]):
+        size = 1 + max((max(pair) for pair in pairs), default=0)
+        pairs.sort()
+        self.following = Adjacency(pairs, size)
+        reverse = sorted((followee, follower) for follower, followee in pairs)
+        self.followers = Adjacency(reverse, size)
+
+    def is_following(self, follower_id: int, followee_id: int) -> bool:
+        with self.lock:
+            return self.following.contains(follower_id, followee_id)
+
+    def followed_among(self, follower_id: int, user_ids) -> set[int]:
+        with self.lock:
+            return {
+                user_id
+                for user_id in user_ids
+                if self.following.contains(follower_id, user_id)
+            }
+
+    def get_following(self, user_id: int) -> list[int]:
+        with self.lock:
+            return self.following.neighbours(user_id)
+
+    def get_followers(self, user_id: int) -> list[int]:
+        with self.lock:
+            return self.followers.neighbours(user_id)
+
+    def counts(self, user_id: int) -> tuple[int, int]:
+        with self.lock:
+            return self.followers.degree(user_id), self.following.degree(user_id)
+
+    def mutuals(self, user_id: int) -> list[int]:
+        with self.lock:
+            followers = set(self.followers.neighbours(user_id))
+            return [id for id in self.following.neighbours(user_id) if id in followers]
+
+    def add(self, follower_id: int, followee_id: int):
+        with self.lock:
+            if not self.following.contains(follower_id, followee_id):
+                self.following.add(follower_id, followee_id)
+                self.followers.add(followee_id, follower_id)
+            self.maybe_compact()
+
+    def remove(self, follower_id: int, followee_id: int):
+        with self.lock:
+            if self.following.contains(follower_id, followee_id):
+                self.following.remove(follower_id, followee_id)
+                self.followers.remove(followee_id, follower_id)
+            self.maybe_compact()
+
+    def remove_user(self, user_id: int):
+        with self.lock:
+            for followee_id in self.following.neighbours(user_id):
+                self.following.remove(user_id, followee_id)
+                self.followers.remove(followee_id, user_id)
+            for follower_id in self.followers.neighbours(user_id):
+                self.following.remove(follower_id, user_id)
+                self.followers.remove(user_id, follower_id)
+            self.maybe_compact()
+
+    def maybe_compact(self):
+        if self.following.edits >= COMPACT_THRESHOLD:
+            self.build(list(self.following.edges()))
+
+    def stats(self) -> dict:
+        with self.lock:
+            pending = self.following.edits
+            edges = self.following.size()
+            nbytes = self.following.nbytes() + self.followers.nbytes()
+            id_space = len(self.following.offsets) - 1
+        return {
+            "id_space": id_space,
+            "edges": edges,
+            "pending_edits": pending,
+            "bytes": nbytes,
+            "bytes_per_edge": nbytes / edges if edges else 0.0,
+        }
+
+
+_graph: FollowGraph | None = None
+
+
+def load(db: Session | None = None) -> FollowGraph:
+    global _graph
+    session = db or SessionLocal()
+    try:
+        pairs, last_id = [], 0
+        while True:
+            batch = (
+                session.query(
+                    models.Follow.id,
+                    models.Follow.follower_id,
+                    models.Follow.followee_id,
+                )
+                .filter(models.Follow.id > last_id)
+                .order_by(models.Follow.id)
+                .limit(LOAD_BATCH)
+                .all()
+            )
+            if not batch:
+                break
+            pairs.extend(
+                (follower_id, followee_id) for _, follower_id, followee_id in batch
+            )
+            last_id = batch[-1].id
+    finally:
+        if db is None:
+            session.close()
+    _graph = FollowGraph(pairs)
+    return _graph
+
+
+def get() -> FollowGraph | None:
+    return _graph if ENABLED else None
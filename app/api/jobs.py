@@ -0,0 +1,316 @@
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+from threading import Event, Lock, Thread
+from typing import Callable, Iterable
+
+from sqlalchemy import delete, event, func, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from . import config, models
+from .database import SessionLocal
+
+# Side effects that do not have to finish before a write returns are queued in
+# the jobs table and run by WORKERS threads. enqueue() adds the job to the
+# caller's transaction, so it becomes runnable exactly when the write commits
+# and never runs for a write that rolled back. A worker claims a job by moving
+# its run_at LEASE_SECONDS ahead; if the worker dies, the job is claimed again
+# once the lease runs out, so handlers commit their own work and must be safe
+# to run twice. Failures are retried RETRY_SECONDS * 2 ** (attempt - 1) later,
+# up to MAX_ATTEMPTS times, and a job still running when the lease of its
+# last attempt runs out is failed. A job with an idempotency key is queued at
+# most once per key; with requeue=True a key whose job has already run, or is
+# running, is queued again, while one that is still waiting absorbs the new
+# request.
+WORKERS = config.JOB_WORKERS
+POLL_SECONDS = 1
+LEASE_SECONDS = 60
+MAX_ATTEMPTS = 5
+RETRY_SECONDS = 2
+CLAIM_BATCH = 10
+RETENTION_SECONDS = 24 * 60 * 60
+PRUNE_SECONDS = 600
+LATENCY_SAMPLE = 1000
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+logger = logging.getLogger(__name__)
+
+handlers: dict[str, Callable[[Session, dict], None]] = {}
+
+_wake = Event()
+_workers: list[Thread] = []
+_prune_lock = Lock()
+_last_prune: float | None = None
+
+
+def handler(kind: str):
+    def register(function):
+        handlers[kind] = function
+        return function
+
+    return register
+
+
+def insert_job(db: Session, requeue: bool = False):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        statement = postgresql.insert(models.Job)
+    elif dialect == "sqlite":
+        statement = sqlite.insert(models.Job)
+    else:
+        return insert(models.Job)
+    if not requeue:
+        return statement.on_conflict_do_nothing(index_elements=["idempotency_key"])
+    return statement.on_conflict_do_update(
+        index_elements=["idempotency_key"],
+        set_={
+            "payload": statement.excluded.payload,
+            "status": PENDING,
+            "attempts": 0,
+            "run_at": statement.excluded.run_at,
+            "created_at": statement.excluded.created_at,
+            "finished_at": None,
+            "last_error": None,
+        },
+        where=models.Job.status != PENDING,
+    )
+
+
+def enqueue_many(
+    db: Session,
+    kind: str,
+    jobs: Iterable[tuple[dict, str | None]],
+    delay: float = 0,
+    requeue: bool = False,
+):
+    now = datetime.utcnow()
+    values = [
+        {
+            "kind": kind,
+            "payload": json.dumps(payload),
+            "idempotency_key": key,
+            "status": PENDING,
+            "attempts": 0,
+            "run_at": now + timedelta(seconds=delay),
+            "created_at": now,
+        }
+        for payload, key in jobs
+    ]
+    if values:
+        db.execute(insert_job(db, requeue), values)
+        db.info["enqueued"] = True
+
+
+def enqueue(
+    db: Session,
+    kind: str,
+    payload: dict,
+    key: str | None = None,
+    delay: float = 0,
+    requeue: bool = False,
+):
+    enqueue_many(db, kind, [(payload, key)], delay, requeue)
+
+
+@event.listens_for(Session, "after_commit")
+def wake_workers(session: Session):
+    if session.info.pop("enqueued", False):
+        _wake.set()
+
+
+@event.listens_for(Session, "after_rollback")
+def forget_enqueued(session: Session):
+    session.info.pop("enqueued", None)
+
+
+def claim(db: Session) -> models.Job | None:
+    now = datetime.utcnow()
+    candidates = (
+        db.query(models.Job.id, models.Job.run_at, models.Job.attempts)
+        .filter(models.Job.status.in_((PENDING, RUNNING)), models.Job.run_at <= now)
+        .order_by(models.Job.run_at)
+        .limit(CLAIM_BATCH)
+        .all()
+    )
+    abandoned = 0
+    for id, run_at, attempts in candidates:
+        if attempts >= MAX_ATTEMPTS:
+            # The lease of its last attempt ran out: the job killed or hung its
+            # worker every time, so it fails instead of being claimed again.
+            values = {
+                models.Job.status: FAILED,
+                models.Job.finished_at: now,
+                models.Job.last_error: "Lease ran out on the last attempt.",
+            }
+        else:
+            values = {
+                models.Job.status: RUNNING,
+                models.Job.run_at: now + timedelta(seconds=LEASE_SECONDS),
+                models.Job.attempts: models.Job.attempts + 1,
+            }
+        # Another worker that saw the same run_at has already moved it.
+        claimed = (
+            db.query(models.Job)
+            .filter(
+                models.Job.id == id,
+                models.Job.run_at == run_at,
+                models.Job.attempts == attempts,
+                models.Job.status.in_((PENDING, RUNNING)),
+            )
+            .update(values, synchronize_session=False)
+        )
+        db.commit()
+        if claimed and attempts >= MAX_ATTEMPTS:
+            logger.error("Job %s never finished its last attempt", id)
+            abandoned += 1
+        elif claimed:
+            return db.get(models.Job, id)
+    if abandoned:
+        return claim(db)
+    return None
+
+
+def finish(db: Session, job_id: int, lease: datetime, values: dict):
+    # A job that was requeued, or claimed again after its lease ran out, has a
+    # new run_at by now and is left to its next run.
+    db.query(models.Job).filter(
+        models.Job.id == job_id, models.Job.run_at == lease
+    ).update(values, synchronize_session=False)
+    db.commit()
+
+
+def run(db: Session, job: models.Job):
+    job_id, kind, payload = job.id, job.kind, json.loads(job.payload)
+    lease, attempts = job.run_at, job.attempts
+    try:
+        if kind not in handlers:
+            raise LookupError(f"No handler for {kind} jobs.")
+        handlers[kind](db, payload)
+    except Exception as error:
+        db.rollback()
+        if attempts >= MAX_ATTEMPTS:
+            logger.exception("Job %s (%s) failed for good", job_id, kind)
+            values = {"status": FAILED, "finished_at": datetime.utcnow()}
+        else:
+            logger.warning("Job %s (%s) failed, retrying: %r", job_id, kind, error)
+            values = {
+                "status": PENDING,
+                "run_at": datetime.utcnow()
+                + timedelta(seconds=RETRY_SECONDS * 2 ** (attempts - 1)),
+            }
+        finish(db, job_id, lease, {**values, "last_error": repr(error)})
+        return
+    finish(
+        db,
+        job_id,
+        lease,
+        {"status": DONE, "finished_at": datetime.utcnow(), "last_error": None},
+    )
+
+
+def run_pending(db: Session, limit: int | None = None) -> int:
+    count = 0
+    while limit is None or count < limit:
+        job = claim(db)
+        if job is None:
+            break
+        run(db, job)
+        count += 1
+    return count
+
+
+def prune(db: Session) -> int:
+    cutoff = datetime.utcnow() - timedelta(seconds=RETENTION_SECONDS)
+    result = db.execute(
+        delete(models.Job).where(
+            models.Job.status == DONE, models.Job.finished_at < cutoff
+        )
+    )
+    db.commit()
+    return result.rowcount
+
+
+def maybe_prune(db: Session):
+    global _last_prune
+    with _prune_lock:
+        due = _last_prune is None or time.monotonic() - _last_prune >= PRUNE_SECONDS
+        if due:
+            _last_prune = time.monotonic()
+    if due:
+        prune(db)
+
+
+def run_worker():
+    while True:
+        db = SessionLocal()
+        try:
+            ran = run_pending(db)
+            if not ran:
+                maybe_prune(db)
+        except SQLAlchemyError:
+            logger.exception("Job worker failed")
+            ran = 0
+        finally:
+            db.close()
+        if not ran:
+            _wake.wait(POLL_SECONDS)
+            _wake.clear()
+
+
+def start(workers: int = WORKERS) -> list[Thread]:
+    _workers[:] = [thread for thread in _workers if thread.is_alive()]
+    while len(_workers) < workers:
+        thread = Thread(target=run_worker, name=f"jobs-{len(_workers)}", daemon=True)
+        thread.start()
+        _workers.append(thread)
+    return _workers
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def stats(db: Session) -> dict:
+    now = datetime.utcnow()
+    depth = dict(
+        db.query(models.Job.status, func.count(models.Job.id)).group_by(
+            models.Job.status
+        )
+    )
+    oldest = (
+        db.query(func.min(models.Job.run_at))
+        .filter(models.Job.status == PENDING, models.Job.run_at <= now)
+        .scalar()
+    )
+    finished = (
+        db.query(models.Job.created_at, models.Job.finished_at)
+        .filter(models.Job.finished_at.isnot(None), models.Job.status == DONE)
+        .order_by(models.Job.finished_at.desc())
+        .limit(LATENCY_SAMPLE)
+    )
+    latencies = sorted(
+        (finished_at - created_at).total_seconds()
+        for created_at, finished_at in finished
+    )
+    return {
+        "workers": sum(thread.is_alive() for thread in _workers),
+        "depth": {status: depth.get(status, 0) for status in (PENDING, RUNNING)},
+        "failed": depth.get(FAILED, 0),
+        "done": depth.get(DONE, 0),
+        "oldest_ready_seconds": (now - oldest).total_seconds() if oldest else 0.0,
+        "latency_seconds": {
+            "samples": len(latencies),
+            "p50": percentile(latencies, 0.5),
+            "p95": percentile(latencies, 0.95),
+            "max": latencies[-1] if latencies else 0.0,
+        },
+    }
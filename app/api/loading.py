@@ -0,0 +1,24 @@
+from sqlalchemy.orm import selectinload
+
+from . import models
+
+# What the tweet and comment partials render: the author and each comment's
+# author.
+COMMENT_LOAD = (selectinload(models.Comment.owner),)
+
+TWEET_LOAD = (
+    selectinload(models.Tweet.owner),
+    selectinload(models.Tweet.comments).options(*COMMENT_LOAD),
+)
+
+
+def expand_load(model, expand: dict) -> tuple:
+    options = []
+    for name, nested in expand.items():
+        attribute = getattr(model, name)
+        loader = selectinload(attribute)
+        if nested:
+            target = attribute.property.mapper.class_
+            loader = loader.options(*expand_load(target, nested))
+        options.append(loader)
+    return tuple(options)
@@ -1,43 +1,119 @@
-from datetime import datetime, timedelta
-from typing import Annotated, List
-
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime
+from typing import Annotated, List, Optional
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    Form,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from . import auth, crud, models, schemas
-from .database import Base, SessionLocal, engine
+from . import (
+    async_crud,
+    auth,
+    batch,
+    cache,
+    crud,
+    export,
+    fields,
+    graph,
+    jobs,
+    migrations,
+    models,
+    pagination,
+    schemas,
+    search,
+    serializers,
+    suggestions,
+    tags,
+    tokens,
+    trending,
+    writebuffer,
+)
+from .database import (
+    AsyncSessionLocal,
+    Base,
+    ReadSessionLocal,
+    SessionLocal,
+    engine,
+)
+from .viewer import get_viewer_state
 
-models.Base.metadata.create_all(bind=engine)
+migrations.upgrade(engine)
+tokens.start_revocation_loader()
+trending.start_checkpointer()
+jobs.start()
+if graph.ENABLED:
+    graph.load()
+if writebuffer.ENABLED:
+    writebuffer.start()
 
 
-def get_db():
-    db = SessionLocal()
+READ_METHODS = ("GET", "HEAD")
+
+
+def get_db(request: Request):
+    db = SessionLocal(info={"read_only": request.method in READ_METHODS})
     try:
         yield db
     finally:
         db.close()
 
 
+async def get_async_db(request: Request):
+    bearer = auth.get_bearer(request.cookies.get("bearer"))
+    info = {
+        "read_only": request.method in READ_METHODS,
+        "username": bearer.username if bearer else None,
+    }
+    async with AsyncSessionLocal(info=info) as db:
+        yield db
+
+
 router = APIRouter()
 
 
 @router.post("/token", response_model=auth.Token)
 async def login_for_access_token(
-    db: Session = Depends(get_db), form_data: OAuth2PasswordRequestForm = Depends()
+    db: AsyncSession = Depends(get_async_db),
+    form_data: OAuth2PasswordRequestForm = Depends(),
 ):
-    user = auth.authenticate_user(db, form_data.username, form_data.password)
+    user = await async_crud.authenticate_user(
+        db, form_data.username, form_data.password
+    )
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token_expires = timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = auth.create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
-    )
-    return {"access_token": access_token, "token_type": "bearer"}
+    return await db.run_sync(lambda session: tokens.create_tokens(session, user))
+
+
+@router.post("/token/refresh", response_model=auth.Token)
+async def refresh_access_token(
+    refresh_token: str = Form(), db: AsyncSession = Depends(get_async_db)
+):
+    renewed = await db.run_sync(lambda session: tokens.rotate(session, refresh_token))
+    if not renewed:
+        raise auth.credential_exception()
+    return renewed
+
+
+@router.post("/token/revoke")
+async def revoke_refresh_token(
+    refresh_token: str = Form(), db: AsyncSession = Depends(get_async_db)
+):
+    await db.run_sync(lambda session: tokens.revoke(session, refresh_token))
+    return "Token has been revoked."
 
 
 @router.post("/users", response_model=schemas.User)
@@ -48,18 +124,55 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
     return crud.create_user(db=db, user=user)
 
 
-@router.get("/users/me", response_model=schemas.User)
+def get_current_user(
+    db: Session = Depends(get_db), token: str = Depends(auth.oauth2_scheme)
+) -> auth.Principal:
+    principal = auth.get_principal(db, token)
+    if tokens.is_revoked(principal.session):
+        raise auth.credential_exception()
+    db.info["username"] = principal.username
+    return principal
+
+
+def get_admin_user(
+    current_user: auth.Principal = Depends(get_current_user),
+) -> auth.Principal:
+    if not auth.is_admin(current_user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Admins only."
+        )
+    return current_user
+
+
+@router.get("/users/me")
 def read_users_me(
-    db: Session = Depends(get_db), username: str = Depends(auth.get_current_username)
+    current_user: auth.Principal = Depends(get_current_user),
+    selection: fields.Selection = Depends(fields.selection(models.User)),
+    db: Session = Depends(get_db),
 ):
-    current_user = auth.get_user(db, username)
-    return current_user
+    if selection.expand:
+        user = crud.get_user_by_id(db, current_user.id, selection.load())
+    else:
+        user = crud.get_user_by_username(db, current_user.username)
+    return selection.render(user)
+
+
+@router.get("/users/me/suggestions", response_model=List[schemas.Suggestion])
+def read_suggestions(
+    limit: int = Query(default=suggestions.SUGGESTIONS_SIZE, ge=1, le=100),
+    current_user: auth.Principal = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    return [
+        {"user": user, "followed_by": followed_by}
+        for user, followed_by in suggestions.get_suggestions(db, current_user.id, limit)
+    ]
 
 
 @router.put("/users/me", response_model=schemas.UserBasic)
 def update_user_me(
     db: Session = Depends(get_db),
-    current_user: schemas.UserBasic = Depends(read_users_me),
+    current_user: auth.Principal = Depends(get_current_user),
     new_details: schemas.UserBasic = Depends(),
 ):
     if new_details.id != current_user.id:
@@ -73,20 +186,21 @@ def update_user_me(
 @router.delete("/users/me")
 def delete_user_me(
     user_credentials: schemas.UserCreate,
-    current_user: schemas.UserBasic = Depends(read_users_me),
+    current_user: auth.Principal = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    if not auth.get_user(db, user_credentials.username):
+    user = auth.get_user(db, user_credentials.username)
+    if not user:
         raise HTTPException(
             status_code=400,
             detail="Username or password does not match authenticated user.",
         )
-    if current_user.id != auth.get_user(db, user_credentials.username).id:
+    if current_user.id != user.id:
         raise HTTPException(
             status_code=400,
             detail="Username or password does not match authenticated user.",
         )
-    if not auth.verify_password(user_credentials.password, current_user.password):
+    if not auth.verify_password(user_credentials.password, user.password):
         raise HTTPException(
             status_code=400,
             detail="Username or password does not match authenticated user.",
@@ -94,10 +208,53 @@ def delete_user_me(
     return crud.delete_user(db, current_user.id)
 
 
-@router.post("/follow/{followee_user_id:int}", response_model=schemas.Follow)
+@router.get("/cache/stats")
+def read_cache_stats(current_user: auth.Principal = Depends(get_admin_user)):
+    return cache.stats()
+
+
+@router.get("/jobs/stats")
+def read_job_stats(
+    current_user: auth.Principal = Depends(get_admin_user),
+    db: Session = Depends(get_db),
+):
+    return jobs.stats(db)
+
+
+@router.get("/graph/stats")
+def read_graph_stats(current_user: auth.Principal = Depends(get_admin_user)):
+    follow_graph = graph.get()
+    if not follow_graph:
+        raise HTTPException(status_code=404, detail="Follow graph is not enabled.")
+    return follow_graph.stats()
+
+
+@router.get("/export/{table}")
+def export_table(
+    table: str,
+    since: Optional[datetime] = None,
+    gzip: bool = False,
+    current_user: auth.Principal = Depends(get_admin_user),
+):
+    if table not in export.EXPORTS:
+        raise HTTPException(status_code=404, detail="Unknown export table.")
+    filename = f"{table}.ndjson.gz" if gzip else f"{table}.ndjson"
+    headers = {
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "X-Export-Watermark": datetime.utcnow().isoformat(),
+    }
+    return StreamingResponse(
+        export.stream(ReadSessionLocal, table, since, gzip),
+        media_type="application/gzip" if gzip else "application/x-ndjson",
+        headers=headers,
+    )
+
+
+@router.post("/follow/{followee_user_id:int}")
 def create_follow(
     followee_user_id: int,
-    current_user: schemas.User = Depends(read_users_me),
+    current_user: auth.Principal = Depends(get_current_user),
+    selection: fields.Selection = Depends(fields.selection(models.Follow)),
     db: Session = Depends(get_db),
 ):
     if followee_user_id == current_user.id:
@@ -106,73 +263,185 @@ def create_follow(
     if not db_followee_id:
         raise HTTPException(status_code=400, detail="Followee id does not exist.")
     following_check = crud.check_following(current_user.id, followee_user_id, db)
-    if following_check != 0:
+    if following_check:
         raise HTTPException(status_code=400, detail="Already following this person.")
-    return crud.create_follow(current_user.id, followee_user_id, db)
+    db_follow = crud.create_follow(current_user.id, followee_user_id, db)
+    if db_follow is None:
+        return Response(status_code=status.HTTP_202_ACCEPTED)
+    return selection.render(db_follow)
+
 
+@router.get("/follow/{user_id:int}/followers")
+def read_followers(
+    user_id: int,
+    selection: fields.Selection = Depends(fields.selection(models.Follow)),
+    db: Session = Depends(get_db),
+):
+    return selection.render_all(crud.get_followers(user_id, db, selection.load()))
 
-@router.get("/follow/{user_id:int}/followers", response_model=List[schemas.Follow])
-def read_followers(user_id: int, db: Session = Depends(get_db)):
-    return crud.get_followers(user_id, db)
 
+@router.get("/follow/{user_id:int}/following")
+def read_following(
+    user_id: int,
+    selection: fields.Selection = Depends(fields.selection(models.Follow)),
+    db: Session = Depends(get_db),
+):
+    return selection.render_all(crud.get_following(user_id, db, selection.load()))
 
-@router.get("/follow/{user_id:int}/following", response_model=List[schemas.Follow])
-def read_following(user_id: int, db: Session = Depends(get_db)):
-    return crud.get_following(user_id, db)
+
+@router.get("/follow/{user_id:int}/connections", response_model=schemas.Connections)
+def read_connections(user_id: int):
+    follow_graph = graph.get()
+    if not follow_graph:
+        raise HTTPException(status_code=404, detail="Follow graph is not enabled.")
+    follower_count, following_count = follow_graph.counts(user_id)
+    return {
+        "user_id": user_id,
+        "follower_count": follower_count,
+        "following_count": following_count,
+        "followers": follow_graph.get_followers(user_id),
+        "following": follow_graph.get_following(user_id),
+        "mutuals": follow_graph.mutuals(user_id),
+    }
 
 
 @router.delete("/follow/{followee_user_id:int}")
 def delete_follow(
     followee_user_id: int,
-    current_user: schemas.User = Depends(read_users_me),
+    current_user: auth.Principal = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     db_followee_id = crud.get_user_by_id(db, followee_user_id)
     if not db_followee_id:
         raise HTTPException(status_code=400, detail="Followee id does not exist.")
     following_check = crud.check_following(current_user.id, followee_user_id, db)
-    if following_check == 0:
+    if not following_check:
         raise HTTPException(status_code=400, detail="You're not following this person.")
     return crud.delete_follow(current_user.id, followee_user_id, db)
 
 
-@router.get("/tweets", response_model=List[schemas.Tweet])
+def render_tweet_page(load_page, response, limit, selection, viewer_id, db):
+    if serializers.FAST_RESPONSES and not selection.expand:
+        rows = load_page((), serializers.TWEET_COLUMNS)
+        viewer = get_viewer_state(db, viewer_id, rows)
+        cursor = pagination.next_cursor(rows, limit)
+        headers = {pagination.NEXT_CURSOR_HEADER: cursor} if cursor else None
+        return serializers.tweets_response(
+            rows, viewer.liked_tweet_ids, selection.fields, headers
+        )
+    tweets = load_page(selection.load(), (models.Tweet,))
+    pagination.set_next_cursor(response, tweets, limit)
+    get_viewer_state(db, viewer_id, tweets).annotate(tweets)
+    return selection.render_all(tweets)
+
+
+@router.get("/tweets")
 def read_tweets_explore(
-    current_user: schemas.User = Depends(read_users_me), db: Session = Depends(get_db)
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(default=pagination.PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+    current_user: auth.Principal = Depends(get_current_user),
+    selection: fields.Selection = Depends(fields.selection(models.Tweet)),
+    db: Session = Depends(get_db),
 ):
-    return crud.get_tweets_explore(current_user.id, db)
+    def load_page(options, entities):
+        return crud.get_tweets_explore(
+            current_user.id, db, cursor, limit, options, entities
+        )
+
+    return render_tweet_page(load_page, response, limit, selection, current_user.id, db)
 
 
-@router.get("/tweets/{user_id:int}", response_model=List[schemas.Tweet])
+@router.get("/tweets/{user_id:int}")
 def read_tweets_user(
     user_id: int,
-    current_user: schemas.User = Depends(read_users_me),
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(default=pagination.PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+    current_user: auth.Principal = Depends(get_current_user),
+    selection: fields.Selection = Depends(fields.selection(models.Tweet)),
     db: Session = Depends(get_db),
 ):
-    return crud.get_tweets_user(user_id, db)
+    def load_page(options, entities):
+        return crud.get_tweets_user(user_id, db, cursor, limit, options, entities)
 
+    return render_tweet_page(load_page, response, limit, selection, current_user.id, db)
 
-@router.get("/tweets/following", response_model=List[schemas.Tweet])
+
+@router.get("/tweets/following")
 def read_tweets_following(
-    current_user: schemas.User = Depends(read_users_me), db: Session = Depends(get_db)
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(default=pagination.PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+    current_user: auth.Principal = Depends(get_current_user),
+    selection: fields.Selection = Depends(fields.selection(models.Tweet)),
+    db: Session = Depends(get_db),
+):
+    def load_page(options, entities):
+        return crud.get_tweets_following(
+            current_user.id, db, cursor, limit, options, entities
+        )
+
+    return render_tweet_page(load_page, response, limit, selection, current_user.id, db)
+
+
+@router.get("/hashtags/{tag}")
+def read_tweets_hashtag(
+    tag: str,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(default=pagination.PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+    current_user: auth.Principal = Depends(get_current_user),
+    selection: fields.Selection = Depends(fields.selection(models.Tweet)),
+    db: Session = Depends(get_db),
+):
+    def load_page(options, entities):
+        return tags.get_tweets_hashtag(tag, db, cursor, limit, options, entities)
+
+    return render_tweet_page(load_page, response, limit, selection, current_user.id, db)
+
+
+@router.get("/mentions")
+def read_tweets_mentions(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(default=pagination.PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+    current_user: auth.Principal = Depends(get_current_user),
+    selection: fields.Selection = Depends(fields.selection(models.Tweet)),
+    db: Session = Depends(get_db),
+):
+    def load_page(options, entities):
+        return tags.get_tweets_mentions(
+            current_user.id, db, cursor, limit, options, entities
+        )
+
+    return render_tweet_page(load_page, response, limit, selection, current_user.id, db)
+
+
+@router.get("/trending", response_model=List[schemas.Trend])
+def read_trending(
+    limit: int = Query(default=trending.TRENDING_SIZE, ge=1, le=100),
+    current_user: auth.Principal = Depends(get_current_user),
 ):
-    return crud.get_tweets_following(current_user.id, db)
+    return [{"tag": tag, "count": count} for tag, count in trending.trending(limit)]
 
 
-@router.post("/tweets", response_model=schemas.Tweet)
+@router.post("/tweets")
 def create_tweet(
     tweet: schemas.TweetBase,
-    current_user: schemas.User = Depends(read_users_me),
+    current_user: auth.Principal = Depends(get_current_user),
+    selection: fields.Selection = Depends(fields.selection(models.Tweet)),
     db: Session = Depends(get_db),
 ):
-    return crud.create_tweet(current_user.id, tweet, db)
+    return selection.render(crud.create_tweet(current_user.id, tweet, db))
 
 
-@router.put("/tweets/{tweet_id:int}", response_model=schemas.Tweet)
+@router.put("/tweets/{tweet_id:int}")
 def update_tweet(
-    tweet_id,
+    tweet_id: int,
     new_content: schemas.TweetBase,
-    current_user: schemas.User = Depends(read_users_me),
+    current_user: auth.Principal = Depends(get_current_user),
+    selection: fields.Selection = Depends(fields.selection(models.Tweet)),
     db: Session = Depends(get_db),
 ):
     current_tweet = crud.get_tweet_by_id(tweet_id, db)
@@ -182,13 +451,14 @@ def update_tweet(
         raise HTTPException(
             status_code=400, detail="Tweet not owned by autheticated user."
         )
-    return crud.update_tweet(tweet_id, new_content, db)
+    crud.update_tweet(tweet_id, new_content, db)
+    return selection.render(crud.get_tweet_by_id(tweet_id, db, selection.load()))
 
 
 @router.delete("/tweets/{tweet_id:int}")
 def delete_tweet(
     tweet_id,
-    current_user: schemas.User = Depends(read_users_me),
+    current_user: auth.Principal = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     current_tweet = crud.get_tweet_by_id(tweet_id, db)
@@ -201,33 +471,35 @@ def delete_tweet(
     return crud.delete_tweet(tweet_id, db)
 
 
-@router.get("/tweets/{tweet_id:int}/comments", response_model=List[schemas.Comment])
+@router.get("/tweets/{tweet_id:int}/comments")
 def read_comments_tweet(
     tweet_id,
-    current_user: schemas.User = Depends(read_users_me),
+    current_user: auth.Principal = Depends(get_current_user),
+    selection: fields.Selection = Depends(fields.selection(models.Comment)),
     db: Session = Depends(get_db),
 ):
-    return crud.get_comments_tweet(tweet_id, db)
+    comments = crud.get_comments_tweet(tweet_id, db, selection.load())
+    return selection.render_all(comments)
 
 
-@router.post("/tweets/{tweet_id:int}/comments", response_model=schemas.Comment)
+@router.post("/tweets/{tweet_id:int}/comments")
 def create_comment(
     comment: schemas.CommentBase,
     tweet_id,
-    current_user: schemas.User = Depends(read_users_me),
+    current_user: auth.Principal = Depends(get_current_user),
+    selection: fields.Selection = Depends(fields.selection(models.Comment)),
     db: Session = Depends(get_db),
 ):
-    return crud.create_comment(comment, tweet_id, current_user.id, db)
+    return selection.render(crud.create_comment(comment, tweet_id, current_user.id, db))
 
 
-@router.put(
-    "/tweets/{tweet_id:int}/comments/{comment_id:int}", response_model=schemas.Comment
-)
+@router.put("/tweets/{tweet_id:int}/comments/{comment_id:int}")
 def update_comment(
-    comment_id,
-    tweet_id,
+    comment_id: int,
+    tweet_id: int,
     new_content: schemas.CommentBase,
-    current_user: schemas.User = Depends(read_users_me),
+    current_user: auth.Principal = Depends(get_current_user),
+    selection: fields.Selection = Depends(fields.selection(models.Comment)),
     db: Session = Depends(get_db),
 ):
     current_comment = crud.get_comment_by_id(comment_id, db)
@@ -239,14 +511,15 @@ def update_comment(
         )
     if current_comment.tweet_id != tweet_id:
         raise HTTPException(status_code=400, detail="Comment not related to tweet.")
-    return crud.update_comment(comment_id, new_content, db)
+    crud.update_comment(comment_id, new_content, db)
+    return selection.render(crud.get_comment_by_id(comment_id, db, selection.load()))
 
 
 @router.delete("/tweets/{tweet_id:int}/comments/{comment_id:int}")
 def delete_comment(
     comment_id,
     tweet_id,
-    current_user: schemas.User = Depends(read_users_me),
+    current_user: auth.Principal = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     current_comment = crud.get_comment_by_id(comment_id, db)
@@ -261,10 +534,11 @@ def delete_comment(
     return crud.delete_comment(comment_id, db)
 
 
-@router.post("/tweets/{tweet_id:int}/likes/", response_model=schemas.Like)
+@router.post("/tweets/{tweet_id:int}/likes/")
 def create_like(
     tweet_id,
-    current_user: schemas.User = Depends(read_users_me),
+    current_user: auth.Principal = Depends(get_current_user),
+    selection: fields.Selection = Depends(fields.selection(models.Like)),
     db: Session = Depends(get_db),
 ):
     current_tweet = crud.get_tweet_by_id(tweet_id, db)
@@ -273,15 +547,18 @@ def create_like(
     # if current_tweet.user_id == current_user.id:
     #     raise HTTPException(status_code=400, detail="You can't like your own tweet.")
     like_check = crud.check_like(tweet_id, current_user.id, db)
-    if like_check != 0:
+    if like_check:
         raise HTTPException(status_code=400, detail="Already liked this tweet.")
-    return crud.create_like(tweet_id, current_user.id, db)
+    db_like = crud.create_like(tweet_id, current_user.id, db)
+    if db_like is None:
+        return Response(status_code=status.HTTP_202_ACCEPTED)
+    return selection.render(db_like)
 
 
 @router.delete("/tweets/{tweet_id:int}/likes/")
 def delete_like(
     tweet_id,
-    current_user: schemas.User = Depends(read_users_me),
+    current_user: auth.Principal = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     current_tweet = crud.get_tweet_by_id(tweet_id, db)
@@ -293,6 +570,70 @@ def delete_like(
     #         detail="You can't like or delete the like of your own tweet.",
     #     )
     like_check = crud.check_like(tweet_id, current_user.id, db)
-    if like_check == 0:
+    if not like_check:
         raise HTTPException(status_code=400, detail="You did not like this tweet.")
     return crud.delete_like(tweet_id, current_user.id, db)
+
+
+@router.get("/search")
+def search_tweets(
+    response: Response,
+    q: str = Query(min_length=1, max_length=search.MAX_QUERY_LENGTH),
+    cursor: Optional[str] = None,
+    limit: int = Query(default=pagination.PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+    current_user: auth.Principal = Depends(get_current_user),
+    selection: fields.Selection = Depends(fields.selection(models.Tweet)),
+    db: Session = Depends(get_db),
+):
+    tweets, next_cursor = search.search(
+        db, models.Tweet, q, cursor, limit, selection.load()
+    )
+    if next_cursor:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = next_cursor
+    get_viewer_state(db, current_user.id, tweets).annotate(tweets)
+    return selection.render_all(tweets)
+
+
+@router.get("/search/comments")
+def search_comments(
+    response: Response,
+    q: str = Query(min_length=1, max_length=search.MAX_QUERY_LENGTH),
+    cursor: Optional[str] = None,
+    limit: int = Query(default=pagination.PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+    current_user: auth.Principal = Depends(get_current_user),
+    selection: fields.Selection = Depends(fields.selection(models.Comment)),
+    db: Session = Depends(get_db),
+):
+    comments, next_cursor = search.search(
+        db, models.Comment, q, cursor, limit, selection.load()
+    )
+    if next_cursor:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = next_cursor
+    return selection.render_all(comments)
+
+
+@router.post("/batch/likes", response_model=List[schemas.BatchResult])
+def create_likes(
+    likes: schemas.BatchIds,
+    current_user: auth.Principal = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    return batch.create_likes(db, current_user.id, likes.ids)
+
+
+@router.post("/batch/follows", response_model=List[schemas.BatchResult])
+def create_follows(
+    follows: schemas.BatchIds,
+    current_user: auth.Principal = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    return batch.create_follows(db, current_user.id, follows.ids)
+
+
+@router.post("/batch/tweets", response_model=List[schemas.BatchResult])
+def create_tweets(
+    tweets: schemas.BatchTweets,
+    current_user: auth.Principal = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    return batch.create_tweets(db, current_user.id, tweets.tweets)
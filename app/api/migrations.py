@@ -0,0 +1,183 @@
+import time
+from datetime import datetime
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    delete,
+    func,
+    insert,
+    inspect,
+    select,
+    text,
+)
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from . import counters, models, ranking, search, tags, timeline
+
+schema_migrations = Table(
+    "schema_migrations",
+    MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+LOCK_SECONDS = 600
+# Postgres advisory lock id held while migrating.
+LOCK_KEY = 2011
+
+# Columns added to existing tables after their first release.
+ADDED_COLUMNS = (
+    (models.User, "follower_count"),
+    (models.User, "following_count"),
+    (models.Tweet, "like_count"),
+    (models.Tweet, "comment_count"),
+)
+
+# Pairs the unique indexes forbid duplicates of.
+UNIQUE_PAIRS = (
+    (models.Follow, (models.Follow.follower_id, models.Follow.followee_id)),
+    (models.Like, (models.Like.user_id, models.Like.tweet_id)),
+)
+
+
+def create_tables(connection: Connection):
+    models.Base.metadata.create_all(bind=connection)
+
+
+def add_denormalized_data(connection: Connection):
+    # Databases created before counters and inboxes existed have neither
+    # the columns nor the rows; fresh ones get both from create_tables.
+    missing = []
+    for model, name in ADDED_COLUMNS:
+        table = model.__tablename__
+        existing = {column["name"] for column in inspect(connection).get_columns(table)}
+        if name not in existing:
+            connection.execute(
+                text(
+                    f"ALTER TABLE {table} ADD COLUMN {name} INTEGER NOT NULL DEFAULT 0"
+                )
+            )
+            missing.append(name)
+    db = Session(bind=connection)
+    if missing:
+        counters.repair(db)
+    inbox = db.query(models.TimelineEntry.id).limit(1).first()
+    if inbox is None and db.query(models.Tweet.id).limit(1).first() is not None:
+        timeline.rebuild(db)
+    db.close()
+
+
+def create_indexes(connection: Connection):
+    for table in models.Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+
+def add_hot_query_indexes(connection: Connection):
+    removed = 0
+    for model, columns in UNIQUE_PAIRS:
+        keep = select(func.min(model.id)).group_by(*columns)
+        removed += connection.execute(
+            delete(model).where(model.id.not_in(keep))
+        ).rowcount
+    create_indexes(connection)
+    if removed:
+        db = Session(bind=connection)
+        counters.repair(db)
+        db.close()
+
+
+def add_tag_indexes(connection: Connection):
+    models.Base.metadata.create_all(bind=connection)
+    db = Session(bind=connection)
+    tags.rebuild(db)
+    db.close()
+
+
+def add_tweet_scores(connection: Connection):
+    models.Base.metadata.create_all(bind=connection)
+    db = Session(bind=connection)
+    ranking.rebuild(db)
+    db.close()
+
+
+def add_jobs(connection: Connection):
+    models.Base.metadata.create_all(bind=connection)
+
+
+MIGRATIONS = (
+    (1, "create tables", create_tables),
+    (2, "counter columns and home timelines", add_denormalized_data),
+    (3, "indexes for the hot queries", add_hot_query_indexes),
+    (4, "full-text search indexes", search.create_indexes),
+    (5, "hashtags, mentions and trends", add_tag_indexes),
+    (6, "precomputed explore scores", add_tweet_scores),
+    (7, "background jobs", add_jobs),
+    (8, "index for the heavy-author lookup", create_indexes),
+    (9, "index for recent follows", create_indexes),
+)
+
+
+def lock(connection: Connection):
+    # Workers that start together take turns: each one holds this lock while
+    # it reads the applied versions and applies the next migration, so no
+    # version is applied twice. A long migration can outlast the busy
+    # timeout, hence the retries.
+    dialect = connection.dialect.name
+    deadline = time.monotonic() + LOCK_SECONDS
+    while dialect == "sqlite":
+        try:
+            connection.exec_driver_sql("BEGIN EXCLUSIVE")
+            return
+        except OperationalError:
+            if time.monotonic() > deadline:
+                raise
+    if dialect == "postgresql":
+        connection.execute(
+            text("SELECT pg_advisory_xact_lock(:key)"), {"key": LOCK_KEY}
+        )
+
+
+def read_versions(connection: Connection) -> set[int]:
+    schema_migrations.create(connection, checkfirst=True)
+    return set(connection.scalars(select(schema_migrations.c.version)))
+
+
+def applied_versions(bind: Engine) -> set[int]:
+    with bind.begin() as connection:
+        lock(connection)
+        return read_versions(connection)
+
+
+def pending(bind: Engine) -> list[tuple[int, str]]:
+    applied = applied_versions(bind)
+    return [
+        (version, name) for version, name, _ in MIGRATIONS if version not in applied
+    ]
+
+
+def upgrade(bind: Engine) -> list[tuple[int, str]]:
+    done = []
+    while True:
+        with bind.begin() as connection:
+            lock(connection)
+            applied = read_versions(connection)
+            waiting = [step for step in MIGRATIONS if step[0] not in applied]
+            if not waiting:
+                return done
+            version, name, migrate = waiting[0]
+            migrate(connection)
+            connection.execute(
+                insert(schema_migrations).values(
+                    version=version, name=name, applied_at=datetime.utcnow()
+                )
+            )
+        done.append((version, name))
@@ -1,4 +1,14 @@
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy import (
+    Boolean,
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+)
 from sqlalchemy.orm import relationship
 
 from .database import Base
@@ -6,6 +16,7 @@ from .database import Base
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (Index("ix_users_follower_count", "follower_count"),)
 
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String, unique=True, index=True, nullable=False)
@@ -13,6 +24,8 @@ class User(Base):
     name = Column(String)
     password = Column(String, nullable=False)
     bio = Column(Text)
+    follower_count = Column(Integer, nullable=False, default=0, server_default="0")
+    following_count = Column(Integer, nullable=False, default=0, server_default="0")
 
     tweets = relationship("Tweet", cascade="all,delete", back_populates="owner")
     comments = relationship("Comment", cascade="all,delete", back_populates="owner")
@@ -29,16 +42,25 @@ class User(Base):
         back_populates="user_follower",
         primaryjoin="Follow.follower_id==User.id",
     )
+    refresh_tokens = relationship(
+        "RefreshToken", cascade="all,delete", back_populates="owner"
+    )
 
 
 class Tweet(Base):
     __tablename__ = "tweets"
+    __table_args__ = (
+        Index("ix_tweets_user_id_created_at", "user_id", "created_at", "id"),
+        Index("ix_tweets_created_at", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     content = Column(Text, nullable=False)
     created_at = Column(DateTime)
     updated_at = Column(DateTime)
+    like_count = Column(Integer, nullable=False, default=0, server_default="0")
+    comment_count = Column(Integer, nullable=False, default=0, server_default="0")
 
     owner = relationship("User", back_populates="tweets")
     comments = relationship("Comment", cascade="all,delete", back_populates="tweet")
@@ -47,6 +69,10 @@ class Tweet(Base):
 
 class Like(Base):
     __tablename__ = "likes"
+    __table_args__ = (
+        Index("uq_likes_user_id_tweet_id", "user_id", "tweet_id", unique=True),
+        Index("ix_likes_tweet_id", "tweet_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -59,6 +85,16 @@ class Like(Base):
 
 class Follow(Base):
     __tablename__ = "followage"
+    __table_args__ = (
+        Index(
+            "uq_followage_follower_id_followee_id",
+            "follower_id",
+            "followee_id",
+            unique=True,
+        ),
+        Index("ix_followage_followee_id_follower_id", "followee_id", "follower_id"),
+        Index("ix_followage_follower_id_id", "follower_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     follower_id = Column(Integer, ForeignKey("users.id"))
@@ -75,6 +111,9 @@ class Follow(Base):
 
 class Comment(Base):
     __tablename__ = "comments"
+    __table_args__ = (
+        Index("ix_comments_tweet_id_created_at", "tweet_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -85,3 +124,97 @@ class Comment(Base):
 
     owner = relationship("User", back_populates="comments")
     tweet = relationship("Tweet", back_populates="comments")
+
+
+class TimelineEntry(Base):
+    __tablename__ = "timelines"
+    __table_args__ = (
+        Index("ix_timelines_user_id_created_at", "user_id", "created_at", "tweet_id"),
+        Index("ix_timelines_author_id", "author_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    tweet_id = Column(Integer, ForeignKey("tweets.id"), nullable=False, index=True)
+    author_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    created_at = Column(DateTime)
+
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    id = Column(Integer, primary_key=True, index=True)
+    jti = Column(String, unique=True, index=True, nullable=False)
+    family = Column(String, nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    created_at = Column(DateTime)
+    expires_at = Column(DateTime, nullable=False)
+    revoked_at = Column(DateTime)
+    replaced_by = Column(String)
+
+    owner = relationship("User", back_populates="refresh_tokens")
+
+
+class Hashtag(Base):
+    __tablename__ = "hashtags"
+    __table_args__ = (
+        Index("ix_hashtags_tag_created_at", "tag", "created_at", "tweet_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    tweet_id = Column(Integer, ForeignKey("tweets.id"), nullable=False, index=True)
+    tag = Column(String, nullable=False)
+    created_at = Column(DateTime)
+
+
+class Mention(Base):
+    __tablename__ = "mentions"
+    __table_args__ = (
+        Index("ix_mentions_user_id_created_at", "user_id", "created_at", "tweet_id"),
+        Index("ix_mentions_author_id", "author_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    tweet_id = Column(Integer, ForeignKey("tweets.id"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    author_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    created_at = Column(DateTime)
+
+
+class TrendBucket(Base):
+    __tablename__ = "trend_buckets"
+
+    tag = Column(String, primary_key=True)
+    bucket = Column(Integer, primary_key=True, index=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class TweetScore(Base):
+    __tablename__ = "tweet_scores"
+    __table_args__ = (
+        Index("ix_tweet_scores_score", "score", "tweet_id", "author_id"),
+        Index("ix_tweet_scores_author_id", "author_id"),
+    )
+
+    tweet_id = Column(Integer, ForeignKey("tweets.id"), primary_key=True)
+    author_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    score = Column(Float, nullable=False)
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index("ix_jobs_status_run_at", "status", "run_at"),
+        Index("ix_jobs_finished_at", "finished_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)
+    payload = Column(Text, nullable=False)
+    idempotency_key = Column(String, unique=True)
+    status = Column(String, nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    run_at = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    finished_at = Column(DateTime)
+    last_error = Column(Text)
@@ -0,0 +1,68 @@
+import base64
+import binascii
+from datetime import datetime
+from typing import Optional
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy import tuple_
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_position(*values) -> str:
+    raw = "|".join(str(value) for value in values).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_position(cursor: Optional[str], *parsers):
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        values = raw.split("|")
+        if len(values) != len(parsers):
+            raise ValueError(raw)
+        return tuple(parse(value) for parse, value in zip(parsers, values))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor."
+        )
+
+
+def encode_cursor(created_at: datetime, id: int) -> str:
+    return encode_position(created_at.isoformat(), id)
+
+
+def decode_cursor(cursor: Optional[str]):
+    return decode_position(cursor, datetime.fromisoformat, int)
+
+
+def paginate(query, created_at_column, id_column, cursor: Optional[str], limit: int):
+    position = decode_cursor(cursor)
+    if position:
+        query = query.filter(tuple_(created_at_column, id_column) < position)
+    return query.order_by(created_at_column.desc(), id_column.desc()).limit(limit).all()
+
+
+class Page(list):
+    # A page ordered by something other than (created_at, id) carries the
+    # cursor to the next one itself.
+    def __init__(self, items=(), cursor: Optional[str] = None):
+        super().__init__(items)
+        self.cursor = cursor
+
+
+def next_cursor(items: list, limit: int) -> Optional[str]:
+    if isinstance(items, Page):
+        return items.cursor
+    if len(items) < limit:
+        return None
+    return encode_cursor(items[-1].created_at, items[-1].id)
+
+
+def set_next_cursor(response: Response, items: list, limit: int):
+    cursor = next_cursor(items, limit)
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
@@ -0,0 +1,64 @@
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import BoundedSemaphore
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+from . import config
+
+BCRYPT_ROUNDS = config.BCRYPT_ROUNDS
+HASH_WORKERS = config.HASH_WORKERS
+HASH_QUEUE_LIMIT = config.HASH_QUEUE_LIMIT
+
+# Pinning min and max to the configured cost makes passlib flag every hash
+# made with another cost, so logins can upgrade (or downgrade) it in place.
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+# bcrypt releases the GIL, so a small thread pool keeps it off the event loop
+# without starving it. Work beyond the pool plus the queue limit is refused
+# instead of piling up behind a burst of logins.
+_pool = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+_slots = BoundedSemaphore(HASH_WORKERS + HASH_QUEUE_LIMIT)
+
+
+def submit(fn, *args) -> Future:
+    if not _slots.acquire(blocking=False):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many password checks in progress, try again shortly.",
+            headers={"Retry-After": "1"},
+        )
+    try:
+        future = _pool.submit(fn, *args)
+    except BaseException:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    return future
+
+
+def hash_password(password: str) -> str:
+    return submit(pwd_context.hash, password).result()
+
+
+def verify_and_update(password: str, hashed_password: str) -> tuple[bool, str | None]:
+    return submit(pwd_context.verify_and_update, password, hashed_password).result()
+
+
+async def hash_password_async(password: str) -> str:
+    return await asyncio.wrap_future(submit(pwd_context.hash, password))
+
+
+async def verify_and_update_async(
+    password: str, hashed_password: str
+) -> tuple[bool, str | None]:
+    return await asyncio.wrap_future(
+        submit(pwd_context.verify_and_update, password, hashed_password)
+    )
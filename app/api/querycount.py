@@ -0,0 +1,55 @@
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+QUERY_BUDGET = 25
+QUERY_COUNT_HEADER = "X-Query-Count"
+
+logger = logging.getLogger(__name__)
+
+_counter: ContextVar["QueryCounter | None"] = ContextVar("query_counter", default=None)
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.statements: list[str] = []
+
+    def over_budget(self, budget: int = QUERY_BUDGET) -> bool:
+        return self.count > budget
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def count_query(conn, cursor, statement, parameters, context, executemany):
+    counter = _counter.get()
+    if counter is not None:
+        counter.count += 1
+        counter.statements.append(statement)
+
+
+@contextmanager
+def count_queries():
+    counter = QueryCounter()
+    token = _counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _counter.reset(token)
+
+
+async def query_budget_middleware(request, call_next):
+    with count_queries() as counter:
+        response = await call_next(request)
+    response.headers[QUERY_COUNT_HEADER] = str(counter.count)
+    if counter.over_budget():
+        logger.warning(
+            "%s %s ran %d queries (budget %d)",
+            request.method,
+            request.url.path,
+            counter.count,
+            QUERY_BUDGET,
+        )
+    return response
@@ -0,0 +1,101 @@
+import re
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from . import cache, crud, jobs, models, ranking, search, suggestions, tags, viewer
+from .pagination import encode_cursor, encode_position
+
+# SQLite reports a full table scan as "SCAN <table>" (or "SCAN TABLE <table>"
+# before 3.36); index scans and searches name the index they use. Scans of a
+# materialized subquery look the same but name the subquery instead.
+FULL_SCAN = re.compile(r"^SCAN (TABLE )?(?P<table>\w+)( AS \w+)?$")
+
+
+def hot_queries(db: Session, user: models.User, tweet: models.Tweet):
+    cursor = encode_cursor(tweet.created_at, tweet.id)
+    ranked_cursor = encode_position(ranking.score(0, 0, tweet.created_at), tweet.id)
+    return {
+        "user by username": lambda: crud.get_user_by_username(db, user.username),
+        "user by id": lambda: crud.get_user_by_id(db, user.id),
+        "followers": lambda: crud.get_followers(user.id, db),
+        "following": lambda: crud.get_following(user.id, db),
+        "check following": lambda: crud.check_following(user.id, user.id, db),
+        "check like": lambda: crud.check_like(tweet.id, user.id, db),
+        "explore": lambda: crud.get_tweets_explore(user.id, db),
+        "explore next page": lambda: crud.get_tweets_explore(
+            user.id, db, ranked_cursor
+        ),
+        "user tweets": lambda: crud.get_tweets_user(user.id, db),
+        "user tweets next page": lambda: crud.get_tweets_user(user.id, db, cursor),
+        "following tweets": lambda: crud.get_tweets_following(user.id, db),
+        "home": lambda: crud.get_tweets_home(user.id, db),
+        "home next page": lambda: crud.get_tweets_home(user.id, db, cursor),
+        "tweet": lambda: crud.get_tweet_by_id(tweet.id, db),
+        "comments": lambda: crud.get_comments_tweet(tweet.id, db),
+        "hashtag": lambda: tags.get_tweets_hashtag("tag", db),
+        "hashtag next page": lambda: tags.get_tweets_hashtag("tag", db, cursor),
+        "mentions": lambda: tags.get_tweets_mentions(user.id, db),
+        "mentions next page": lambda: tags.get_tweets_mentions(user.id, db, cursor),
+        "search tweets": lambda: search.search(db, models.Tweet, tweet.content),
+        "search comments": lambda: search.search(db, models.Comment, tweet.content),
+        "suggestions": lambda: suggestions.expand(db, user.id),
+        "job stats": lambda: jobs.stats(db),
+        "viewer state": lambda: viewer.get_viewer_state(
+            db, user.id, [tweet], [tweet.user_id]
+        ),
+    }
+
+
+def capture(db: Session, call) -> list[tuple[str, tuple]]:
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        call()
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    return statements
+
+
+def explain(db: Session, statement: str, parameters) -> list[str]:
+    rows = db.connection().exec_driver_sql(
+        "EXPLAIN QUERY PLAN " + statement, parameters
+    )
+    return [row[-1] for row in rows]
+
+
+def full_scans(plan: list[str]) -> list[str]:
+    scans = []
+    for step in plan:
+        match = FULL_SCAN.match(step)
+        if match and match["table"] in models.Base.metadata.tables:
+            scans.append(step)
+    return scans
+
+
+def check(db: Session) -> list[dict]:
+    user = db.query(models.User).first()
+    tweet = db.query(models.Tweet).first()
+    if user is None or tweet is None:
+        return []
+    results = []
+    for name, call in hot_queries(db, user, tweet).items():
+        cache.users.clear()
+        cache.tweets.clear()
+        cache.timelines.clear()
+        for statement, parameters in capture(db, call):
+            plan = explain(db, statement, parameters)
+            results.append(
+                {
+                    "query": name,
+                    "statement": statement,
+                    "plan": plan,
+                    "full_scans": full_scans(plan),
+                }
+            )
+    return results
@@ -0,0 +1,164 @@
+import math
+from datetime import datetime
+from typing import Iterable
+
+from sqlalchemy import bindparam, delete, tuple_, update
+from sqlalchemy.orm import Session
+
+from . import jobs, models
+from .loading import TWEET_LOAD
+from .pagination import PAGE_SIZE, Page, decode_position, encode_position
+
+# Explore ranks tweets by log(1 + likes + COMMENT_WEIGHT * comments) plus
+# their creation time in units of TAU_SECONDS. That orders tweets exactly like
+# (1 + engagement) * exp(-age / TAU_SECONDS) would, but the score of a tweet
+# never changes while its engagement does not, so tweet_scores only needs
+# rewriting for tweets that were liked or commented on, and explore reads the
+# top of the (score, tweet_id) index instead of sorting by a decayed value.
+# Those rewrites are queued as "score" jobs in the transaction that changed
+# the counts, one per tweet while it waits, so they survive a restart.
+TAU_SECONDS = 12 * 60 * 60
+COMMENT_WEIGHT = 2
+REFRESH_BATCH = 500
+EPOCH = datetime(1970, 1, 1)
+
+
+def score(like_count: int, comment_count: int, created_at: datetime) -> float:
+    engagement = like_count + COMMENT_WEIGHT * comment_count
+    age = (created_at - EPOCH).total_seconds()
+    return math.log1p(max(engagement, 0)) + age / TAU_SECONDS
+
+
+def add_tweet(db: Session, tweet: models.Tweet):
+    db.add(
+        models.TweetScore(
+            tweet_id=tweet.id,
+            author_id=tweet.user_id,
+            score=score(
+                tweet.like_count or 0, tweet.comment_count or 0, tweet.created_at
+            ),
+        )
+    )
+
+
+def remove_tweet(db: Session, tweet_id: int):
+    db.execute(delete(models.TweetScore).where(models.TweetScore.tweet_id == tweet_id))
+
+
+def remove_user(db: Session, user_id: int):
+    db.execute(delete(models.TweetScore).where(models.TweetScore.author_id == user_id))
+
+
+def mark(db: Session, tweet_ids: Iterable[int]):
+    jobs.enqueue_many(
+        db,
+        "score",
+        [({"tweet_id": id}, f"score:{id}") for id in set(tweet_ids)],
+        requeue=True,
+    )
+
+
+def scores(db: Session, tweet_ids) -> list[dict]:
+    rows = db.query(
+        models.Tweet.id,
+        models.Tweet.like_count,
+        models.Tweet.comment_count,
+        models.Tweet.created_at,
+    ).filter(models.Tweet.id.in_(tweet_ids))
+    return [
+        {"b_tweet_id": id, "b_score": score(likes, comments, created_at)}
+        for id, likes, comments, created_at in rows
+    ]
+
+
+def rescore(db: Session, tweet_ids: list[int]):
+    statement = (
+        update(models.TweetScore)
+        .where(models.TweetScore.tweet_id == bindparam("b_tweet_id"))
+        .values(score=bindparam("b_score"))
+    )
+    for start in range(0, len(tweet_ids), REFRESH_BATCH):
+        values = scores(db, tweet_ids[start : start + REFRESH_BATCH])
+        if values:
+            db.connection().execute(statement, values)
+
+
+@jobs.handler("score")
+def rescore_tweet(db: Session, payload: dict):
+    rescore(db, [payload["tweet_id"]])
+    db.commit()
+
+
+def rebuild(db: Session) -> int:
+    db.execute(delete(models.TweetScore))
+    tweets = db.query(
+        models.Tweet.id,
+        models.Tweet.user_id,
+        models.Tweet.like_count,
+        models.Tweet.comment_count,
+        models.Tweet.created_at,
+    )
+    last_id, count = 0, 0
+    while True:
+        batch = (
+            tweets.filter(models.Tweet.id > last_id)
+            .order_by(models.Tweet.id)
+            .limit(REFRESH_BATCH)
+            .all()
+        )
+        if not batch:
+            break
+        db.bulk_insert_mappings(
+            models.TweetScore,
+            [
+                {
+                    "tweet_id": id,
+                    "author_id": user_id,
+                    "score": score(likes, comments, created_at),
+                }
+                for id, user_id, likes, comments, created_at in batch
+            ],
+        )
+        last_id = batch[-1].id
+        count += len(batch)
+    db.commit()
+    return count
+
+
+def get_tweets_ranked(
+    user_id: int,
+    db: Session,
+    cursor: str | None = None,
+    limit: int = PAGE_SIZE,
+    options: tuple = TWEET_LOAD,
+    entities: tuple = (models.Tweet,),
+) -> Page:
+    position = decode_position(cursor, float, int)
+    ranked = db.query(models.TweetScore.tweet_id, models.TweetScore.score).filter(
+        models.TweetScore.author_id != user_id
+    )
+    if position:
+        ranked = ranked.filter(
+            tuple_(models.TweetScore.score, models.TweetScore.tweet_id) < position
+        )
+    ranked = (
+        ranked.order_by(
+            models.TweetScore.score.desc(), models.TweetScore.tweet_id.desc()
+        )
+        .limit(limit)
+        .all()
+    )
+    if not ranked:
+        return Page()
+    rows = (
+        db.query(*entities)
+        .options(*options)
+        .filter(models.Tweet.id.in_([tweet_id for tweet_id, _ in ranked]))
+    )
+    tweets = {tweet.id: tweet for tweet in rows}
+    cursor = None
+    if len(ranked) == limit:
+        cursor = encode_position(ranked[-1].score, ranked[-1].tweet_id)
+    return Page(
+        [tweets[tweet_id] for tweet_id, _ in ranked if tweet_id in tweets], cursor
+    )
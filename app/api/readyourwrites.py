@@ -0,0 +1,83 @@
+import math
+import time
+from contextvars import ContextVar
+
+from jose import JWTError, jwt
+
+from . import config, secret
+
+# After a user writes, their reads stay on the primary for
+# READ_YOUR_WRITES_SECONDS. The deadline travels with the client, signed, in a
+# cookie and in a response header that API clients without a cookie jar send
+# back, so every worker honours it, not only the one that took the write.
+PIN_COOKIE = "primary"
+PIN_HEADER = "X-Read-Your-Writes"
+ALGORITHM = "HS256"
+
+_pin: ContextVar["Pin | None"] = ContextVar("read_your_writes", default=None)
+
+
+class Pin:
+    def __init__(self, username: str | None = None, until: float = 0.0):
+        self.username = username
+        self.until = until
+        self.renewed = False
+
+    def covers(self, username: str | None) -> bool:
+        return (
+            username is not None
+            and username == self.username
+            and time.time() < self.until
+        )
+
+
+def encode(username: str, until: float) -> str:
+    return jwt.encode(
+        {"sub": username, "until": until}, secret.secret, algorithm=ALGORITHM
+    )
+
+
+def decode(token: str | None) -> Pin:
+    if not token:
+        return Pin()
+    try:
+        payload = jwt.decode(token, secret.secret, algorithms=[ALGORITHM])
+    except JWTError:
+        return Pin()
+    username, until = payload.get("sub"), payload.get("until")
+    if not isinstance(username, str) or not isinstance(until, (int, float)):
+        return Pin()
+    return Pin(username, until)
+
+
+def is_pinned(username: str | None) -> bool:
+    pin = _pin.get()
+    return pin is not None and pin.covers(username)
+
+
+def pin_to_primary(username: str):
+    pin = _pin.get()
+    if pin is not None:
+        pin.username = username
+        pin.until = time.time() + config.READ_YOUR_WRITES_SECONDS
+        pin.renewed = True
+
+
+async def read_your_writes_middleware(request, call_next):
+    pin = decode(request.headers.get(PIN_HEADER) or request.cookies.get(PIN_COOKIE))
+    token = _pin.set(pin)
+    try:
+        response = await call_next(request)
+    finally:
+        _pin.reset(token)
+    if pin.renewed:
+        value = encode(pin.username, pin.until)
+        response.headers[PIN_HEADER] = value
+        response.set_cookie(
+            key=PIN_COOKIE,
+            value=value,
+            max_age=math.ceil(config.READ_YOUR_WRITES_SECONDS),
+            httponly=True,
+            samesite="lax",
+        )
+    return response
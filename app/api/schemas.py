@@ -1,7 +1,7 @@
 import datetime
 from typing import Optional
 
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, conlist
 
 
 class UserBase(BaseModel):
@@ -22,34 +22,45 @@ class UserBasic(UserBase):
     name: Optional[str] = None
 
 
-class Follow(BaseModel):
+class UserCompact(UserBasic):
+    follower_count: int = 0
+    following_count: int = 0
+
+
+class FollowCompact(BaseModel):
     id: int
     follower_id: int
     followee_id: int
     created_at: datetime.datetime
-    user_follower: UserBasic
-    user_followee: UserBasic
 
     class Config:
         orm_mode = True
 
 
-class User(UserBasic):
+class Follow(FollowCompact):
+    user_follower: UserBasic
+    user_followee: UserBasic
+
+
+class User(UserCompact):
     following: list[Follow] = []
     followers: list[Follow] = []
 
 
-class Like(BaseModel):
+class LikeCompact(BaseModel):
     id: int
     user_id: int
     tweet_id: int
     created_at: datetime.datetime
-    owner: User
 
     class Config:
         orm_mode = True
 
 
+class Like(LikeCompact):
+    owner: User
+
+
 class CommentBase(BaseModel):
     content: str
 
@@ -57,12 +68,15 @@ class CommentBase(BaseModel):
         orm_mode = True
 
 
-class Comment(CommentBase):
+class CommentCompact(CommentBase):
     id: int
     tweet_id: int
     user_id: int
     created_at: datetime.datetime
     updated_at: Optional[datetime.datetime] = None
+
+
+class Comment(CommentCompact):
     owner: User
 
 
@@ -80,7 +94,45 @@ class TweetBasic(TweetBase):
     updated_at: Optional[datetime.datetime] = None
 
 
-class Tweet(TweetBasic):
+class TweetCompact(TweetBasic):
+    like_count: int = 0
+    comment_count: int = 0
+    liked: Optional[bool] = None
+
+
+class Tweet(TweetCompact):
     owner: User
     comments: list[Comment] = []
     likes: list[Like] = []
+
+
+class Trend(BaseModel):
+    tag: str
+    count: int
+
+
+class Suggestion(BaseModel):
+    user: UserCompact
+    followed_by: int
+
+
+class Connections(BaseModel):
+    user_id: int
+    follower_count: int
+    following_count: int
+    followers: list[int]
+    following: list[int]
+    mutuals: list[int]
+
+
+class BatchIds(BaseModel):
+    ids: conlist(int, min_items=1, max_items=500)
+
+
+class BatchTweets(BaseModel):
+    tweets: conlist(TweetBase, min_items=1, max_items=500)
+
+
+class BatchResult(BaseModel):
+    id: int
+    status: str
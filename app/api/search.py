@@ -0,0 +1,150 @@
+import re
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from . import models
+from .pagination import PAGE_SIZE, decode_position, encode_position
+
+# Full-text search runs on SQLite FTS5. Each searchable table gets an
+# external-content index: the index stores only the tokens and points back at
+# the base table by rowid, so the text is not stored twice. Triggers keep it
+# in step with every insert, update and delete, including the cascades that
+# never go through crud.
+SEARCHABLE = {
+    models.Tweet: "tweets_fts",
+    models.Comment: "comments_fts",
+}
+# Prefix indexes make the "term*" lookups of search-as-you-type as cheap as
+# whole terms.
+FTS_OPTIONS = "tokenize='unicode61 remove_diacritics 2', prefix='2 3'"
+MAX_QUERY_LENGTH = 200
+MAX_TERMS = 8
+TERM = re.compile(r"\w+")
+
+
+def is_available(bind) -> bool:
+    return bind.dialect.name == "sqlite"
+
+
+def index_statements(model) -> list[str]:
+    table = model.__tablename__
+    fts = SEARCHABLE[model]
+    remove = (
+        f"INSERT INTO {fts}({fts}, rowid, content) "
+        f"VALUES ('delete', old.id, old.content);"
+    )
+    add = f"INSERT INTO {fts}(rowid, content) VALUES (new.id, new.content);"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"content, content='{table}', content_rowid='id', {FTS_OPTIONS})",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} "
+        f"BEGIN {add} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} "
+        f"BEGIN {remove} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF content "
+        f"ON {table} BEGIN {remove} {add} END",
+    ]
+
+
+def create_indexes(connection: Connection):
+    if not is_available(connection):
+        return
+    for model in SEARCHABLE:
+        for statement in index_statements(model):
+            connection.execute(text(statement))
+    rebuild(connection)
+
+
+def rebuild(bind) -> int:
+    if not is_available(bind.get_bind() if isinstance(bind, Session) else bind):
+        return 0
+    for fts in SEARCHABLE.values():
+        bind.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+        bind.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('optimize')"))
+    return sum(
+        bind.execute(text(f"SELECT count(*) FROM {model.__tablename__}")).scalar()
+        for model in SEARCHABLE
+    )
+
+
+def match_expression(query: str) -> Optional[str]:
+    # User input never reaches FTS5 as syntax: every word becomes a quoted
+    # phrase, so quotes, operators and column filters are just text. The last
+    # word matches as a prefix for search-as-you-type.
+    terms = TERM.findall(query)[:MAX_TERMS]
+    if not terms:
+        return None
+    phrases = [f'"{term}"' for term in terms]
+    phrases[-1] += "*"
+    return " ".join(phrases)
+
+
+def search_ids(
+    db: Session, model, match: str, cursor: Optional[str], limit: int
+) -> list[tuple[int, float]]:
+    fts = SEARCHABLE[model]
+    position = decode_position(cursor, float, int)
+    # bm25 rank is negative, best first; rowid breaks ties so the
+    # (rank, rowid) keyset is total and pages never repeat or skip a match.
+    after = "AND (rank, rowid) > (:rank, :id)" if position else ""
+    rows = db.execute(
+        text(
+            f"SELECT rowid, rank FROM {fts} WHERE {fts} MATCH :match {after} "
+            f"ORDER BY rank, rowid LIMIT :limit"
+        ),
+        {
+            "match": match,
+            "rank": position[0] if position else None,
+            "id": position[1] if position else None,
+            "limit": limit,
+        },
+    )
+    return [tuple(row) for row in rows]
+
+
+def escape_like(query: str) -> str:
+    return query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_like(db: Session, model, query: str, cursor: Optional[str], limit: int):
+    # Without FTS5 fall back to a substring scan ordered by id, newest first.
+    # The query is matched literally, wildcards included.
+    position = decode_position(cursor, int)
+    rows = db.query(model.id).filter(
+        model.content.ilike(f"%{escape_like(query)}%", escape="\\")
+    )
+    if position:
+        rows = rows.filter(model.id < position[0])
+    return [(id, None) for id, in rows.order_by(model.id.desc()).limit(limit)]
+
+
+def search(
+    db: Session,
+    model,
+    query: str,
+    cursor: Optional[str] = None,
+    limit: int = PAGE_SIZE,
+    options: tuple = (),
+) -> tuple[list, Optional[str]]:
+    query = query.strip()[:MAX_QUERY_LENGTH]
+    if is_available(db.get_bind()):
+        match = match_expression(query)
+        hits = search_ids(db, model, match, cursor, limit) if match else []
+    else:
+        hits = search_like(db, model, query, cursor, limit) if query else []
+    if not hits:
+        return [], None
+    loaded = {
+        item.id: item
+        for item in db.query(model)
+        .options(*options)
+        .filter(model.id.in_([id for id, _ in hits]))
+    }
+    items = [loaded[id] for id, _ in hits if id in loaded]
+    if len(hits) < limit:
+        return items, None
+    id, rank = hits[-1]
+    return items, encode_position(id) if rank is None else encode_position(rank, id)
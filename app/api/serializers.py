@@ -0,0 +1,66 @@
+import json
+from datetime import datetime
+from functools import lru_cache
+from typing import Iterable, Optional
+
+from fastapi.responses import Response
+
+from . import config, models, schemas
+
+# Hot list routes can skip ORM entities, pydantic validation and
+# jsonable_encoder: rows come from column-level SELECTs and are encoded by a
+# serializer compiled once per field selection. The output is byte for byte
+# what the compact response models produce through FastAPI's JSONResponse.
+FAST_RESPONSES = config.FAST_RESPONSES
+
+TWEET_COLUMNS = tuple(
+    getattr(models.Tweet, name)
+    for name in schemas.TweetCompact.__fields__
+    if hasattr(models.Tweet, name)
+)
+
+
+def encode_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+@lru_cache(maxsize=None)
+def tweet_encoder(fields: Optional[frozenset[str]]):
+    names = [
+        name
+        for name in schemas.TweetCompact.__fields__
+        if fields is None or name in fields
+    ]
+    columns = [name for name in names if name != "liked"]
+    include_liked = "liked" in names
+
+    def encode(row, liked_tweet_ids: set[int]) -> dict:
+        data = {name: encode_value(getattr(row, name)) for name in columns}
+        if include_liked:
+            data["liked"] = row.id in liked_tweet_ids
+        return data
+
+    return encode
+
+
+def tweets_response(
+    rows: Iterable,
+    liked_tweet_ids: set[int],
+    fields: Optional[set[str]],
+    headers: Optional[dict] = None,
+) -> Response:
+    encode = tweet_encoder(frozenset(fields) if fields else None)
+    content = json.dumps(
+        [encode(row, liked_tweet_ids) for row in rows],
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    )
+    return Response(
+        content=content.encode("utf-8"),
+        media_type="application/json",
+        headers=headers,
+    )
@@ -0,0 +1,152 @@
+from collections import Counter
+from threading import Lock
+
+from sqlalchemy import func, select, union_all
+from sqlalchemy.orm import Session
+
+from . import cache, models
+
+# Who-to-follow ranks the accounts followed by the people a user follows by
+# how many of them follow each one. The two-hop expansion is bounded: only the
+# user's MAX_EXPANDED_FOLLOWEES most recent followees are expanded, and at
+# most MAX_EDGES_PER_FOLLOWEE of each one's follows are read. The resulting
+# counts are cached per user and patched on every follow and unfollow, so a
+# cached user is never expanded again until the entry expires.
+MAX_EXPANDED_FOLLOWEES = 200
+MAX_EDGES_PER_FOLLOWEE = 100
+SUGGESTIONS_SIZE = 10
+
+_lock = Lock()
+
+
+class Candidates:
+    def __init__(self, following: set[int], expanded: set[int], counts: Counter):
+        self.following = following
+        self.expanded = expanded
+        self.counts = counts
+
+    def suggestable(self, user_id: int, candidate_id: int) -> bool:
+        return candidate_id != user_id and candidate_id not in self.following
+
+    def discount(self, candidate_id: int, count: int = 1):
+        remaining = self.counts.get(candidate_id, 0) - count
+        if remaining > 0:
+            self.counts[candidate_id] = remaining
+        else:
+            self.counts.pop(candidate_id, None)
+
+
+def followees(db: Session, user_id: int, limit: int | None = None) -> list[int]:
+    rows = (
+        db.query(models.Follow.followee_id)
+        .filter(models.Follow.follower_id == user_id)
+        .order_by(models.Follow.id.desc())
+        .limit(limit)
+    )
+    return [followee_id for followee_id, in rows]
+
+
+def expand(db: Session, user_id: int) -> Candidates:
+    following = followees(db, user_id)
+    expanded = following[:MAX_EXPANDED_FOLLOWEES]
+    candidates = Candidates(set(following), set(expanded), Counter())
+    if not expanded:
+        return candidates
+    # One LIMITed read per expanded followee, each a range of the
+    # (follower_id, id) index, so no followee contributes more than
+    # MAX_EDGES_PER_FOLLOWEE rows however many accounts it follows.
+    hops = [
+        select(models.Follow.followee_id)
+        .where(models.Follow.follower_id == followee_id)
+        .order_by(models.Follow.id.desc())
+        .limit(MAX_EDGES_PER_FOLLOWEE)
+        .subquery()
+        for followee_id in expanded
+    ]
+    edges = union_all(*(select(hop.c.followee_id) for hop in hops)).subquery()
+    counts = db.query(edges.c.followee_id, func.count()).group_by(edges.c.followee_id)
+    for candidate_id, count in counts:
+        if candidates.suggestable(user_id, candidate_id):
+            candidates.counts[candidate_id] = count
+    return candidates
+
+
+def candidates(db: Session, user_id: int) -> Candidates:
+    entry = cache.suggestions.get(user_id)
+    if entry is None:
+        entry = expand(db, user_id)
+        cache.suggestions.set(user_id, entry)
+    return entry
+
+
+def get_suggestions(
+    db: Session, user_id: int, limit: int = SUGGESTIONS_SIZE
+) -> list[tuple[models.User, int]]:
+    entry = candidates(db, user_id)
+    with _lock:
+        ranked = entry.counts.most_common(limit)
+    if not ranked:
+        return []
+    users = db.query(models.User).filter(
+        models.User.id.in_([candidate_id for candidate_id, _ in ranked])
+    )
+    users = {user.id: user for user in users}
+    return [
+        (users[candidate_id], count)
+        for candidate_id, count in ranked
+        if candidate_id in users
+    ]
+
+
+def followed(db: Session, follower_id: int, followee_id: int):
+    entries = cache.suggestions.items()
+    own = dict(entries).get(follower_id)
+    second_hop = []
+    if own is not None and len(own.expanded) < MAX_EXPANDED_FOLLOWEES:
+        second_hop = followees(db, followee_id, MAX_EDGES_PER_FOLLOWEE)
+    with _lock:
+        for user_id, entry in entries:
+            if user_id == follower_id:
+                entry.following.add(followee_id)
+                entry.counts.pop(followee_id, None)
+                if second_hop:
+                    entry.expanded.add(followee_id)
+                    entry.counts.update(
+                        candidate_id
+                        for candidate_id in second_hop
+                        if entry.suggestable(user_id, candidate_id)
+                    )
+            elif follower_id in entry.expanded and entry.suggestable(
+                user_id, followee_id
+            ):
+                entry.counts[followee_id] += 1
+
+
+def unfollowed(db: Session, follower_id: int, followee_id: int):
+    entries = cache.suggestions.items()
+    own = dict(entries).get(follower_id)
+    second_hop, followed_by = [], 0
+    if own is not None:
+        if followee_id in own.expanded:
+            second_hop = followees(db, followee_id, MAX_EDGES_PER_FOLLOWEE)
+        # The account becomes a candidate again, ranked by how many of the
+        # remaining expanded followees follow it.
+        followed_by = (
+            db.query(func.count(models.Follow.id))
+            .filter(
+                models.Follow.followee_id == followee_id,
+                models.Follow.follower_id.in_(own.expanded - {followee_id}),
+            )
+            .scalar()
+        )
+    with _lock:
+        for user_id, entry in entries:
+            if user_id == follower_id:
+                entry.following.discard(followee_id)
+                entry.expanded.discard(followee_id)
+                for candidate_id in second_hop:
+                    entry.discount(candidate_id)
+                if followed_by and entry.suggestable(user_id, followee_id):
+                    entry.counts[followee_id] = followed_by
+            elif follower_id in entry.expanded:
+                entry.discount(followee_id)
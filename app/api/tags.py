@@ -0,0 +1,134 @@
+import re
+
+from sqlalchemy import delete, or_, select
+from sqlalchemy.orm import Session
+
+from . import models
+from .loading import TWEET_LOAD
+from .pagination import PAGE_SIZE, paginate
+
+# Hashtags and mentions are parsed once, when a tweet is written, into side
+# tables keyed like the timelines table: (tag or mentioned user, created_at,
+# tweet_id). Lookups page through that index and never read tweet text.
+HASHTAG = re.compile(r"(?<![\w&#])#(\w+)")
+MENTION = re.compile(r"(?<![\w@.])@(\w+)")
+MAX_TAG_LENGTH = 100
+REBUILD_BATCH = 1000
+
+
+def normalize(tag: str) -> str:
+    return tag.lstrip("#").lower()
+
+
+def hashtags(content: str) -> list[str]:
+    tags = [normalize(tag) for tag in HASHTAG.findall(content)]
+    return list(dict.fromkeys(tag for tag in tags if len(tag) <= MAX_TAG_LENGTH))
+
+
+def mentions(content: str) -> list[str]:
+    return list(dict.fromkeys(MENTION.findall(content)))
+
+
+def index_tweet(db: Session, tweet: models.Tweet) -> list[str]:
+    tags = hashtags(tweet.content)
+    db.add_all(
+        models.Hashtag(tweet_id=tweet.id, tag=tag, created_at=tweet.created_at)
+        for tag in tags
+    )
+    usernames = mentions(tweet.content)
+    if usernames:
+        mentioned = db.query(models.User.id).filter(models.User.username.in_(usernames))
+        db.add_all(
+            models.Mention(
+                tweet_id=tweet.id,
+                user_id=user_id,
+                author_id=tweet.user_id,
+                created_at=tweet.created_at,
+            )
+            for user_id, in mentioned
+        )
+    return tags
+
+
+def unindex_tweet(db: Session, tweet_id: int) -> list[str]:
+    tags = db.query(models.Hashtag.tag).filter(models.Hashtag.tweet_id == tweet_id)
+    tags = [tag for tag, in tags]
+    db.execute(delete(models.Hashtag).where(models.Hashtag.tweet_id == tweet_id))
+    db.execute(delete(models.Mention).where(models.Mention.tweet_id == tweet_id))
+    return tags
+
+
+def prune_user(db: Session, user_id: int):
+    tweets = select(models.Tweet.id).where(models.Tweet.user_id == user_id)
+    db.execute(delete(models.Hashtag).where(models.Hashtag.tweet_id.in_(tweets)))
+    db.execute(
+        delete(models.Mention).where(
+            or_(
+                models.Mention.user_id == user_id,
+                models.Mention.author_id == user_id,
+            )
+        )
+    )
+
+
+def get_tweets_hashtag(
+    tag: str,
+    db: Session,
+    cursor: str | None = None,
+    limit: int = PAGE_SIZE,
+    options: tuple = TWEET_LOAD,
+    entities: tuple = (models.Tweet,),
+):
+    query = (
+        db.query(*entities)
+        .options(*options)
+        .join(models.Hashtag, models.Hashtag.tweet_id == models.Tweet.id)
+        .filter(models.Hashtag.tag == normalize(tag))
+    )
+    return paginate(
+        query, models.Hashtag.created_at, models.Hashtag.tweet_id, cursor, limit
+    )
+
+
+def get_tweets_mentions(
+    user_id: int,
+    db: Session,
+    cursor: str | None = None,
+    limit: int = PAGE_SIZE,
+    options: tuple = TWEET_LOAD,
+    entities: tuple = (models.Tweet,),
+):
+    query = (
+        db.query(*entities)
+        .options(*options)
+        .join(models.Mention, models.Mention.tweet_id == models.Tweet.id)
+        .filter(models.Mention.user_id == user_id)
+    )
+    return paginate(
+        query, models.Mention.created_at, models.Mention.tweet_id, cursor, limit
+    )
+
+
+def rebuild(db: Session) -> tuple[int, int]:
+    db.execute(delete(models.Hashtag))
+    db.execute(delete(models.Mention))
+    tweets = db.query(models.Tweet).filter(
+        or_(models.Tweet.content.contains("#"), models.Tweet.content.contains("@"))
+    )
+    last_id = 0
+    while True:
+        batch = (
+            tweets.filter(models.Tweet.id > last_id)
+            .order_by(models.Tweet.id)
+            .limit(REBUILD_BATCH)
+            .all()
+        )
+        if not batch:
+            break
+        for tweet in batch:
+            index_tweet(db, tweet)
+        last_id = batch[-1].id
+        db.flush()
+        db.expunge_all()
+    db.commit()
+    return db.query(models.Hashtag).count(), db.query(models.Mention).count()
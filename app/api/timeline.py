@@ -0,0 +1,297 @@
+import heapq
+from datetime import datetime
+from threading import Lock
+
+from sqlalchemy import delete, insert, literal, or_, select, tuple_
+from sqlalchemy.orm import Session
+
+from . import cache, config, jobs, models
+from .loading import TWEET_LOAD
+from .pagination import PAGE_SIZE, decode_cursor, paginate
+
+# "hybrid" reads /home from the materialized timelines table and merges in
+# accounts above FANOUT_FOLLOWER_THRESHOLD at read time, "push" fans out every
+# tweet regardless of follower count and "pull" falls back to querying
+# followage on every read. Writes keep the table up to date in every mode so
+# switching back from "pull" never serves a stale inbox.
+TIMELINE_MODES = ("hybrid", "push", "pull")
+TIMELINE_MODE = config.TIMELINE_MODE
+TIMELINE_BACKFILL = 200
+FANOUT_FOLLOWER_THRESHOLD = config.FANOUT_FOLLOWER_THRESHOLD
+RECENT_TWEETS_PER_AUTHOR = 100
+
+if TIMELINE_MODE not in TIMELINE_MODES:
+    raise ValueError(f"TIMELINE_MODE must be one of {', '.join(TIMELINE_MODES)}.")
+
+ENTRY_COLUMNS = ["user_id", "tweet_id", "author_id", "created_at"]
+
+# Accounts stay heavy once they cross the threshold so that tweets they posted
+# without fan-out keep being merged in; rebuild() recomputes the set. Request
+# threads and job workers share both structures, so they only change under
+# _lock; the heavy set is replaced rather than mutated so readers can keep the
+# snapshot they got.
+_heavy_authors: frozenset[int] | None = None
+_recent_tweets: dict[int, list[tuple[datetime, int]]] = {}
+_lock = Lock()
+
+
+def heavy_authors(db: Session) -> frozenset[int]:
+    global _heavy_authors
+    with _lock:
+        if _heavy_authors is not None:
+            return _heavy_authors
+    rows = db.query(models.User.id).filter(
+        models.User.follower_count >= FANOUT_FOLLOWER_THRESHOLD
+    )
+    loaded = frozenset(author_id for author_id, in rows)
+    with _lock:
+        if _heavy_authors is None:
+            _heavy_authors = loaded
+        return _heavy_authors
+
+
+def is_heavy(db: Session, author_id: int) -> bool:
+    return TIMELINE_MODE != "push" and author_id in heavy_authors(db)
+
+
+def track_heavy(db: Session, author_id: int):
+    global _heavy_authors
+    if author_id in heavy_authors(db):
+        return
+    follower_count = (
+        db.query(models.User.follower_count)
+        .filter(models.User.id == author_id)
+        .scalar()
+    )
+    if follower_count >= FANOUT_FOLLOWER_THRESHOLD:
+        with _lock:
+            if _heavy_authors is not None:
+                _heavy_authors = _heavy_authors | {author_id}
+
+
+def recent_tweets(db: Session, author_id: int) -> list[tuple[datetime, int]]:
+    with _lock:
+        if author_id in _recent_tweets:
+            return list(_recent_tweets[author_id])
+    rows = (
+        db.query(models.Tweet.created_at, models.Tweet.id)
+        .filter(models.Tweet.user_id == author_id)
+        .order_by(models.Tweet.created_at.desc(), models.Tweet.id.desc())
+        .limit(RECENT_TWEETS_PER_AUTHOR)
+    )
+    loaded = [tuple(row) for row in rows]
+    with _lock:
+        return list(_recent_tweets.setdefault(author_id, loaded))
+
+
+def remember_tweet(tweet: models.Tweet):
+    # Authors that are not cached yet pick the tweet up on their first read.
+    with _lock:
+        tweets = _recent_tweets.get(tweet.user_id)
+        if tweets is None:
+            return
+        tweets.insert(0, (tweet.created_at, tweet.id))
+        del tweets[RECENT_TWEETS_PER_AUTHOR:]
+
+
+def forget_tweet(tweet_id: int):
+    with _lock:
+        for author_id, tweets in _recent_tweets.items():
+            if any(id == tweet_id for _, id in tweets):
+                _recent_tweets.pop(author_id)
+                return
+
+
+def fan_out(db: Session, tweet: models.Tweet):
+    db.add(
+        models.TimelineEntry(
+            user_id=tweet.user_id,
+            tweet_id=tweet.id,
+            author_id=tweet.user_id,
+            created_at=tweet.created_at,
+        )
+    )
+    if is_heavy(db, tweet.user_id):
+        remember_tweet(tweet)
+    # SQLite reuses the id of a deleted newest tweet, whose fan_out job may be
+    # kept as done; requeue so the new tweet is still fanned out.
+    jobs.enqueue(
+        db,
+        "fan_out",
+        {"tweet_id": tweet.id},
+        key=f"fan_out:{tweet.id}",
+        requeue=True,
+    )
+
+
+@jobs.handler("fan_out")
+def fan_out_followers(db: Session, payload: dict):
+    tweet = db.get(models.Tweet, payload["tweet_id"])
+    if tweet is None:
+        return
+    if not is_heavy(db, tweet.user_id):
+        # A retried job replaces the entries an interrupted run left behind.
+        db.execute(
+            delete(models.TimelineEntry).where(
+                models.TimelineEntry.tweet_id == tweet.id,
+                models.TimelineEntry.user_id != tweet.user_id,
+            )
+        )
+        followers = select(
+            models.Follow.follower_id,
+            literal(tweet.id),
+            literal(tweet.user_id),
+            literal(tweet.created_at),
+        ).where(models.Follow.followee_id == tweet.user_id)
+        db.execute(insert(models.TimelineEntry).from_select(ENTRY_COLUMNS, followers))
+        db.commit()
+    cache.invalidate_author(db, tweet.user_id)
+
+
+def backfill(db: Session, follower_id: int, followee_id: int):
+    track_heavy(db, followee_id)
+    if is_heavy(db, followee_id):
+        return
+    recent_tweets = (
+        select(
+            literal(follower_id),
+            models.Tweet.id,
+            models.Tweet.user_id,
+            models.Tweet.created_at,
+        )
+        .where(models.Tweet.user_id == followee_id)
+        .order_by(models.Tweet.created_at.desc())
+        .limit(TIMELINE_BACKFILL)
+    )
+    db.execute(insert(models.TimelineEntry).from_select(ENTRY_COLUMNS, recent_tweets))
+
+
+def prune_follow(db: Session, follower_id: int, followee_id: int):
+    db.execute(
+        delete(models.TimelineEntry).where(
+            models.TimelineEntry.user_id == follower_id,
+            models.TimelineEntry.author_id == followee_id,
+        )
+    )
+
+
+def prune_tweet(db: Session, tweet_id: int):
+    forget_tweet(tweet_id)
+    db.execute(
+        delete(models.TimelineEntry).where(models.TimelineEntry.tweet_id == tweet_id)
+    )
+
+
+def prune_user(db: Session, user_id: int):
+    with _lock:
+        _recent_tweets.pop(user_id, None)
+    db.execute(
+        delete(models.TimelineEntry).where(
+            or_(
+                models.TimelineEntry.user_id == user_id,
+                models.TimelineEntry.author_id == user_id,
+            )
+        )
+    )
+
+
+def author_tweets(
+    db: Session, author_id: int, position: tuple | None, limit: int
+) -> list[tuple[datetime, int]]:
+    cached = recent_tweets(db, author_id)
+    tweets = [key for key in cached if position is None or key < position]
+    if len(tweets) >= limit or len(cached) < RECENT_TWEETS_PER_AUTHOR:
+        return tweets[:limit]
+    # Paging past the cached window reads the author's tweets directly.
+    query = db.query(models.Tweet.created_at, models.Tweet.id).filter(
+        models.Tweet.user_id == author_id
+    )
+    if position:
+        query = query.filter(
+            tuple_(models.Tweet.created_at, models.Tweet.id) < position
+        )
+    rows = query.order_by(models.Tweet.created_at.desc(), models.Tweet.id.desc())
+    return [tuple(row) for row in rows.limit(limit)]
+
+
+def heavy_followees(db: Session, user_id: int) -> list[int]:
+    heavy = heavy_authors(db)
+    if TIMELINE_MODE == "push" or not heavy:
+        return []
+    followees = db.query(models.Follow.followee_id).filter(
+        models.Follow.follower_id == user_id
+    )
+    return [followee_id for followee_id, in followees if followee_id in heavy]
+
+
+def get_home(
+    user_id: int,
+    db: Session,
+    cursor: str | None = None,
+    limit: int = PAGE_SIZE,
+    options: tuple = TWEET_LOAD,
+    entities: tuple = (models.Tweet,),
+):
+    query = (
+        db.query(*entities)
+        .options(*options)
+        .join(models.TimelineEntry, models.TimelineEntry.tweet_id == models.Tweet.id)
+        .filter(models.TimelineEntry.user_id == user_id)
+    )
+    inbox = paginate(
+        query,
+        models.TimelineEntry.created_at,
+        models.TimelineEntry.tweet_id,
+        cursor,
+        limit,
+    )
+    authors = heavy_followees(db, user_id)
+    if not authors:
+        return inbox
+
+    position = decode_cursor(cursor)
+    streams = [[(tweet.created_at, tweet.id) for tweet in inbox]]
+    streams += [author_tweets(db, author, position, limit) for author in authors]
+    tweet_ids = {}
+    for _, tweet_id in heapq.merge(*streams, reverse=True):
+        tweet_ids.setdefault(tweet_id)
+        if len(tweet_ids) == limit:
+            break
+
+    tweets = {tweet.id: tweet for tweet in inbox}
+    missing = [tweet_id for tweet_id in tweet_ids if tweet_id not in tweets]
+    if missing:
+        rows = (
+            db.query(*entities).options(*options).filter(models.Tweet.id.in_(missing))
+        )
+        tweets.update((tweet.id, tweet) for tweet in rows)
+    return [tweets[tweet_id] for tweet_id in tweet_ids if tweet_id in tweets]
+
+
+def rebuild(db: Session):
+    global _heavy_authors
+    with _lock:
+        _heavy_authors = None
+        _recent_tweets.clear()
+    db.execute(delete(models.TimelineEntry))
+    own_tweets = select(
+        models.Tweet.user_id,
+        models.Tweet.id,
+        models.Tweet.user_id,
+        models.Tweet.created_at,
+    )
+    db.execute(insert(models.TimelineEntry).from_select(ENTRY_COLUMNS, own_tweets))
+    followed_tweets = select(
+        models.Follow.follower_id,
+        models.Tweet.id,
+        models.Tweet.user_id,
+        models.Tweet.created_at,
+    ).join(models.Tweet, models.Tweet.user_id == models.Follow.followee_id)
+    if TIMELINE_MODE != "push":
+        heavy = heavy_authors(db)
+        followed_tweets = followed_tweets.where(
+            models.Tweet.user_id.not_in(list(heavy))
+        )
+    db.execute(insert(models.TimelineEntry).from_select(ENTRY_COLUMNS, followed_tweets))
+    db.commit()
+    return db.query(models.TimelineEntry).count()
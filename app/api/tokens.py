@@ -0,0 +1,192 @@
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta
+from threading import Lock, Thread
+
+from jose import JWTError, jwt
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from . import auth, models
+from .database import SessionLocal
+
+REFRESH_TOKEN_EXPIRE_DAYS = 30
+# Concurrent requests may present the same refresh token while the first one
+# rotates it. Inside this window they get the tokens that rotation issued
+# instead of tripping reuse detection.
+ROTATION_GRACE_SECONDS = 30
+# How long a logout or a replayed token in another process can go unnoticed.
+REVOCATION_CHECK_SECONDS = 5
+
+# A session is one login: its refresh tokens share a family id, rotation
+# keeps it, and access tokens carry it as "sid". Families that were logged out
+# or caught replaying a rotated token are kept here and reloaded by a
+# background thread every REVOCATION_CHECK_SECONDS, so checking an access
+# token never touches the database, nor blocks the event loop on it. Revokes
+# made by this process apply at once.
+_revoked_sessions: set[str] = set()
+_revoked_here: set[str] = set()
+_revoked_lock = Lock()
+_loader: Thread | None = None
+
+logger = logging.getLogger(__name__)
+
+
+def load_revoked_sessions():
+    global _revoked_sessions
+    with _revoked_lock:
+        _revoked_here.clear()
+    db = SessionLocal()
+    try:
+        # Rotated tokens point at their replacement; a revoked one without a
+        # replacement ended its session.
+        rows = db.query(models.RefreshToken.family).filter(
+            models.RefreshToken.revoked_at.is_not(None),
+            models.RefreshToken.replaced_by.is_(None),
+            models.RefreshToken.expires_at > datetime.utcnow(),
+        )
+        loaded = {family for family, in rows}
+    finally:
+        db.close()
+    with _revoked_lock:
+        # Revokes committed while the query ran may be missing from it.
+        _revoked_sessions = loaded | _revoked_here
+
+
+def run_revocation_loader():
+    while True:
+        time.sleep(REVOCATION_CHECK_SECONDS)
+        try:
+            load_revoked_sessions()
+        except SQLAlchemyError:
+            logger.exception("Loading revoked sessions failed")
+
+
+def start_revocation_loader():
+    global _loader
+    if _loader is None or not _loader.is_alive():
+        load_revoked_sessions()
+        _loader = Thread(target=run_revocation_loader, name="revocations", daemon=True)
+        _loader.start()
+
+
+def is_revoked(session_id: str | None) -> bool:
+    return session_id is not None and session_id in _revoked_sessions
+
+
+def decode(token: str | None) -> dict | None:
+    if not token:
+        return None
+    try:
+        payload = jwt.decode(token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM])
+    except JWTError:
+        return None
+    if payload.get("type") != "refresh" or not payload.get("jti"):
+        return None
+    return payload
+
+
+def create_refresh_token(
+    db: Session, user: models.User, family: str
+) -> models.RefreshToken:
+    creation_datetime = datetime.utcnow()
+    refresh = models.RefreshToken(
+        jti=uuid.uuid4().hex,
+        family=family,
+        user_id=user.id,
+        created_at=creation_datetime,
+        expires_at=creation_datetime + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    )
+    db.add(refresh)
+    return refresh
+
+
+def session_tokens(user: models.User, refresh: models.RefreshToken) -> dict:
+    # Both tokens are derived from the stored refresh token alone, so issuing
+    # the same row again yields exactly the same tokens.
+    access_expire = refresh.created_at + timedelta(
+        minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES
+    )
+    return {
+        "access_token": jwt.encode(
+            {"sub": user.username, "sid": refresh.family, "exp": access_expire},
+            auth.SECRET_KEY,
+            algorithm=auth.ALGORITHM,
+        ),
+        "token_type": "bearer",
+        "refresh_token": jwt.encode(
+            {
+                "sub": user.username,
+                "jti": refresh.jti,
+                "type": "refresh",
+                "exp": refresh.expires_at,
+            },
+            auth.SECRET_KEY,
+            algorithm=auth.ALGORITHM,
+        ),
+    }
+
+
+def create_tokens(db: Session, user: models.User) -> dict:
+    refresh = create_refresh_token(db, user, uuid.uuid4().hex)
+    db.commit()
+    return session_tokens(user, refresh)
+
+
+def find(db: Session, jti: str) -> models.RefreshToken | None:
+    return db.query(models.RefreshToken).filter(models.RefreshToken.jti == jti).first()
+
+
+def rotate(db: Session, token: str | None) -> dict | None:
+    payload = decode(token)
+    if payload is None:
+        return None
+    stored = find(db, payload["jti"])
+    if stored is None or is_revoked(stored.family):
+        return None
+    user = auth.get_user(db, payload["sub"])
+    if user is None or user.id != stored.user_id:
+        return None
+    if stored.revoked_at is not None:
+        grace = timedelta(seconds=ROTATION_GRACE_SECONDS)
+        if stored.replaced_by and datetime.utcnow() - stored.revoked_at < grace:
+            # Hand out what the rotation already issued; the session still
+            # has a single live refresh token.
+            replacement = find(db, stored.replaced_by)
+            if replacement is None or replacement.revoked_at is not None:
+                return None
+            return session_tokens(user, replacement)
+        # A rotated token came back, so it has leaked: end the whole session
+        # rather than guess which holder is legitimate.
+        revoke_session(db, stored.family)
+        return None
+    replacement = create_refresh_token(db, user, stored.family)
+    stored.revoked_at = datetime.utcnow()
+    stored.replaced_by = replacement.jti
+    db.commit()
+    return session_tokens(user, replacement)
+
+
+def revoke_session(db: Session, family: str):
+    db.query(models.RefreshToken).filter(
+        models.RefreshToken.family == family,
+        models.RefreshToken.revoked_at.is_(None),
+    ).update({"revoked_at": datetime.utcnow()}, synchronize_session=False)
+    db.commit()
+    with _revoked_lock:
+        _revoked_sessions.add(family)
+        _revoked_here.add(family)
+
+
+def revoke(db: Session, token: str | None):
+    payload = decode(token)
+    if payload is None:
+        return
+    family = (
+        db.query(models.RefreshToken.family)
+        .filter(models.RefreshToken.jti == payload["jti"])
+        .scalar()
+    )
+    if family is not None:
+        revoke_session(db, family)
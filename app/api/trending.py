@@ -0,0 +1,158 @@
+import heapq
+import time
+from datetime import datetime
+from threading import Lock, Thread
+from typing import Iterable
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from . import models
+from .database import SessionLocal
+
+# Trends count hashtag uses over a sliding window of WINDOW_BUCKETS buckets of
+# BUCKET_SECONDS each. Counts live in memory in a ring indexed by bucket
+# number, so recording a use and reading the top tags never touch the
+# database. Every CHECKPOINT_SECONDS a background thread adds the counts
+# recorded since the last checkpoint to trend_buckets and reads the window
+# back, which restores it after a restart and folds in what other processes
+# recorded.
+BUCKET_SECONDS = 300
+WINDOW_BUCKETS = 12
+CHECKPOINT_SECONDS = 60
+TRENDING_SIZE = 10
+EPOCH = datetime(1970, 1, 1)
+
+
+def bucket_of(moment: datetime) -> int:
+    return int((moment - EPOCH).total_seconds()) // BUCKET_SECONDS
+
+
+class RingCounter:
+    def __init__(self, size: int):
+        self.size = size
+        self.buckets: list[int | None] = [None] * size
+        self.counts: dict[str, list[int]] = {}
+        self.totals: dict[str, int] = {}
+
+    def clear(self, slot: int):
+        for tag, counts in list(self.counts.items()):
+            if counts[slot]:
+                self.totals[tag] -= counts[slot]
+                counts[slot] = 0
+                if self.totals[tag] <= 0:
+                    del self.counts[tag], self.totals[tag]
+        self.buckets[slot] = None
+
+    def advance(self, bucket: int):
+        for slot, held in enumerate(self.buckets):
+            if held is not None and held <= bucket - self.size:
+                self.clear(slot)
+
+    def add(self, tag: str, bucket: int, delta: int = 1):
+        slot = bucket % self.size
+        held = self.buckets[slot]
+        if held is not None and held > bucket:
+            return
+        if held != bucket:
+            if delta < 0:
+                return
+            self.clear(slot)
+            self.buckets[slot] = bucket
+        counts = self.counts.setdefault(tag, [0] * self.size)
+        delta = max(delta, -counts[slot])
+        counts[slot] += delta
+        self.totals[tag] = self.totals.get(tag, 0) + delta
+        if self.totals[tag] <= 0:
+            del self.counts[tag], self.totals[tag]
+
+    def top(self, bucket: int, n: int) -> list[tuple[str, int]]:
+        self.advance(bucket)
+        return heapq.nlargest(n, self.totals.items(), key=lambda item: item[1])
+
+
+_ring = RingCounter(WINDOW_BUCKETS)
+_pending: dict[tuple[str, int], int] = {}
+_lock = Lock()
+_checkpointer: Thread | None = None
+
+
+def record(tags: Iterable[str], moment: datetime, delta: int = 1):
+    bucket = bucket_of(moment)
+    with _lock:
+        for tag in tags:
+            _ring.add(tag, bucket, delta)
+            _pending[tag, bucket] = _pending.get((tag, bucket), 0) + delta
+
+
+def save(db, pending: dict[tuple[str, int], int], oldest: int):
+    table = models.TrendBucket
+    for (tag, bucket), delta in pending.items():
+        if not delta or bucket <= oldest:
+            continue
+        updated = (
+            db.query(table)
+            .filter(table.tag == tag, table.bucket == bucket)
+            .update({table.count: table.count + delta}, synchronize_session=False)
+        )
+        if not updated:
+            db.add(table(tag=tag, bucket=bucket, count=delta))
+    db.query(table).filter(table.bucket <= oldest).delete(synchronize_session=False)
+    db.commit()
+
+
+def load(db, oldest: int) -> RingCounter:
+    ring = RingCounter(WINDOW_BUCKETS)
+    rows = db.query(
+        models.TrendBucket.tag, models.TrendBucket.bucket, models.TrendBucket.count
+    ).filter(models.TrendBucket.bucket > oldest)
+    for tag, bucket, count in rows.order_by(models.TrendBucket.bucket):
+        ring.add(tag, bucket, count)
+    return ring
+
+
+def checkpoint():
+    global _ring
+    with _lock:
+        pending = dict(_pending)
+        _pending.clear()
+    oldest = bucket_of(datetime.utcnow()) - WINDOW_BUCKETS
+    db = SessionLocal()
+    try:
+        save(db, pending, oldest)
+    except SQLAlchemyError:
+        # Trends are best effort: keep the counts and retry next time.
+        db.rollback()
+        db.close()
+        with _lock:
+            for key, delta in pending.items():
+                _pending[key] = _pending.get(key, 0) + delta
+        return
+    try:
+        ring = load(db, oldest)
+    except SQLAlchemyError:
+        return
+    finally:
+        db.close()
+    with _lock:
+        # Uses recorded while the checkpoint ran are not in the table yet.
+        for (tag, bucket), delta in _pending.items():
+            ring.add(tag, bucket, delta)
+        _ring = ring
+
+
+def run_checkpointer():
+    while True:
+        checkpoint()
+        time.sleep(CHECKPOINT_SECONDS)
+
+
+def start_checkpointer():
+    global _checkpointer
+    if _checkpointer is None or not _checkpointer.is_alive():
+        _checkpointer = Thread(target=run_checkpointer, name="trending", daemon=True)
+        _checkpointer.start()
+
+
+def trending(limit: int = TRENDING_SIZE) -> list[tuple[str, int]]:
+    with _lock:
+        return _ring.top(bucket_of(datetime.utcnow()), limit)
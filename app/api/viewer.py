@@ -0,0 +1,50 @@
+from typing import Iterable
+
+from sqlalchemy.orm import Session
+
+from . import graph, models, writebuffer
+
+
+class ViewerState:
+    def __init__(self, liked_tweet_ids=frozenset(), followed_user_ids=frozenset()):
+        self.liked_tweet_ids = set(liked_tweet_ids)
+        self.followed_user_ids = set(followed_user_ids)
+
+    def annotate(self, tweets: Iterable[models.Tweet]):
+        for tweet in tweets:
+            tweet.liked = tweet.id in self.liked_tweet_ids
+        return tweets
+
+
+def get_viewer_state(
+    db: Session,
+    user_id: int,
+    tweets: Iterable[models.Tweet] = (),
+    user_ids: Iterable[int] = (),
+) -> ViewerState:
+    tweets = list(tweets)
+    tweet_ids = {tweet.id for tweet in tweets}
+    author_ids = {tweet.user_id for tweet in tweets} | set(user_ids)
+    liked = set()
+    if tweet_ids:
+        liked = {
+            tweet_id
+            for tweet_id, in db.query(models.Like.tweet_id).filter(
+                models.Like.user_id == user_id, models.Like.tweet_id.in_(tweet_ids)
+            )
+        }
+    liked = writebuffer.overlay(writebuffer.LIKE, user_id, tweet_ids, liked)
+    followed = set()
+    follow_graph = graph.get()
+    if author_ids and follow_graph:
+        followed = follow_graph.followed_among(user_id, author_ids)
+    elif author_ids:
+        followed = {
+            followee_id
+            for followee_id, in db.query(models.Follow.followee_id).filter(
+                models.Follow.follower_id == user_id,
+                models.Follow.followee_id.in_(author_ids),
+            )
+        }
+    followed = writebuffer.overlay(writebuffer.FOLLOW, user_id, author_ids, followed)
+    return ViewerState(liked, followed)
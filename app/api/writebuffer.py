@@ -0,0 +1,284 @@
+import logging
+import time
+from collections import Counter
+from datetime import datetime
+from itertools import islice
+from threading import Event, Lock, Thread
+from typing import Iterable
+
+from sqlalchemy import delete, insert, tuple_
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from . import cache, config, counters, graph, models, ranking, suggestions, timeline
+from .database import SessionLocal
+
+# Likes and follows are the most frequent writes and each used to pay for its
+# own commit. With WRITE_BUFFER=1 the toggles are kept here instead: repeated
+# toggles of one (user, target) pair collapse into the last one, and a flusher
+# thread writes up to BATCH_SIZE pairs per transaction every FLUSH_MS, or as
+# soon as BATCH_SIZE are waiting. Follow and like checks and viewer state look
+# here first; counters, timelines and the follow graph catch up at the flush.
+# Toggles still buffered when the process dies are lost. Shutdown keeps
+# flushing for up to SHUTDOWN_SECONDS and drops the rest.
+ENABLED = config.WRITE_BUFFER
+FLUSH_MS = config.WRITE_BUFFER_FLUSH_MS
+BATCH_SIZE = config.WRITE_BUFFER_BATCH_SIZE
+SHUTDOWN_SECONDS = config.WRITE_BUFFER_SHUTDOWN_SECONDS
+LIKE = "like"
+FOLLOW = "follow"
+
+logger = logging.getLogger(__name__)
+
+_pending: dict[tuple[str, int, int], bool] = {}
+_flushing: dict[tuple[str, int, int], bool] = {}
+_lock = Lock()
+_flush_lock = Lock()
+_wake = Event()
+_stopping = Event()
+_flusher: Thread | None = None
+
+
+def put(kind: str, user_id: int, target_id: int, present: bool):
+    with _lock:
+        _pending[kind, int(user_id), int(target_id)] = present
+        full = len(_pending) >= BATCH_SIZE
+    if full:
+        _wake.set()
+
+
+def state(kind: str, user_id: int, target_id: int) -> bool | None:
+    key = (kind, int(user_id), int(target_id))
+    with _lock:
+        if key in _pending:
+            return _pending[key]
+        return _flushing.get(key)
+
+
+def overlay(kind: str, user_id: int, target_ids: Iterable[int], present: set) -> set:
+    with _lock:
+        if not _pending and not _flushing:
+            return present
+        present = set(present)
+        for target_id in target_ids:
+            key = (kind, int(user_id), int(target_id))
+            buffered = _pending.get(key, _flushing.get(key))
+            if buffered is True:
+                present.add(target_id)
+            elif buffered is False:
+                present.discard(target_id)
+        return present
+
+
+def discard_user(user_id: int):
+    with _lock:
+        for key in list(_pending):
+            kind, follower_id, target_id = key
+            if user_id == follower_id or (kind == FOLLOW and user_id == target_id):
+                del _pending[key]
+
+
+def size() -> int:
+    with _lock:
+        return len(_pending) + len(_flushing)
+
+
+def write_likes(db: Session, toggles: dict[tuple[int, int], bool]):
+    pair = tuple_(models.Like.user_id, models.Like.tweet_id)
+    existing = db.query(models.Like.id, models.Like.user_id, models.Like.tweet_id)
+    existing = {
+        (user_id, tweet_id): id
+        for id, user_id, tweet_id in existing.filter(pair.in_(list(toggles)))
+    }
+    wanted = [key for key, present in toggles.items() if present]
+    wanted = [key for key in wanted if key not in existing]
+    found = db.query(models.Tweet.id).filter(
+        models.Tweet.id.in_({tweet_id for _, tweet_id in wanted})
+    )
+    found = {tweet_id for tweet_id, in found}
+    added = [(user_id, tweet_id) for user_id, tweet_id in wanted if tweet_id in found]
+    removed = [key for key, present in toggles.items() if not present]
+    removed = [key for key in removed if key in existing]
+    if added:
+        creation_datetime = datetime.utcnow()
+        db.execute(
+            insert(models.Like),
+            [
+                {
+                    "user_id": user_id,
+                    "tweet_id": tweet_id,
+                    "created_at": creation_datetime,
+                }
+                for user_id, tweet_id in added
+            ],
+        )
+    if removed:
+        db.execute(
+            delete(models.Like).where(
+                models.Like.id.in_([existing[key] for key in removed])
+            )
+        )
+    deltas = Counter(tweet_id for _, tweet_id in added)
+    deltas.subtract(tweet_id for _, tweet_id in removed)
+    counters.adjust_many(db, models.Tweet.like_count, deltas)
+    return added, removed
+
+
+def write_follows(db: Session, toggles: dict[tuple[int, int], bool]):
+    pair = tuple_(models.Follow.follower_id, models.Follow.followee_id)
+    existing = db.query(
+        models.Follow.id, models.Follow.follower_id, models.Follow.followee_id
+    )
+    existing = {
+        (follower_id, followee_id): id
+        for id, follower_id, followee_id in existing.filter(pair.in_(list(toggles)))
+    }
+    wanted = [key for key, present in toggles.items() if present]
+    wanted = [key for key in wanted if key not in existing]
+    found = db.query(models.User.id).filter(
+        models.User.id.in_({user_id for key in wanted for user_id in key})
+    )
+    found = {user_id for user_id, in found}
+    added = [
+        (follower_id, followee_id)
+        for follower_id, followee_id in wanted
+        if follower_id in found and followee_id in found
+    ]
+    removed = [key for key, present in toggles.items() if not present]
+    removed = [key for key in removed if key in existing]
+    if added:
+        creation_datetime = datetime.utcnow()
+        db.execute(
+            insert(models.Follow),
+            [
+                {
+                    "follower_id": follower_id,
+                    "followee_id": followee_id,
+                    "created_at": creation_datetime,
+                }
+                for follower_id, followee_id in added
+            ],
+        )
+        for follower_id, followee_id in added:
+            timeline.backfill(db, follower_id, followee_id)
+    if removed:
+        db.execute(
+            delete(models.Follow).where(
+                models.Follow.id.in_([existing[key] for key in removed])
+            )
+        )
+        for follower_id, followee_id in removed:
+            timeline.prune_follow(db, follower_id, followee_id)
+    following = Counter(follower_id for follower_id, _ in added)
+    following.subtract(follower_id for follower_id, _ in removed)
+    counters.adjust_many(db, models.User.following_count, following)
+    followers = Counter(followee_id for _, followee_id in added)
+    followers.subtract(followee_id for _, followee_id in removed)
+    counters.adjust_many(db, models.User.follower_count, followers)
+    return added, removed
+
+
+def take() -> dict[tuple[str, int, int], bool]:
+    with _lock:
+        keys = list(islice(_pending, BATCH_SIZE))
+        for key in keys:
+            _flushing[key] = _pending.pop(key)
+        return dict(_flushing)
+
+
+def flush(db: Session) -> int:
+    with _flush_lock:
+        toggles = take()
+        if not toggles:
+            return 0
+        likes = {
+            (user_id, target_id): present
+            for (kind, user_id, target_id), present in toggles.items()
+            if kind == LIKE
+        }
+        follows = {
+            (user_id, target_id): present
+            for (kind, user_id, target_id), present in toggles.items()
+            if kind == FOLLOW
+        }
+        try:
+            liked, unliked = write_likes(db, likes) if likes else ([], [])
+            followed, unfollowed = write_follows(db, follows) if follows else ([], [])
+            ranking.mark(db, [tweet_id for _, tweet_id in liked + unliked])
+            db.commit()
+        except SQLAlchemyError:
+            db.rollback()
+            with _lock:
+                # Toggles made while the flush ran are newer and win.
+                for key, present in _flushing.items():
+                    _pending.setdefault(key, present)
+                _flushing.clear()
+            raise
+        for _, tweet_id in liked + unliked:
+            cache.invalidate_tweet(tweet_id)
+        follow_graph = graph.get()
+        for follower_id, followee_id in followed + unfollowed:
+            cache.invalidate_user(follower_id)
+            cache.invalidate_user(followee_id)
+            cache.invalidate_viewer(follower_id)
+        for follower_id, followee_id in followed:
+            if follow_graph:
+                follow_graph.add(follower_id, followee_id)
+            suggestions.followed(db, follower_id, followee_id)
+        for follower_id, followee_id in unfollowed:
+            if follow_graph:
+                follow_graph.remove(follower_id, followee_id)
+            suggestions.unfollowed(db, follower_id, followee_id)
+        with _lock:
+            _flushing.clear()
+        return len(toggles)
+
+
+def run_flusher():
+    while not _stopping.is_set():
+        _wake.wait(FLUSH_MS / 1000)
+        _wake.clear()
+        if _stopping.is_set() or not _pending:
+            continue
+        db = SessionLocal()
+        try:
+            while not _stopping.is_set() and flush(db):
+                pass
+        except SQLAlchemyError:
+            # The toggles are back in the buffer and retried on the next pass.
+            logger.exception("Write buffer flush failed")
+        finally:
+            db.close()
+
+
+def start():
+    global _flusher
+    if _flusher is None or not _flusher.is_alive():
+        _stopping.clear()
+        _flusher = Thread(target=run_flusher, name="writebuffer", daemon=True)
+        _flusher.start()
+
+
+def stop(timeout: float = SHUTDOWN_SECONDS) -> int:
+    deadline = time.monotonic() + timeout
+    # The flusher finishes the batch it is writing, then leaves the rest to
+    # this loop.
+    _stopping.set()
+    _wake.set()
+    if _flusher is not None:
+        _flusher.join(max(deadline - time.monotonic(), 0))
+    db = SessionLocal()
+    try:
+        while _pending and time.monotonic() < deadline:
+            try:
+                flush(db)
+            except SQLAlchemyError:
+                time.sleep(FLUSH_MS / 1000)
+    finally:
+        db.close()
+    with _lock:
+        dropped = len(_pending)
+        _pending.clear()
+    if dropped:
+        logger.warning("Write buffer dropped %d toggles on shutdown", dropped)
+    return dropped
@@ -1,9 +1,14 @@
 from fastapi import FastAPI
 
-from .api import main
+from .api import main, querycount, readyourwrites, trending, writebuffer
 from .web import login, root, utils, views
 
 app = FastAPI(title="Ugly")
+app.middleware("http")(querycount.query_budget_middleware)
+app.middleware("http")(login.renew_session_middleware)
+app.middleware("http")(readyourwrites.read_your_writes_middleware)
+app.add_event_handler("shutdown", writebuffer.stop)
+app.add_event_handler("shutdown", trending.checkpoint)
 
 app.include_router(root.router)
 app.include_router(login.router)
@@ -0,0 +1,180 @@
+import argparse
+import sys
+from datetime import datetime
+
+from app.api import (
+    counters,
+    export,
+    jobs,
+    migrations,
+    queryplan,
+    ranking,
+    search,
+    tags,
+    timeline,
+    trending,
+)
+from app.api.database import SQLALCHEMY_DATABASE_URL, SessionLocal, engine, is_sqlite
+
+
+def migrate(args):
+    if args.dry_run:
+        for version, name in migrations.pending(engine):
+            print(f"Pending migration {version}: {name}")
+        return
+    for version, name in migrations.upgrade(engine):
+        print(f"Applied migration {version}: {name}")
+
+
+def check_query_plans(args):
+    if not is_sqlite(SQLALCHEMY_DATABASE_URL):
+        sys.exit("Query plans can only be checked against SQLite.")
+    db = SessionLocal()
+    try:
+        results = queryplan.check(db)
+    finally:
+        db.close()
+    if not results:
+        sys.exit("Query plans need at least one user and one tweet to check.")
+    scans = [result for result in results if result["full_scans"]]
+    for result in results:
+        if args.verbose or result["full_scans"]:
+            print(f"{result['query']}: {result['statement']}")
+            for step in result["plan"]:
+                print(f"    {step}")
+    print(f"Checked {len(results)} statements, {len(scans)} with full table scans.")
+    if scans:
+        sys.exit(1)
+
+
+def rebuild_timelines(args):
+    db = SessionLocal()
+    try:
+        count = timeline.rebuild(db)
+    finally:
+        db.close()
+    print(f"Rebuilt home timelines with {count} entries.")
+
+
+def repair_counters(args):
+    db = SessionLocal()
+    try:
+        tweets, users = counters.repair(db)
+    finally:
+        db.close()
+    print(f"Recomputed counters for {tweets} tweets and {users} users.")
+
+
+def rebuild_search_index(args):
+    if not is_sqlite(SQLALCHEMY_DATABASE_URL):
+        sys.exit("Full-text search indexes are only kept on SQLite.")
+    db = SessionLocal()
+    try:
+        count = search.rebuild(db)
+        db.commit()
+    finally:
+        db.close()
+    print(f"Rebuilt full-text search indexes over {count} tweets and comments.")
+
+
+def rebuild_scores(args):
+    db = SessionLocal()
+    try:
+        count = ranking.rebuild(db)
+    finally:
+        db.close()
+    print(f"Rescored {count} tweets for explore.")
+
+
+def rebuild_tags(args):
+    db = SessionLocal()
+    try:
+        hashtags, mentions = tags.rebuild(db)
+    finally:
+        db.close()
+    print(f"Reindexed {hashtags} hashtags and {mentions} mentions.")
+
+
+def show_trending(args):
+    trending.checkpoint()
+    for tag, count in trending.trending(args.limit):
+        print(f"#{tag}\t{count}")
+
+
+def run_jobs(args):
+    for worker in jobs.start(args.workers):
+        worker.join()
+
+
+def export_table(args):
+    output = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        for chunk in export.stream(SessionLocal, args.table, args.since, args.gzip):
+            output.write(chunk)
+    finally:
+        if args.output:
+            output.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.manage")
+    commands = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = commands.add_parser(
+        "migrate", help="apply pending schema migrations"
+    )
+    migrate_parser.add_argument(
+        "--dry-run", action="store_true", help="list pending migrations only"
+    )
+    migrate_parser.set_defaults(func=migrate)
+    plans_parser = commands.add_parser(
+        "check-query-plans", help="fail if a hot query scans a whole table"
+    )
+    plans_parser.add_argument(
+        "--verbose", action="store_true", help="print every plan, not just scans"
+    )
+    plans_parser.set_defaults(func=check_query_plans)
+    commands.add_parser(
+        "rebuild-timelines", help="rebuild every materialized home timeline"
+    ).set_defaults(func=rebuild_timelines)
+    commands.add_parser(
+        "repair-counters", help="recompute like, comment and follower counters"
+    ).set_defaults(func=repair_counters)
+    commands.add_parser(
+        "rebuild-search-index", help="rebuild the full-text search indexes"
+    ).set_defaults(func=rebuild_search_index)
+    commands.add_parser(
+        "rebuild-scores", help="recompute every explore ranking score"
+    ).set_defaults(func=rebuild_scores)
+    commands.add_parser(
+        "rebuild-tags", help="reparse hashtags and mentions from every tweet"
+    ).set_defaults(func=rebuild_tags)
+    trending_parser = commands.add_parser(
+        "trending", help="print the trending hashtags from the last checkpoint"
+    )
+    trending_parser.add_argument("--limit", type=int, default=trending.TRENDING_SIZE)
+    trending_parser.set_defaults(func=show_trending)
+    jobs_parser = commands.add_parser(
+        "run-jobs", help="run queued background jobs until interrupted"
+    )
+    jobs_parser.add_argument("--workers", type=int, default=max(jobs.WORKERS, 1))
+    jobs_parser.set_defaults(func=run_jobs)
+    export_parser = commands.add_parser(
+        "export", help="stream a table as NDJSON for analytics"
+    )
+    export_parser.add_argument("table", choices=sorted(export.EXPORTS))
+    export_parser.add_argument(
+        "--since",
+        type=datetime.fromisoformat,
+        help="only rows created or updated at or after this ISO timestamp",
+    )
+    export_parser.add_argument("--gzip", action="store_true")
+    export_parser.add_argument("--output", help="write to a file instead of stdout")
+    export_parser.set_defaults(func=export_table)
+    args = parser.parse_args(argv)
+    if args.func is not migrate:
+        migrations.upgrade(engine)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,69 @@
-from datetime import datetime, timedelta
 from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import templates
-from app.api.auth import (
-    ACCESS_TOKEN_EXPIRE_MINUTES,
-    TokenData,
-    authenticate_user,
-    create_access_token,
-    get_bearer,
-    get_user,
-)
-from app.api.crud import create_user
-from app.api.main import get_db
+from app.api import tokens
+from app.api.async_crud import authenticate_user, create_user, get_user
+from app.api.auth import TokenData, get_bearer
+from app.api.database import AsyncSessionLocal
+from app.api.main import get_async_db
 from app.api.schemas import UserCreate
 
 router = APIRouter()
 
 
+def set_session_cookies(response, session_tokens: dict):
+    response.set_cookie(key="bearer", value=session_tokens["access_token"])
+    if session_tokens.get("refresh_token"):
+        response.set_cookie(
+            key="refresh",
+            value=session_tokens["refresh_token"],
+            max_age=tokens.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60,
+            httponly=True,
+            samesite="lax",
+        )
+
+
+async def renew_session_middleware(request: Request, call_next):
+    if request.url.path.startswith("/api"):
+        return await call_next(request)
+    bearer = get_bearer(request.cookies.get("bearer"))
+    if bearer and not tokens.is_revoked(bearer.session):
+        return await call_next(request)
+    refresh_token = request.cookies.get("refresh")
+    if not refresh_token and "bearer" not in request.cookies:
+        return await call_next(request)
+    renewed = None
+    if refresh_token:
+        async with AsyncSessionLocal() as db:
+            renewed = await db.run_sync(
+                lambda session: tokens.rotate(session, refresh_token)
+            )
+    cookies = dict(request.cookies)
+    cookies.pop("bearer", None)
+    if renewed:
+        cookies["bearer"] = renewed["access_token"]
+    # Handlers read the cookie header, so they see the renewed access token
+    # (or no token at all) as if the browser had sent it.
+    headers = [
+        (name, value) for name, value in request.scope["headers"] if name != b"cookie"
+    ]
+    if cookies:
+        cookie = "; ".join(f"{name}={value}" for name, value in cookies.items())
+        headers.append((b"cookie", cookie.encode("latin-1")))
+    request.scope["headers"] = headers
+    response = await call_next(request)
+    if renewed:
+        set_session_cookies(response, renewed)
+    elif refresh_token:
+        response.delete_cookie(key="refresh")
+    return response
+
+
 @router.get("/login", response_class=HTMLResponse)
 async def get_login(
     request: Request,
@@ -44,18 +86,18 @@ async def get_login(
 
 @router.post("/login")
 async def login_for_cookie(
-    db: Session = Depends(get_db), form_data: OAuth2PasswordRequestForm = Depends()
+    db: AsyncSession = Depends(get_async_db),
+    form_data: OAuth2PasswordRequestForm = Depends(),
 ):
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         response = RedirectResponse("/login?invalid=True", status_code=302)
     if user:
-        access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-        access_token = create_access_token(
-            data={"sub": user.username}, expires_delta=access_token_expires
+        session_tokens = await db.run_sync(
+            lambda session: tokens.create_tokens(session, user)
         )
         response = RedirectResponse("/home", status_code=302)
-        response.set_cookie(key="bearer", value=access_token)
+        set_session_cookies(response, session_tokens)
     return response
 
 
@@ -74,29 +116,36 @@ async def read_register(
 
 @router.post("/register")
 async def post_register(
-    form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    db_user = get_user(db, username=form_data.username)
+    db_user = await get_user(db, username=form_data.username)
     if db_user:
         return RedirectResponse("/register?invalid=True", status_code=302)
     else:
         user = UserCreate(username=form_data.username, password=form_data.password)
-        create_user(db, user=user)
-        access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-        access_token = create_access_token(
-            data={"sub": user.username}, expires_delta=access_token_expires
+        db_user = await create_user(db, user=user)
+        session_tokens = await db.run_sync(
+            lambda session: tokens.create_tokens(session, db_user)
         )
         response = RedirectResponse("/home", status_code=302)
-        response.set_cookie(key="bearer", value=access_token)
+        set_session_cookies(response, session_tokens)
         return response
 
 
 @router.get("/logout")
 @router.post("/logout")
-async def post_logout(bearer: Optional[TokenData] = Depends(get_bearer)):
+async def post_logout(
+    request: Request,
+    bearer: Optional[TokenData] = Depends(get_bearer),
+    db: AsyncSession = Depends(get_async_db),
+):
     if not bearer:
         response = RedirectResponse("/login?logged_out=True", status_code=302)
 
+    refresh_token = request.cookies.get("refresh")
+    await db.run_sync(lambda session: tokens.revoke(session, refresh_token))
     response = RedirectResponse("/login?logged_out=True", status_code=302)
     response.delete_cookie(key="bearer")
+    response.delete_cookie(key="refresh")
     return response
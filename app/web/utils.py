@@ -3,11 +3,12 @@ from typing import Annotated, Optional
 
 from fastapi import APIRouter, Depends, Form, Header, Request
 from fastapi.responses import FileResponse, HTMLResponse, RedirectResponse
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import templates
-from app.api.auth import TokenData, get_bearer, get_user
-from app.api.crud import (
+from app.api.async_crud import (
+    check_following,
+    check_like,
     create_comment,
     create_follow,
     create_like,
@@ -17,30 +18,52 @@ from app.api.crud import (
     delete_like,
     delete_tweet,
     get_comment_by_id,
+    get_suggestions,
     get_tweet_by_id,
+    get_user,
+    get_viewer_state,
     update_comment,
     update_tweet,
 )
-from app.api.main import get_db
+from app.api.auth import TokenData, get_bearer
+from app.api.main import get_async_db
 from app.api.schemas import TweetBase
+from app.api.viewer import ViewerState
 
 router = APIRouter()
 
 
+@router.get("/suggestions", response_class=HTMLResponse)
+async def read_suggestions(
+    request: Request,
+    bearer: TokenData = Depends(get_bearer),
+    db: AsyncSession = Depends(get_async_db),
+):
+    user = await get_user(db, bearer.username)
+    context = {
+        "request": request,
+        "suggestions": await get_suggestions(db, user.id),
+    }
+    return templates.TemplateResponse("/partials/suggestions.html", context)
+
+
 @router.post("/follow/{user_profile}")
 async def post_follow(
     request: Request,
     user_profile: str,
     bearer: TokenData = Depends(get_bearer),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    user = get_user(db, bearer.username)
-    user_profile = get_user(db, user_profile)
-    create_follow(user.id, user_profile.id, db)
+    user = await get_user(db, bearer.username)
+    user_profile = await get_user(db, user_profile)
+    if not await check_following(user.id, user_profile.id, db):
+        await create_follow(user.id, user_profile.id, db)
+    await db.refresh(user_profile)
     context = {
         "request": request,
         "user": user,
         "user_profile": user_profile,
+        "viewer": ViewerState(followed_user_ids={user_profile.id}),
     }
     return templates.TemplateResponse("/partials/follow.html", context)
 
@@ -50,15 +73,18 @@ async def remove_follow(
     request: Request,
     user_profile: str,
     bearer: TokenData = Depends(get_bearer),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    user = get_user(db, bearer.username)
-    user_profile = get_user(db, user_profile)
-    delete_follow(user.id, user_profile.id, db)
+    user = await get_user(db, bearer.username)
+    user_profile = await get_user(db, user_profile)
+    if await check_following(user.id, user_profile.id, db):
+        await delete_follow(user.id, user_profile.id, db)
+    await db.refresh(user_profile)
     context = {
         "request": request,
         "user": user,
         "user_profile": user_profile,
+        "viewer": ViewerState(),
     }
     return templates.TemplateResponse("/partials/follow.html", context)
 
@@ -68,15 +94,17 @@ async def post_like(
     request: Request,
     tweet_id: int,
     bearer: TokenData = Depends(get_bearer),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    user = get_user(db, bearer.username)
-    create_like(tweet_id, user.id, db)
-    tweet = get_tweet_by_id(tweet_id, db)
+    user = await get_user(db, bearer.username)
+    if not await check_like(tweet_id, user.id, db):
+        await create_like(tweet_id, user.id, db)
+    tweet = await get_tweet_by_id(tweet_id, db)
     context = {
         "request": request,
         "user": user,
         "tweet": tweet,
+        "viewer": await get_viewer_state(db, user.id, [tweet]),
     }
     return templates.TemplateResponse("/partials/tweet.html", context)
 
@@ -86,15 +114,17 @@ async def remove_like(
     request: Request,
     tweet_id: int,
     bearer: TokenData = Depends(get_bearer),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    user = get_user(db, bearer.username)
-    delete_like(tweet_id, user.id, db)
-    tweet = get_tweet_by_id(tweet_id, db)
+    user = await get_user(db, bearer.username)
+    if await check_like(tweet_id, user.id, db):
+        await delete_like(tweet_id, user.id, db)
+    tweet = await get_tweet_by_id(tweet_id, db)
     context = {
         "request": request,
         "user": user,
         "tweet": tweet,
+        "viewer": await get_viewer_state(db, user.id, [tweet]),
     }
     return templates.TemplateResponse("/partials/tweet.html", context)
 
@@ -104,14 +134,15 @@ async def post_tweet(
     request: Request,
     content: Annotated[str, Form()],
     bearer: TokenData = Depends(get_bearer),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    user = get_user(db, bearer.username)
-    tweet = create_tweet(user.id, content, db)
+    user = await get_user(db, bearer.username)
+    tweet = await create_tweet(user.id, content, db)
     context = {
         "request": request,
         "user": user,
         "tweet": tweet,
+        "viewer": await get_viewer_state(db, user.id, [tweet]),
     }
     return templates.TemplateResponse("/partials/tweet.html", context)
 
@@ -121,14 +152,15 @@ async def get_tweet(
     request: Request,
     tweet_id: int,
     bearer: TokenData = Depends(get_bearer),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    user = get_user(db, bearer.username)
-    tweet = get_tweet_by_id(tweet_id, db)
+    user = await get_user(db, bearer.username)
+    tweet = await get_tweet_by_id(tweet_id, db)
     context = {
         "request": request,
         "user": user,
         "tweet": tweet,
+        "viewer": await get_viewer_state(db, user.id, [tweet]),
     }
     return templates.TemplateResponse("/partials/tweet.html", context)
 
@@ -138,10 +170,10 @@ async def remove_tweet(
     request: Request,
     tweet_id: int,
     bearer: TokenData = Depends(get_bearer),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    user = get_user(db, bearer.username)
-    delete_tweet(tweet_id, db)
+    user = await get_user(db, bearer.username)
+    await delete_tweet(tweet_id, db)
     return ""
 
 
@@ -150,10 +182,10 @@ async def get_editable_tweet(
     request: Request,
     tweet_id: int,
     bearer: TokenData = Depends(get_bearer),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    user = get_user(db, bearer.username)
-    tweet = get_tweet_by_id(tweet_id, db)
+    user = await get_user(db, bearer.username)
+    tweet = await get_tweet_by_id(tweet_id, db)
     context = {
         "request": request,
         "user": user,
@@ -168,15 +200,16 @@ async def post_edited_tweet(
     content: Annotated[str, Form()],
     tweet_id: int,
     bearer: TokenData = Depends(get_bearer),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    user = get_user(db, bearer.username)
-    update_tweet(tweet_id, content, db)
-    tweet = get_tweet_by_id(tweet_id, db)
+    user = await get_user(db, bearer.username)
+    await update_tweet(tweet_id, content, db)
+    tweet = await get_tweet_by_id(tweet_id, db)
     context = {
         "request": request,
         "user": user,
         "tweet": tweet,
+        "viewer": await get_viewer_state(db, user.id, [tweet]),
     }
     return templates.TemplateResponse("/partials/tweet.html", context)
 
@@ -187,15 +220,16 @@ async def post_comment(
     comment: Annotated[str, Form()],
     tweet_id: int,
     bearer: TokenData = Depends(get_bearer),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    user = get_user(db, bearer.username)
-    create_comment(comment, tweet_id, user.id, db)
-    tweet = get_tweet_by_id(tweet_id, db)
+    user = await get_user(db, bearer.username)
+    await create_comment(comment, tweet_id, user.id, db)
+    tweet = await get_tweet_by_id(tweet_id, db)
     context = {
         "request": request,
         "user": user,
         "tweet": tweet,
+        "viewer": await get_viewer_state(db, user.id, [tweet]),
     }
     return templates.TemplateResponse("/partials/tweet.html", context)
 
@@ -205,10 +239,10 @@ async def get_comment(
     request: Request,
     comment_id: int,
     bearer: TokenData = Depends(get_bearer),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    user = get_user(db, bearer.username)
-    comment = get_comment_by_id(comment_id, db)
+    user = await get_user(db, bearer.username)
+    comment = await get_comment_by_id(comment_id, db)
     context = {
         "request": request,
         "user": user,
@@ -222,10 +256,10 @@ async def remove_comment(
     request: Request,
     comment_id: int,
     bearer: TokenData = Depends(get_bearer),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    user = get_user(db, bearer.username)
-    delete_comment(comment_id, db)
+    user = await get_user(db, bearer.username)
+    await delete_comment(comment_id, db)
     return ""
 
 
@@ -234,10 +268,10 @@ async def get_editable_comment(
     request: Request,
     comment_id: int,
     bearer: TokenData = Depends(get_bearer),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    user = get_user(db, bearer.username)
-    comment = get_comment_by_id(comment_id, db)
+    user = await get_user(db, bearer.username)
+    comment = await get_comment_by_id(comment_id, db)
     context = {
         "request": request,
         "user": user,
@@ -252,11 +286,11 @@ async def post_edited_comment(
     content: Annotated[str, Form()],
     comment_id: int,
     bearer: TokenData = Depends(get_bearer),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    user = get_user(db, bearer.username)
-    update_comment(comment_id, content, db)
-    comment = get_comment_by_id(comment_id, db)
+    user = await get_user(db, bearer.username)
+    await update_comment(comment_id, content, db)
+    comment = await get_comment_by_id(comment_id, db)
     context = {
         "request": request,
         "user": user,
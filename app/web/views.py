@@ -1,44 +1,63 @@
 from datetime import timedelta
 from typing import Optional, Union
+from urllib.parse import urlencode
 
 from fastapi import APIRouter, Depends, Request
 from fastapi.responses import FileResponse, HTMLResponse, RedirectResponse
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import templates
+from app.api.async_crud import (
+    get_tweets_explore,
+    get_tweets_home,
+    get_tweets_user,
+    get_user,
+    get_viewer_state,
+    search_tweets,
+)
 from app.api.auth import (
     ACCESS_TOKEN_EXPIRE_MINUTES,
     TokenData,
     create_access_token,
     get_bearer,
-    get_user,
 )
-from app.api.crud import get_tweets_explore, get_tweets_home, get_tweets_user
-from app.api.main import get_db
+from app.api.main import get_async_db
+from app.api.pagination import PAGE_SIZE, next_cursor
 from app.api.schemas import UserCreate
 from app.web.login import login_for_cookie
 
 router = APIRouter()
 
 
+def render_tweets(request: Request, template: str, context: dict, page_url: str):
+    if "next_cursor" not in context:
+        context["next_cursor"] = next_cursor(context["tweets"], PAGE_SIZE)
+    context["page_url"] = page_url
+    if request.headers.get("HX-Request") and request.query_params.get("cursor"):
+        template = "/partials/tweets-page.html"
+    return templates.TemplateResponse(template, context)
+
+
 @router.get("/home")
 async def read_home(
     request: Request,
     bearer: Optional[TokenData] = Depends(get_bearer),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     invalid: Optional[bool] = None,
+    cursor: Optional[str] = None,
 ):
     if bearer:
-        user = get_user(db, bearer.username)
-        tweets = get_tweets_home(user.id, db)
+        user = await get_user(db, bearer.username)
+        tweets = await get_tweets_home(user.id, db, cursor)
         context = {
             "request": request,
             "invalid": invalid,
             "user": user,
             "tweets": tweets,
+            "viewer": await get_viewer_state(db, user.id, tweets),
         }
-        return templates.TemplateResponse("/home.html", context)
+        return render_tweets(request, "/home.html", context, "/home")
     else:
         return RedirectResponse("/login?unauthorized=True", status_code=302)
 
@@ -47,19 +66,46 @@ async def read_home(
 async def read_explore(
     request: Request,
     bearer: Optional[TokenData] = Depends(get_bearer),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     invalid: Optional[bool] = None,
+    cursor: Optional[str] = None,
 ):
     if bearer:
-        user = get_user(db, bearer.username)
-        tweets = get_tweets_explore(user.id, db)
+        user = await get_user(db, bearer.username)
+        tweets = await get_tweets_explore(user.id, db, cursor)
         context = {
             "request": request,
             "invalid": invalid,
             "user": user,
             "tweets": tweets,
+            "viewer": await get_viewer_state(db, user.id, tweets),
+        }
+        return render_tweets(request, "/explore.html", context, "/explore")
+    else:
+        return RedirectResponse("/login?unauthorized=True", status_code=302)
+
+
+@router.get("/search")
+async def read_search(
+    request: Request,
+    q: str = "",
+    cursor: Optional[str] = None,
+    bearer: Optional[TokenData] = Depends(get_bearer),
+    db: AsyncSession = Depends(get_async_db),
+):
+    if bearer:
+        user = await get_user(db, bearer.username)
+        tweets, cursor = await search_tweets(q, db, cursor)
+        context = {
+            "request": request,
+            "user": user,
+            "q": q,
+            "tweets": tweets,
+            "next_cursor": cursor,
+            "viewer": await get_viewer_state(db, user.id, tweets),
         }
-        return templates.TemplateResponse("/explore.html", context)
+        page_url = "/search?" + urlencode({"q": q})
+        return render_tweets(request, "/search.html", context, page_url)
     else:
         return RedirectResponse("/login?unauthorized=True", status_code=302)
 
@@ -69,15 +115,16 @@ async def read_profile(
     request: Request,
     username: str,
     follow: Optional[bool] = None,
+    cursor: Optional[str] = None,
     bearer: Optional[TokenData] = Depends(get_bearer),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     if bearer:
-        user = get_user(db, bearer.username)
-        user_profile = get_user(db, username)
+        user = await get_user(db, bearer.username)
+        user_profile = await get_user(db, username)
         if user_profile:
             user_profile = user_profile
-            tweets = get_tweets_user(user_profile.id, db)
+            tweets = await get_tweets_user(user_profile.id, db, cursor)
             follow = follow
             context = {
                 "request": request,
@@ -85,8 +132,13 @@ async def read_profile(
                 "user": user,
                 "user_profile": user_profile,
                 "tweets": tweets,
+                "viewer": await get_viewer_state(
+                    db, user.id, tweets, user_ids=[user_profile.id]
+                ),
             }
-            return templates.TemplateResponse("/profile.html", context)
+            return render_tweets(
+                request, "/profile.html", context, f"/{user_profile.username}"
+            )
         else:
             return RedirectResponse("/home?invalid=True", status_code=302)
     else:
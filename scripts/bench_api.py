@@ -0,0 +1,83 @@
+import argparse
+import asyncio
+import random
+
+import httpx
+from benchlib import ROOT, bearer, drive, report, server, signup
+
+# Mixed read/write load on the JSON API: users page through the explore and
+# following timelines while others post tweets and comments. Readers and
+# writers share one SQLite file, so this is where the journal mode and the
+# busy timeout show. Run it from the project root:
+#
+#   python scripts/bench_api.py
+#   git worktree add /tmp/before <commit> && \
+#       python scripts/bench_api.py --app-dir /tmp/before
+
+
+def seed(url: str, users: int, tweets: int) -> tuple[list[str], list[int]]:
+    with httpx.Client(base_url=url, timeout=60) as client:
+        tokens = [signup(client, f"bench{number}") for number in range(users)]
+        ids = [
+            client.get("/api/users/me", headers=bearer(token)).json()["id"]
+            for token in tokens
+        ]
+        for number, token in enumerate(tokens):
+            for followee_id in random.sample(ids[:number] + ids[number + 1 :], 5):
+                client.post(f"/api/follow/{followee_id}", headers=bearer(token))
+        tweet_ids = []
+        for number in range(tweets):
+            response = client.post(
+                "/api/tweets",
+                json={"content": f"seed tweet {number}"},
+                headers=bearer(tokens[number % users]),
+            )
+            response.raise_for_status()
+            tweet_ids.append(response.json()["id"])
+    return tokens, tweet_ids
+
+
+def request(client: httpx.AsyncClient, number: int, tokens, tweet_ids, write_share):
+    headers = bearer(tokens[number % len(tokens)])
+    if random.random() < write_share:
+        if random.random() < 0.5:
+            return "post tweet", client.post(
+                "/api/tweets", json={"content": f"load {number}"}, headers=headers
+            )
+        return "comment", client.post(
+            f"/api/tweets/{random.choice(tweet_ids)}/comments",
+            json={"content": f"load {number}"},
+            headers=headers,
+        )
+    if random.random() < 0.5:
+        return "explore", client.get("/api/tweets", headers=headers)
+    return "following", client.get("/api/tweets/following", headers=headers)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--app-dir", default=ROOT)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--tweets", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--write-share", type=float, default=0.3)
+    args = parser.parse_args()
+    random.seed(0)
+    with server(args.app_dir) as url:
+        tokens, tweet_ids = seed(url, args.users, args.tweets)
+        results = asyncio.run(
+            drive(
+                url,
+                args.concurrency,
+                args.requests,
+                lambda client, number: request(
+                    client, number, tokens, tweet_ids, args.write_share
+                ),
+            )
+        )
+    report(*results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import argparse
+import asyncio
+
+import httpx
+from benchlib import ROOT, bearer, drive, report, server, signup
+
+# Throughput of the batch write routes against the single-item ones. Two
+# equal groups of users write the same number of likes, follows and tweets,
+# one item per request or --batch-size items per request, with the same
+# client concurrency. Passwords are hashed with the cheapest bcrypt cost to
+# keep signups out of the way. Run it from the project root:
+#
+#   python scripts/bench_batch.py
+
+
+def seed(url: str, writers: int, targets: int, tweets: int):
+    with httpx.Client(base_url=url, timeout=60) as client:
+        tokens = [signup(client, f"bench{number}") for number in range(2 * writers)]
+        target_tokens = [signup(client, f"target{number}") for number in range(targets)]
+        target_ids = [
+            client.get("/api/users/me", headers=bearer(token)).json()["id"]
+            for token in target_tokens
+        ]
+        tweet_ids = [
+            client.post(
+                "/api/tweets",
+                json={"content": f"seed tweet {number}"},
+                headers=bearer(target_tokens[number % targets]),
+            ).json()["id"]
+            for number in range(tweets)
+        ]
+    return tokens[:writers], tokens[writers:], target_ids, tweet_ids
+
+
+def singles(tokens: list[str], kind: str, ids: list[int]):
+    def request(client: httpx.AsyncClient, number: int):
+        token, id = tokens[number // len(ids)], ids[number % len(ids)]
+        if kind == "likes":
+            pending = client.post(f"/api/tweets/{id}/likes/", headers=bearer(token))
+        elif kind == "follows":
+            pending = client.post(f"/api/follow/{id}", headers=bearer(token))
+        else:
+            pending = client.post(
+                "/api/tweets", json={"content": f"single {id}"}, headers=bearer(token)
+            )
+        return kind, pending
+
+    return request
+
+
+def batches(tokens: list[str], kind: str, ids: list[int], size: int):
+    chunks = [ids[start : start + size] for start in range(0, len(ids), size)]
+
+    def request(client: httpx.AsyncClient, number: int):
+        token, chunk = tokens[number // len(chunks)], chunks[number % len(chunks)]
+        if kind == "tweets":
+            body = {"tweets": [{"content": f"batch {id}"} for id in chunk]}
+        else:
+            body = {"ids": chunk}
+        return kind, client.post(f"/api/batch/{kind}", json=body, headers=bearer(token))
+
+    return request, len(chunks)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--app-dir", default=ROOT)
+    parser.add_argument("--writers", type=int, default=10)
+    parser.add_argument("--targets", type=int, default=200)
+    parser.add_argument("--tweets", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+    with server(args.app_dir, {"BCRYPT_ROUNDS": "4"}) as url:
+        single_tokens, batch_tokens, target_ids, tweet_ids = seed(
+            url, args.writers, args.targets, args.tweets
+        )
+        # Tweets need no targets; each writer posts one per seeded tweet.
+        workloads = (
+            ("likes", tweet_ids),
+            ("follows", target_ids),
+            ("tweets", tweet_ids),
+        )
+        for kind, ids in workloads:
+            items = len(single_tokens) * len(ids)
+            results = asyncio.run(
+                drive(url, args.concurrency, items, singles(single_tokens, kind, ids))
+            )
+            print(f"\n{kind}, one per request: {items / results[2]:.0f} items/s")
+            report(*results)
+            request, chunks = batches(batch_tokens, kind, ids, args.batch_size)
+            results = asyncio.run(
+                drive(url, args.concurrency, len(batch_tokens) * chunks, request)
+            )
+            print(
+                f"\n{kind}, {args.batch_size} per request:"
+                f" {items / results[2]:.0f} items/s"
+            )
+            report(*results)
+
+
+if __name__ == "__main__":
+    main()
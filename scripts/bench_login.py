@@ -0,0 +1,64 @@
+import argparse
+import asyncio
+import random
+
+import httpx
+from benchlib import PASSWORD, ROOT, bearer, cookie, drive, report, server, signup
+
+# Login throughput and tail latency: clients log in through the web form
+# while others load /explore, so bcrypt work that lands on the event loop
+# shows up in the page latencies. Run it from the project root:
+#
+#   python scripts/bench_login.py
+#   python scripts/bench_login.py --rounds 10
+#   git worktree add /tmp/before <commit> && \
+#       python scripts/bench_login.py --app-dir /tmp/before
+
+
+def seed(url: str, users: int) -> list[str]:
+    with httpx.Client(base_url=url, timeout=60) as client:
+        tokens = [signup(client, f"bench{number}") for number in range(users)]
+        client.post(
+            "/api/tweets", json={"content": "seed tweet"}, headers=bearer(tokens[0])
+        ).raise_for_status()
+    return tokens
+
+
+def request(client: httpx.AsyncClient, number: int, tokens, login_share):
+    if random.random() < login_share:
+        username = f"bench{number % len(tokens)}"
+        return "login", client.post(
+            "/login", data={"username": username, "password": PASSWORD}
+        )
+    return "/explore", client.get(
+        "/explore", headers=cookie(tokens[number % len(tokens)])
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--app-dir", default=ROOT)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--login-share", type=float, default=0.3)
+    args = parser.parse_args()
+    random.seed(0)
+    with server(args.app_dir, {"BCRYPT_ROUNDS": str(args.rounds)}) as url:
+        tokens = seed(url, args.users)
+        results = asyncio.run(
+            drive(
+                url,
+                args.concurrency,
+                args.requests,
+                lambda client, number: request(
+                    client, number, tokens, args.login_share
+                ),
+            )
+        )
+    report(*results)
+
+
+if __name__ == "__main__":
+    main()
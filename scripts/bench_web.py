@@ -0,0 +1,74 @@
+import argparse
+import asyncio
+import random
+
+import httpx
+from benchlib import ROOT, bearer, cookie, drive, report, server, signup
+
+# Concurrent latency of the HTML pages: many users load /home and /explore
+# while some of them post tweets through /webutils/tweet, all on one uvicorn
+# worker. Run it from the project root:
+#
+#   python scripts/bench_web.py
+#   git worktree add /tmp/before <commit> && \
+#       python scripts/bench_web.py --app-dir /tmp/before
+
+
+def seed(url: str, users: int, tweets: int) -> list[str]:
+    with httpx.Client(base_url=url, timeout=60) as client:
+        tokens = [signup(client, f"bench{number}") for number in range(users)]
+        ids = [
+            client.get("/api/users/me", headers=bearer(token)).json()["id"]
+            for token in tokens
+        ]
+        for number, token in enumerate(tokens):
+            for followee_id in random.sample(ids[:number] + ids[number + 1 :], 5):
+                client.post(f"/api/follow/{followee_id}", headers=bearer(token))
+        for number in range(tweets):
+            client.post(
+                "/api/tweets",
+                json={"content": f"seed tweet {number}"},
+                headers=bearer(tokens[number % users]),
+            ).raise_for_status()
+    return tokens
+
+
+def request(client: httpx.AsyncClient, number: int, tokens, write_share):
+    token = tokens[number % len(tokens)]
+    if random.random() < write_share:
+        return "post tweet", client.post(
+            "/webutils/tweet",
+            data={"content": f"load tweet {number}"},
+            headers=cookie(token),
+        )
+    path = random.choice(("/home", "/explore"))
+    return path, client.get(path, headers=cookie(token))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--app-dir", default=ROOT)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--tweets", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--write-share", type=float, default=0.2)
+    args = parser.parse_args()
+    random.seed(0)
+    with server(args.app_dir) as url:
+        tokens = seed(url, args.users, args.tweets)
+        results = asyncio.run(
+            drive(
+                url,
+                args.concurrency,
+                args.requests,
+                lambda client, number: request(
+                    client, number, tokens, args.write_share
+                ),
+            )
+        )
+    report(*results)
+
+
+if __name__ == "__main__":
+    main()
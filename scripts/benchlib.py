@@ -0,0 +1,155 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Awaitable, Callable
+
+import httpx
+
+# Shared pieces of the benchmark scripts in this directory. Each benchmark
+# starts the app under uvicorn against a scratch SQLite database, seeds it
+# through the JSON API and drives it with concurrent httpx clients. Pass
+# --app-dir to serve another checkout, e.g. a `git worktree` of an older
+# commit, to get before and after numbers from the same script.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = "benchmark"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def server(app_dir: str = ROOT, env: dict | None = None):
+    # The server runs in a scratch directory so that trees which still
+    # hardcode ./sql_app.db get a fresh database too.
+    workdir = tempfile.mkdtemp(prefix="ugly-bench-")
+    os.symlink(os.path.join(app_dir, "templates"), os.path.join(workdir, "templates"))
+    environ = dict(os.environ)
+    for name in ("ASYNC_DATABASE_URL", "DATABASE_REPLICA_URLS"):
+        environ.pop(name, None)
+    environ.update(
+        {
+            "PYTHONPATH": app_dir,
+            "DATABASE_URL": f"sqlite:///{workdir}/bench.db",
+            **(env or {}),
+        }
+    )
+    port = free_port()
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.main:app",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        cwd=workdir,
+        env=environ,
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError("The server exited during startup.")
+            try:
+                httpx.get(f"{url}/login")
+                break
+            except httpx.TransportError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.1)
+        yield url
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def signup(client: httpx.Client, username: str) -> str:
+    response = client.post(
+        "/api/users", json={"username": username, "password": PASSWORD}
+    )
+    response.raise_for_status()
+    response = client.post(
+        "/api/token", data={"username": username, "password": PASSWORD}
+    )
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+def bearer(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def cookie(token: str) -> dict:
+    return {"Cookie": f"bearer={token}"}
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+async def drive(
+    url: str,
+    concurrency: int,
+    requests: int,
+    request: Callable[[httpx.AsyncClient, int], tuple[str, Awaitable[httpx.Response]]],
+) -> tuple[dict[str, list[float]], Counter, float]:
+    # request(client, n) returns the label the n-th request is reported under
+    # and the request itself. Error responses and dropped connections count as
+    # failures, not latencies.
+    latencies: dict[str, list[float]] = {}
+    failures = Counter()
+    numbers = iter(range(requests))
+    limits = httpx.Limits(max_connections=concurrency)
+
+    async def worker(client: httpx.AsyncClient):
+        for number in numbers:
+            label, pending = request(client, number)
+            started = time.perf_counter()
+            try:
+                response = await pending
+            except httpx.TransportError:
+                response = None
+            if response is None or response.is_error:
+                failures[label] += 1
+            else:
+                latencies.setdefault(label, []).append(time.perf_counter() - started)
+
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=120) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return latencies, failures, elapsed
+
+
+def report(latencies: dict[str, list[float]], failures: Counter, elapsed: float):
+    labels = sorted(set(latencies) | set(failures))
+    latencies["all"] = [value for label in labels for value in latencies.get(label, [])]
+    failures["all"] = sum(failures.values())
+    print(f"{'':<12} {'ok':>6} {'failed':>6} {'ok/s':>8} {'p50 ms':>8}", end="")
+    print(f" {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for label in labels + ["all"]:
+        values = sorted(latencies.get(label, []))
+        print(f"{label:<12} {len(values):>6} {failures[label]:>6}", end="")
+        if not values:
+            print()
+            continue
+        print(
+            f" {len(values) / elapsed:>8.1f}"
+            f" {percentile(values, 0.5) * 1000:>8.1f}"
+            f" {percentile(values, 0.95) * 1000:>8.1f}"
+            f" {percentile(values, 0.99) * 1000:>8.1f}"
+            f" {values[-1] * 1000:>8.1f}"
+        )
@@ -0,0 +1,75 @@
+import itertools
+import os
+import sys
+import tempfile
+import types
+
+import pytest
+
+# The app reads its settings and opens its engine at import time, so the
+# environment has to point at a scratch database before anything is imported.
+_database_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_database_dir}/test.db"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ.pop("DATABASE_REPLICA_URLS", None)
+os.environ["JOB_WORKERS"] = "0"
+os.environ["ADMIN_USERNAMES"] = "admin"
+
+try:
+    import app.api.secret  # noqa: F401
+except ImportError:
+    sys.modules["app.api.secret"] = types.SimpleNamespace(secret="test-secret")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.api import jobs  # noqa: E402
+from app.api.database import SessionLocal  # noqa: E402
+from app.main import app  # noqa: E402
+
+_usernames = (f"user{number}" for number in itertools.count())
+
+
+@pytest.fixture(scope="session")
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def create_user(client, username: str) -> tuple[int, dict]:
+    response = client.post("/api/users", json={"username": username, "password": "pw"})
+    assert response.status_code == 200, response.text
+    token = client.post(
+        "/api/token", data={"username": username, "password": "pw"}
+    ).json()["access_token"]
+    return response.json()["id"], {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def make_user(client):
+    def make(username: str | None = None) -> tuple[int, dict]:
+        return create_user(client, username or next(_usernames))
+
+    return make
+
+
+@pytest.fixture(scope="session")
+def admin(client) -> dict:
+    _, headers = create_user(client, "admin")
+    return headers
+
+
+@pytest.fixture
+def settle(db):
+    # Runs queued jobs, rescoring included, so reads see every write so far.
+    def run():
+        jobs.run_pending(db)
+
+    return run
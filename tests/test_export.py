@@ -0,0 +1,16 @@
+import json
+
+
+def test_export_is_admin_only(client, make_user):
+    _, headers = make_user()
+    assert client.get("/api/export/users", headers=headers).status_code == 403
+    assert client.get("/api/export/users").status_code == 401
+
+
+def test_export_streams_ndjson(client, make_user, admin):
+    user_id, headers = make_user()
+    client.post("/api/tweets", json={"content": "exported"}, headers=headers)
+    response = client.get("/api/export/tweets", headers=admin)
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert {"content": "exported", "user_id": user_id}.items() <= rows[-1].items()
@@ -0,0 +1,28 @@
+def test_like_and_follow_writes_are_compact(client, make_user):
+    author_id, author = make_user()
+    fan_id, fan = make_user()
+    tweet = client.post("/api/tweets", json={"content": "compact"}, headers=author)
+    like = client.post(f"/api/tweets/{tweet.json()['id']}/likes/", headers=fan)
+    assert like.status_code == 200
+    assert set(like.json()) == {"id", "user_id", "tweet_id", "created_at"}
+    follow = client.post(f"/api/follow/{author_id}", headers=fan)
+    assert follow.status_code == 200
+    assert set(follow.json()) == {"id", "follower_id", "followee_id", "created_at"}
+    assert follow.json()["follower_id"] == fan_id
+
+
+def test_write_routes_expand_on_request(client, make_user):
+    author_id, author = make_user()
+    _, fan = make_user()
+    tweet = client.post("/api/tweets", json={"content": "expand"}, headers=author)
+    like = client.post(
+        f"/api/tweets/{tweet.json()['id']}/likes/",
+        params={"expand": "owner", "fields": "id"},
+        headers=fan,
+    )
+    assert set(like.json()) == {"id", "owner"}
+    assert "following" not in like.json()["owner"]
+    follow = client.post(
+        f"/api/follow/{author_id}", params={"expand": "user_followee"}, headers=fan
+    )
+    assert follow.json()["user_followee"]["id"] == author_id
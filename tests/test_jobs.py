@@ -0,0 +1,34 @@
+from datetime import datetime, timedelta
+
+from app.api import jobs, models
+
+
+def test_stats_are_for_admins(client, make_user, admin):
+    _, headers = make_user()
+    assert client.get("/api/jobs/stats", headers=headers).status_code == 403
+    response = client.get("/api/jobs/stats", headers=admin)
+    assert response.status_code == 200
+    assert set(response.json()["depth"]) == {jobs.PENDING, jobs.RUNNING}
+
+
+def test_job_that_outlives_its_last_lease_fails(db, settle):
+    settle()
+    jobs.enqueue(db, "hang", {}, key="hang:1")
+    db.commit()
+    job = db.query(models.Job).filter(models.Job.idempotency_key == "hang:1").one()
+    for attempt in range(1, jobs.MAX_ATTEMPTS + 1):
+        assert jobs.claim(db).id == job.id
+        assert job.attempts == attempt
+        # The worker dies; the lease runs out.
+        job.run_at = datetime.utcnow() - timedelta(seconds=1)
+        db.commit()
+    assert jobs.claim(db) is None
+    db.expire_all()
+    assert job.status == jobs.FAILED
+    assert job.finished_at is not None
+    # A new request for the same key starts over.
+    jobs.enqueue(db, "hang", {}, key="hang:1", requeue=True)
+    db.commit()
+    assert jobs.claim(db).id == job.id
+    db.delete(job)
+    db.commit()
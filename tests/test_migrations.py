@@ -0,0 +1,34 @@
+import threading
+
+from sqlalchemy import select
+
+from app.api import database, migrations
+
+
+def test_workers_starting_together_migrate_once(tmp_path):
+    url = f"sqlite:///{tmp_path}/race.db"
+    engines = [database.make_engine(url) for _ in range(4)]
+    start = threading.Barrier(len(engines))
+    results, errors = [], []
+
+    def worker(engine):
+        start.wait()
+        try:
+            results.append(migrations.upgrade(engine))
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=worker, args=(engine,)) for engine in engines]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    applied = sorted(step for done in results for step in done)
+    assert applied == [(version, name) for version, name, _ in migrations.MIGRATIONS]
+    with engines[0].connect() as connection:
+        versions = connection.scalars(select(migrations.schema_migrations.c.version))
+        assert len(list(versions)) == len(migrations.MIGRATIONS)
+    assert migrations.pending(engines[0]) == []
+    for engine in engines:
+        engine.dispose()
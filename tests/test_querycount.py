@@ -0,0 +1,50 @@
+import pytest
+from sqlalchemy import text
+
+from app.api import querycount
+
+EXPAND = "owner,comments.owner,likes.owner"
+
+
+@pytest.fixture
+def feed(client, make_user, settle):
+    _, author = make_user()
+    fans = [make_user()[1] for _ in range(2)]
+    for number in range(20):
+        tweet = client.post(
+            "/api/tweets", json={"content": f"budget {number}"}, headers=author
+        )
+        tweet_id = tweet.json()["id"]
+        for fan in fans:
+            client.post(
+                f"/api/tweets/{tweet_id}/comments", json={"content": "hi"}, headers=fan
+            )
+            client.post(f"/api/tweets/{tweet_id}/likes/", headers=fan)
+    settle()
+    # Explore leaves out the viewer's own tweets.
+    return make_user()[1]
+
+
+def query_count(client, headers: dict, limit: int) -> int:
+    response = client.get(
+        "/api/tweets", params={"limit": limit, "expand": EXPAND}, headers=headers
+    )
+    assert response.status_code == 200, response.text
+    assert len(response.json()) == limit
+    return int(response.headers[querycount.QUERY_COUNT_HEADER])
+
+
+def test_expanded_tweets_stay_within_the_query_budget(client, feed):
+    small = query_count(client, feed, 2)
+    large = query_count(client, feed, 20)
+    assert large <= querycount.QUERY_BUDGET
+    # Relationships are loaded once per page, not once per tweet.
+    assert large == small
+
+
+def test_count_queries_counts_each_statement(db):
+    with querycount.count_queries() as counter:
+        for _ in range(querycount.QUERY_BUDGET + 1):
+            db.execute(text("SELECT 1"))
+    assert counter.count == querycount.QUERY_BUDGET + 1
+    assert counter.over_budget()
@@ -0,0 +1,45 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.api import cache, database, migrations, models, queryplan
+
+
+@pytest.fixture
+def fresh_db(tmp_path):
+    engine = database.make_engine(f"sqlite:///{tmp_path}/plans.db")
+    migrations.upgrade(engine)
+    db = Session(bind=engine)
+    user = models.User(username="plans", password="x")
+    db.add(user)
+    db.flush()
+    db.add(
+        models.Tweet(
+            user_id=user.id, content="#tag @plans", created_at=datetime.utcnow()
+        )
+    )
+    # Gives the suggestions query a followee to expand.
+    db.add(models.Follow(follower_id=user.id, followee_id=user.id))
+    db.commit()
+    try:
+        yield db
+    finally:
+        db.close()
+        engine.dispose()
+        # The checks cache rows from this database under ids the app's own
+        # database reuses.
+        cache.users.clear()
+        cache.tweets.clear()
+        cache.timelines.clear()
+
+
+def test_hot_queries_do_not_scan_whole_tables(fresh_db):
+    results = queryplan.check(fresh_db)
+    assert results
+    scans = {
+        result["query"]: result["full_scans"]
+        for result in results
+        if result["full_scans"]
+    }
+    assert scans == {}
@@ -0,0 +1,56 @@
+from app.api import jobs, models, ranking
+from app.api.database import SessionLocal
+
+
+def score_job(db, tweet_id: int) -> models.Job:
+    db.expire_all()
+    return (
+        db.query(models.Job)
+        .filter(models.Job.idempotency_key == f"score:{tweet_id}")
+        .one()
+    )
+
+
+def stored_score(db, tweet_id: int) -> float:
+    db.expire_all()
+    return db.get(models.TweetScore, tweet_id).score
+
+
+def test_likes_queue_a_rescore_per_tweet(client, make_user, db, settle):
+    _, author = make_user()
+    tweet = client.post("/api/tweets", json={"content": "rank me"}, headers=author)
+    tweet_id = tweet.json()["id"]
+    settle()
+    before = stored_score(db, tweet_id)
+    for _ in range(2):
+        _, fan = make_user()
+        client.post(f"/api/tweets/{tweet_id}/likes/", headers=fan)
+    assert score_job(db, tweet_id).status == jobs.PENDING
+    settle()
+    assert score_job(db, tweet_id).status == jobs.DONE
+    assert stored_score(db, tweet_id) > before
+    # A finished job is queued again by the next like.
+    client.post(f"/api/tweets/{tweet_id}/comments", json={"content": "hi"}, headers=fan)
+    assert score_job(db, tweet_id).status == jobs.PENDING
+
+
+def test_requeue_while_running_runs_again(client, make_user, db, settle):
+    _, author = make_user()
+    tweet = client.post("/api/tweets", json={"content": "busy"}, headers=author)
+    tweet_id = tweet.json()["id"]
+    settle()
+    _, fan = make_user()
+    client.post(f"/api/tweets/{tweet_id}/likes/", headers=fan)
+    job = jobs.claim(db)
+    while job.idempotency_key != f"score:{tweet_id}":
+        jobs.run(db, job)
+        job = jobs.claim(db)
+    # Another request likes the tweet while the job runs.
+    other = SessionLocal()
+    ranking.mark(other, [tweet_id])
+    other.commit()
+    other.close()
+    jobs.run(db, job)
+    assert score_job(db, tweet_id).status == jobs.PENDING
+    settle()
+    assert score_job(db, tweet_id).status == jobs.DONE
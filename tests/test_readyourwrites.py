@@ -0,0 +1,58 @@
+import time
+
+import pytest
+from sqlalchemy import create_engine
+
+from app.api import database, readyourwrites
+
+
+@pytest.fixture
+def replica(monkeypatch):
+    replica_engine = create_engine("sqlite://")
+    monkeypatch.setattr(database.RoutingSession, "replicas", [replica_engine])
+    return replica_engine
+
+
+def read_bind(username: str | None):
+    session = database.SessionLocal(info={"read_only": True, "username": username})
+    try:
+        return session.get_bind()
+    finally:
+        session.close()
+
+
+def test_writes_hand_the_client_a_signed_pin(client, make_user):
+    _, headers = make_user()
+    username = client.get("/api/users/me", headers=headers).json()["username"]
+    response = client.post("/api/tweets", json={"content": "pin"}, headers=headers)
+    token = response.headers[readyourwrites.PIN_HEADER]
+    assert response.cookies[readyourwrites.PIN_COOKIE] == token
+    pin = readyourwrites.decode(token)
+    assert pin.covers(username)
+    assert not pin.covers("someone else")
+    read = client.get("/api/users/me", headers=headers)
+    assert readyourwrites.PIN_HEADER not in read.headers
+
+
+def test_reads_follow_the_pin_the_client_sends(replica):
+    pin = readyourwrites.decode(readyourwrites.encode("writer", time.time() + 5))
+    token = readyourwrites._pin.set(pin)
+    try:
+        assert read_bind("writer") is database.engine
+        assert read_bind("reader") is replica
+    finally:
+        readyourwrites._pin.reset(token)
+    assert read_bind("writer") is replica
+
+
+@pytest.mark.parametrize(
+    "token",
+    [
+        readyourwrites.encode("writer", time.time() - 1),
+        readyourwrites.encode("writer", time.time() + 5) + "x",
+        "not a token",
+        None,
+    ],
+)
+def test_expired_or_forged_pins_are_ignored(token):
+    assert not readyourwrites.decode(token).covers("writer")
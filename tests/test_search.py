@@ -0,0 +1,93 @@
+import pytest
+
+from app.api import models, pagination, search
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("100%", {"100% sure"}),
+        ("a_b", {"a_b"}),
+        ("c\\d", {"c\\d"}),
+        ("100", {"100% sure", "1000 sure"}),
+    ],
+)
+def test_like_fallback_matches_wildcards_literally(
+    client, make_user, db, query, expected
+):
+    _, headers = make_user()
+    contents = ["100% sure", "1000 sure", "a_b", "axb", "c\\d", "c\\\\d"]
+    ids = {
+        client.post("/api/tweets", json={"content": content}, headers=headers).json()[
+            "id"
+        ]: content
+        for content in contents
+    }
+    hits = search.search_like(db, models.Tweet, query, None, 100)
+    found = {ids[id] for id, _ in hits if id in ids}
+    assert found == expected
+
+
+def post(client, headers: dict, content: str) -> int:
+    return client.post(
+        "/api/tweets", json={"content": content}, headers=headers
+    ).json()["id"]
+
+
+def found(client, headers: dict, q: str, path: str = "/api/search") -> list[int]:
+    response = client.get(path, params={"q": q}, headers=headers)
+    assert response.status_code == 200, response.text
+    return [item["id"] for item in response.json()]
+
+
+def test_fts_ranks_matches_and_reads_queries_as_text(client, make_user, db):
+    assert search.is_available(db.get_bind())
+    _, headers = make_user()
+    once = post(client, headers, "a quokka naps in the shade of a long afternoon")
+    often = post(client, headers, "Quökka quokka quokka")
+    post(client, headers, "a wombat naps")
+    assert found(client, headers, "quokka") == [often, once]
+    # The last word matches as a prefix, accents aside.
+    assert set(found(client, headers, "quok")) == {often, once}
+    assert found(client, headers, "naps quok") == [once]
+    # Operators and quotes are searched for as words, not parsed.
+    assert found(client, headers, 'quokka" OR wombat') == []
+    assert found(client, headers, "quokka NOT") == []
+
+
+def test_fts_pages_follow_the_cursor(client, make_user):
+    _, headers = make_user()
+    ids = {post(client, headers, f"pangolin {'pangolin ' * n}{n}") for n in range(5)}
+    seen, cursor = [], None
+    while True:
+        params = {"q": "pangolin", "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/api/search", params=params, headers=headers)
+        seen += [tweet["id"] for tweet in response.json()]
+        cursor = response.headers.get(pagination.NEXT_CURSOR_HEADER)
+        if not cursor:
+            break
+    assert len(seen) == len(set(seen)) == 5
+    assert set(seen) == ids
+
+
+def test_fts_index_follows_updates_and_deletes(client, make_user):
+    _, headers = make_user()
+    tweet_id = post(client, headers, "an axolotl")
+    client.post(
+        f"/api/tweets/{tweet_id}/comments",
+        json={"content": "axolotl fan"},
+        headers=headers,
+    )
+    assert found(client, headers, "axolotl") == [tweet_id]
+    assert len(found(client, headers, "axolotl", "/api/search/comments")) == 1
+    client.put(
+        f"/api/tweets/{tweet_id}", json={"content": "a narwhal"}, headers=headers
+    )
+    assert found(client, headers, "axolotl") == []
+    assert found(client, headers, "narwhal") == [tweet_id]
+    client.delete(f"/api/tweets/{tweet_id}", headers=headers)
+    assert found(client, headers, "narwhal") == []
+    # The comment went with its tweet through the cascade, outside crud.
+    assert found(client, headers, "axolotl", "/api/search/comments") == []
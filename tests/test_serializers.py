@@ -0,0 +1,73 @@
+import pytest
+
+from app.api import pagination, serializers
+
+
+@pytest.fixture
+def feed(client, make_user, settle):
+    author_id, author = make_user()
+    viewer_id, viewer = make_user()
+    lurker_id, lurker = make_user()
+    client.post(f"/api/follow/{author_id}", headers=viewer)
+    tweet_ids = [
+        client.post(
+            "/api/tweets", json={"content": f"tweet {n}"}, headers=author
+        ).json()["id"]
+        for n in range(5)
+    ]
+    client.post(f"/api/tweets/{tweet_ids[1]}/likes/", headers=viewer)
+    client.post(f"/api/tweets/{tweet_ids[3]}/likes/", headers=author)
+    client.post(
+        f"/api/tweets/{tweet_ids[3]}/comments", json={"content": "hi"}, headers=viewer
+    )
+    settle()
+    return {
+        "author_id": author_id,
+        "viewer": viewer,
+        "lurker_id": lurker_id,
+        "lurker": lurker,
+    }
+
+
+def fetch_pages(client, path, headers, params):
+    pages, cursor = [], None
+    while True:
+        query = dict(params, cursor=cursor) if cursor else params
+        response = client.get(path, params=query, headers=headers)
+        assert response.status_code == 200, response.text
+        cursor = response.headers.get(pagination.NEXT_CURSOR_HEADER)
+        pages.append((response.content, cursor))
+        if not cursor:
+            return pages
+
+
+def compare(client, monkeypatch, path, headers, params):
+    monkeypatch.setattr(serializers, "FAST_RESPONSES", False)
+    slow = fetch_pages(client, path, headers, params)
+    monkeypatch.setattr(serializers, "FAST_RESPONSES", True)
+    fast = fetch_pages(client, path, headers, params)
+    assert fast == slow
+
+
+@pytest.mark.parametrize(
+    "params",
+    [{}, {"limit": 2}, {"fields": "id,liked,like_count"}, {"fields": "content"}],
+)
+@pytest.mark.parametrize("route", ["explore", "user", "following"])
+def test_fast_responses_match(client, monkeypatch, feed, route, params):
+    path = {
+        "explore": "/api/tweets",
+        "user": f"/api/tweets/{feed['author_id']}",
+        "following": "/api/tweets/following",
+    }[route]
+    compare(client, monkeypatch, path, feed["viewer"], params)
+
+
+@pytest.mark.parametrize("route", ["user", "following"])
+def test_fast_responses_match_when_empty(client, monkeypatch, feed, route):
+    path = {
+        "user": f"/api/tweets/{feed['lurker_id']}",
+        "following": "/api/tweets/following",
+    }[route]
+    compare(client, monkeypatch, path, feed["lurker"], {})
+    assert client.get(path, headers=feed["lurker"]).json() == []
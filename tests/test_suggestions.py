@@ -0,0 +1,20 @@
+from app.api import suggestions
+
+
+def test_expand_reads_only_the_latest_follows_of_each_followee(
+    client, make_user, db, monkeypatch
+):
+    monkeypatch.setattr(suggestions, "MAX_EDGES_PER_FOLLOWEE", 2)
+    user_id, user = make_user()
+    (first_id, first), (second_id, second) = make_user(), make_user()
+    others = [make_user()[0] for _ in range(4)]
+    for followee_id in others:
+        client.post(f"/api/follow/{followee_id}", headers=first)
+    for followee_id in (others[3], others[0], user_id):
+        client.post(f"/api/follow/{followee_id}", headers=second)
+    client.post(f"/api/follow/{first_id}", headers=user)
+    client.post(f"/api/follow/{second_id}", headers=user)
+    expanded = suggestions.expand(db, user_id)
+    assert expanded.expanded == {first_id, second_id}
+    # first's two newest follows and second's, minus the user themselves.
+    assert dict(expanded.counts) == {others[3]: 1, others[2]: 1, others[0]: 1}
@@ -0,0 +1,30 @@
+def home(client, headers: dict) -> str:
+    token = headers["Authorization"].removeprefix("Bearer ")
+    response = client.get("/home", headers={"Cookie": f"bearer={token}"})
+    assert response.status_code == 200
+    return response.text
+
+
+def test_followers_see_new_tweets(client, make_user, settle):
+    author_id, author = make_user()
+    _, follower = make_user()
+    client.post(f"/api/follow/{author_id}", headers=follower)
+    client.post("/api/tweets", json={"content": "fanned out"}, headers=author)
+    settle()
+    assert "fanned out" in home(client, follower)
+
+
+def test_tweet_reusing_a_deleted_id_is_fanned_out(client, make_user, settle):
+    author_id, author = make_user()
+    _, follower = make_user()
+    client.post(f"/api/follow/{author_id}", headers=follower)
+    first = client.post("/api/tweets", json={"content": "deleted"}, headers=author)
+    settle()
+    client.delete(f"/api/tweets/{first.json()['id']}", headers=author)
+    second = client.post("/api/tweets", json={"content": "reposted"}, headers=author)
+    # SQLite hands the largest rowid out again once it is deleted.
+    assert second.json()["id"] == first.json()["id"]
+    settle()
+    page = home(client, follower)
+    assert "reposted" in page
+    assert "deleted" not in page
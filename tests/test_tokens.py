@@ -0,0 +1,79 @@
+import threading
+from datetime import datetime, timedelta
+
+from jose import jwt
+
+from app.api import auth, models, tokens
+
+
+def login(client, make_user) -> dict:
+    _, headers = make_user()
+    username = client.get("/api/users/me", headers=headers).json()["username"]
+    return client.post(
+        "/api/token", data={"username": username, "password": "pw"}
+    ).json()
+
+
+def refresh(client, refresh_token: str):
+    return client.post("/api/token/refresh", data={"refresh_token": refresh_token})
+
+
+def family(token: str) -> str:
+    return jwt.decode(token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM])["sid"]
+
+
+def test_replay_within_grace_returns_the_same_tokens(client, make_user):
+    issued = login(client, make_user)
+    rotated = refresh(client, issued["refresh_token"])
+    replayed = refresh(client, issued["refresh_token"])
+    assert rotated.status_code == replayed.status_code == 200
+    assert replayed.json() == rotated.json()
+    assert refresh(client, rotated.json()["refresh_token"]).status_code == 200
+
+
+def test_replay_after_grace_ends_the_session(client, make_user, db):
+    issued = login(client, make_user)
+    rotated = refresh(client, issued["refresh_token"]).json()
+    sid = family(rotated["access_token"])
+    db.query(models.RefreshToken).filter(
+        models.RefreshToken.family == sid, models.RefreshToken.replaced_by.is_not(None)
+    ).update(
+        {
+            "revoked_at": datetime.utcnow()
+            - timedelta(seconds=2 * tokens.ROTATION_GRACE_SECONDS)
+        }
+    )
+    db.commit()
+    assert refresh(client, issued["refresh_token"]).status_code == 401
+    assert refresh(client, rotated["refresh_token"]).status_code == 401
+    assert tokens.is_revoked(sid)
+
+
+def test_revokes_from_other_processes_are_picked_up(client, make_user, db):
+    issued = login(client, make_user)
+    sid = family(issued["access_token"])
+    assert not tokens.is_revoked(sid)
+    # Another worker logs the session out straight in the table.
+    db.query(models.RefreshToken).filter(models.RefreshToken.family == sid).update(
+        {"revoked_at": datetime.utcnow()}
+    )
+    db.commit()
+    tokens.load_revoked_sessions()
+    assert tokens.is_revoked(sid)
+
+
+def test_revocation_checks_stay_off_the_database(client, make_user, monkeypatch):
+    issued = login(client, make_user)
+    # The loader thread may open sessions meanwhile; requests must not.
+    openers = []
+    session_local = tokens.SessionLocal
+
+    def tracked():
+        openers.append(threading.current_thread())
+        return session_local()
+
+    monkeypatch.setattr(tokens, "SessionLocal", tracked)
+    assert not tokens.is_revoked(family(issued["access_token"]))
+    page = client.get("/home", headers={"Cookie": f"bearer={issued['access_token']}"})
+    assert page.status_code == 200
+    assert all(thread.name == "revocations" for thread in openers)
@@ -0,0 +1,30 @@
+import threading
+from datetime import datetime
+
+from app.api import trending
+
+
+def test_record_and_trending_stay_in_memory(monkeypatch):
+    # The checkpoint thread may open sessions meanwhile; this thread must not.
+    openers = []
+    session_local = trending.SessionLocal
+
+    def tracked():
+        openers.append(threading.current_thread())
+        return session_local()
+
+    monkeypatch.setattr(trending, "SessionLocal", tracked)
+    trending.record(["inmemory", "inmemory"], datetime.utcnow())
+    assert ("inmemory", 2) in trending.trending(100)
+    assert threading.current_thread() not in openers
+
+
+def test_checkpoint_restores_the_window(monkeypatch):
+    trending.record(["restored"], datetime.utcnow(), 3)
+    trending.checkpoint()
+    monkeypatch.setattr(
+        trending, "_ring", trending.RingCounter(trending.WINDOW_BUCKETS)
+    )
+    assert ("restored", 3) not in trending.trending(100)
+    trending.checkpoint()
+    assert ("restored", 3) in trending.trending(100)
@@ -0,0 +1,176 @@
+import time
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from app.api import models, writebuffer
+
+
+@pytest.fixture(autouse=True)
+def empty_buffer():
+    yield
+    writebuffer.stop(0)
+    if writebuffer._flusher is not None:
+        writebuffer._flusher.join()
+    writebuffer._pending.clear()
+    writebuffer._flushing.clear()
+
+
+@pytest.fixture
+def tweets(client, make_user):
+    _, author = make_user()
+    ids = []
+    for number in range(3):
+        response = client.post(
+            "/api/tweets", json={"content": f"buffered {number}"}, headers=author
+        )
+        ids.append(response.json()["id"])
+    return ids
+
+
+def liked(db, user_id: int, tweet_id: int) -> bool:
+    db.expire_all()
+    return (
+        db.query(models.Like)
+        .filter(models.Like.user_id == user_id, models.Like.tweet_id == tweet_id)
+        .count()
+        == 1
+    )
+
+
+def wait_until(predicate, timeout: float = 5) -> bool:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def locked(db, toggles):
+    raise OperationalError("INSERT", {}, Exception("database is locked"))
+
+
+def test_toggles_collapse_per_pair(make_user, tweets, db):
+    user_id, _ = make_user()
+    writebuffer.put(writebuffer.LIKE, user_id, tweets[0], True)
+    writebuffer.put(writebuffer.LIKE, user_id, tweets[0], False)
+    writebuffer.put(writebuffer.LIKE, user_id, tweets[1], False)
+    writebuffer.put(writebuffer.LIKE, user_id, tweets[1], True)
+    assert writebuffer.size() == 2
+    assert writebuffer.flush(db) == 2
+    assert not liked(db, user_id, tweets[0])
+    assert liked(db, user_id, tweets[1])
+    assert db.get(models.Tweet, tweets[1]).like_count == 1
+
+
+def test_reads_see_pending_toggles(make_user, tweets):
+    user_id, _ = make_user()
+    writebuffer.put(writebuffer.LIKE, user_id, tweets[0], True)
+    writebuffer.put(writebuffer.LIKE, user_id, tweets[1], False)
+    assert writebuffer.state(writebuffer.LIKE, user_id, tweets[0]) is True
+    assert writebuffer.state(writebuffer.LIKE, user_id, tweets[1]) is False
+    assert writebuffer.state(writebuffer.LIKE, user_id, tweets[2]) is None
+    assert writebuffer.state(writebuffer.FOLLOW, user_id, tweets[0]) is None
+    present = writebuffer.overlay(
+        writebuffer.LIKE, user_id, tweets, {tweets[1], tweets[2]}
+    )
+    assert present == {tweets[0], tweets[2]}
+
+
+def test_full_buffer_flushes_without_waiting(monkeypatch, make_user, tweets, db):
+    monkeypatch.setattr(writebuffer, "FLUSH_MS", 60_000)
+    monkeypatch.setattr(writebuffer, "BATCH_SIZE", 2)
+    user_id, _ = make_user()
+    writebuffer.start()
+    writebuffer.put(writebuffer.LIKE, user_id, tweets[0], True)
+    assert not wait_until(lambda: writebuffer.size() == 0, 0.2)
+    writebuffer.put(writebuffer.LIKE, user_id, tweets[1], True)
+    assert wait_until(lambda: writebuffer.size() == 0)
+    assert liked(db, user_id, tweets[0]) and liked(db, user_id, tweets[1])
+
+
+def test_flusher_writes_every_interval(monkeypatch, make_user, tweets, db):
+    monkeypatch.setattr(writebuffer, "FLUSH_MS", 20)
+    user_id, _ = make_user()
+    writebuffer.start()
+    writebuffer.put(writebuffer.LIKE, user_id, tweets[0], True)
+    assert wait_until(lambda: writebuffer.size() == 0)
+    assert liked(db, user_id, tweets[0])
+
+
+def test_failed_flush_keeps_newer_toggles(monkeypatch, make_user, tweets, db):
+    user_id, _ = make_user()
+    writebuffer.put(writebuffer.LIKE, user_id, tweets[0], True)
+    writebuffer.put(writebuffer.LIKE, user_id, tweets[1], True)
+
+    def write(db, toggles):
+        # The user unlikes the first tweet while its like is being written.
+        writebuffer.put(writebuffer.LIKE, user_id, tweets[0], False)
+        locked(db, toggles)
+
+    monkeypatch.setattr(writebuffer, "write_likes", write)
+    with pytest.raises(OperationalError):
+        writebuffer.flush(db)
+    assert writebuffer._pending == {
+        (writebuffer.LIKE, user_id, tweets[0]): False,
+        (writebuffer.LIKE, user_id, tweets[1]): True,
+    }
+    assert not writebuffer._flushing
+    monkeypatch.undo()
+    assert writebuffer.flush(db) == 2
+    assert not liked(db, user_id, tweets[0])
+    assert liked(db, user_id, tweets[1])
+
+
+def test_stop_flushes_what_is_pending(monkeypatch, make_user, tweets, db):
+    monkeypatch.setattr(writebuffer, "FLUSH_MS", 60_000)
+    user_id, _ = make_user()
+    writebuffer.start()
+    for tweet_id in tweets:
+        writebuffer.put(writebuffer.LIKE, user_id, tweet_id, True)
+    assert writebuffer.stop(5) == 0
+    assert not writebuffer._flusher.is_alive()
+    assert all(liked(db, user_id, tweet_id) for tweet_id in tweets)
+
+
+def test_stop_drops_what_misses_the_deadline(monkeypatch, make_user, tweets, db):
+    monkeypatch.setattr(writebuffer, "FLUSH_MS", 20)
+    monkeypatch.setattr(writebuffer, "write_likes", locked)
+    user_id, _ = make_user()
+    for tweet_id in tweets:
+        writebuffer.put(writebuffer.LIKE, user_id, tweet_id, True)
+    started = time.monotonic()
+    assert writebuffer.stop(0.2) == 3
+    assert time.monotonic() - started < 1
+    assert writebuffer.size() == 0
+    assert not any(liked(db, user_id, tweet_id) for tweet_id in tweets)
+
+
+def test_batch_writes_go_through_the_buffer(monkeypatch, client, make_user, tweets, db):
+    monkeypatch.setattr(writebuffer, "ENABLED", True)
+    author_id, _ = make_user()
+    user_id, headers = make_user()
+    client.post(f"/api/tweets/{tweets[0]}/likes/", headers=headers)
+    writebuffer.flush(db)
+    # A buffered unlike and like must not undo the batch that follows them.
+    client.delete(f"/api/tweets/{tweets[0]}/likes/", headers=headers)
+    client.post(f"/api/tweets/{tweets[1]}/likes/", headers=headers)
+    response = client.post(
+        "/api/batch/likes", json={"ids": tweets[:3]}, headers=headers
+    )
+    assert [result["status"] for result in response.json()] == [
+        "accepted",
+        "exists",
+        "accepted",
+    ]
+    response = client.post(
+        "/api/batch/follows", json={"ids": [author_id]}, headers=headers
+    )
+    assert response.json() == [{"id": author_id, "status": "accepted"}]
+    assert writebuffer.state(writebuffer.FOLLOW, user_id, author_id) is True
+    writebuffer.flush(db)
+    assert all(liked(db, user_id, tweet_id) for tweet_id in tweets)
+    assert db.get(models.Tweet, tweets[0]).like_count == 1
+    db.expire_all()
+    assert db.get(models.User, user_id).following_count == 1